@@ -1,298 +1,471 @@
-import cv2
-import pandas as pd
-import numpy as np
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
-from tracker.centroidtracker import CentroidTracker
-from tracker.trackableobject import TrackableObject
-from imutils.video import FPS
-import numpy as np
-import dlib
+import argparse
 import logging
-import time
-import threading
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
-
+import time
 
-# execution start time
-start_time = time.time()
+import cv2
 
-# setup logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+from backends import BACKENDS, load_detector
+from sources import FrameSource, pipeline_buffers
+from pipeline import Pipeline, BLOCK
+from persistence import ChangeOnlyPolicy
+from logconfig import setup_logging
+from cloudsync import FirestoreUploader
+from postprocess import centroids, confirmed_tracks, person_detections, to_deepsort
+from tracks import TrackStore
+from zones import ZoneEngine, LineCounter
+from trackers import TRACKERS, make_tracker, predict_tracks
+from scheduling import DetectionScheduler
+from tiling import TiledDetector
+from detection import detect_batch
+from annotation import AnnotatedVideoSink
+from heatmap import HeatmapAccumulator, heatmap_path
+from metrics import METRICS, setup_metrics
+from evaluation import RunningScore, load_mot
+
+# Importing this module has no side effects: the model, Firebase and the video
+# are only set up by main() (or by the caller, from the functions below).
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase
 basedir = os.path.dirname(os.path.abspath(__file__))
 key_path = os.path.join(basedir, "serviceAccountKey.json")
-try:
-    cred = credentials.Certificate(key_path)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logger.info("Firebase initialized successfully.")
-except FileNotFoundError:
-    logger.error("serviceAccountKey.json not found. Please download your Firebase service account key from the Firebase console and place it in the project directory as 'serviceAccountKey.json'.")
-    exit(1)
-except Exception as e:
-    logger.error(f"Failed to initialize Firebase: {e}")
-    exit(1)
-model = YOLO('yolov8x.pt')
-
 
 ## Input Video
 video_path = r"C:\Users\dhanu\Downloads\demopro\new.mp4"
-logger.info("Starting the video..")
-cap = cv2.VideoCapture(video_path)
+WEIGHTS = 'yolov8x.pt'
+# Inference backend: "torch" or "onnx" (exported once, ONNX Runtime on CPU);
+# INT8 only applies to onnx, None threads keeps the library default
+BACKEND = "torch"
+BACKEND_INT8 = False
+INFER_THREADS = None
+# Frames per YOLO predict call. Batching pays off on recorded files; use 1 for live streams.
+BATCH_SIZE = 8
+# Tracker backend: "deepsort" (appearance embedder), "sort" or "centroid" (motion only, much cheaper on CPU)
+TRACKER = "deepsort"
+# Full detection every DETECT_EVERY frames (sooner on motion); the tracker
+# predicts the frames in between
+DETECT_EVERY = 3
+# Frames are processed at native resolution (None) instead of being squashed;
+# YOLO reads the whole frame letterboxed to INFER_SIZE. With INFER_TILE > 0 it
+# reads the zone area as INFER_TILE-pixel tiles in one batch instead: better
+# for small, distant people, but with zones covering the frame a native 1080p
+# frame is ~8 tile inferences of yolov8x per detection, hence opt-in.
+FRAME_SIZE = None
+INFER_SIZE = 640
+INFER_TILE = 0
+# Frame rate read from the source (None: every frame); skipped frames are
+# grabbed without being decoded
+SOURCE_FPS = None
+# Stop after 8 hours
+MAX_SECONDS = 28800
+# Headless: no drawing, no window (server nodes). The annotated video is
+# optional (None disables it) and written by its own thread at OUTPUT_FPS.
+HEADLESS = False
+OUTPUT_VIDEO = 'Final_output.mp4'
+OUTPUT_FPS = 10
+# Per-stage latency metrics: served on http://127.0.0.1:METRICS_PORT/metrics
+# and/or logged every METRICS_EVERY seconds (None: off)
+METRICS_PORT = None
+METRICS_EVERY = None
+
+
+def init_firestore(key_path=key_path):
+    """
+    Initializes Firebase and returns the background Firestore uploader.
 
-##for camera ip
-# camera_ip = "Camera Url"
-# logger.info("Starting the live stream..")
-# cap = cv2.VideoCapture(camera_ip)
-# time.sleep(1.0)
+    firebase_admin is imported here, not at module import.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
 
+    try:
+        cred = credentials.Certificate(key_path)
+        firebase_admin.initialize_app(cred)
+        db = firestore.client()
+        # Cloud sync runs in the background; unsent updates survive in a local outbox
+        uploader = FirestoreUploader(db, os.path.join(basedir, "instance", "firestore_outbox.db"),
+                                     server_timestamp=firestore.SERVER_TIMESTAMP)
+        logger.info("Firebase initialized successfully.")
+        return uploader
+    except FileNotFoundError:
+        logger.error("serviceAccountKey.json not found. Please download your Firebase service account key from the Firebase console and place it in the project directory as 'serviceAccountKey.json'.")
+        exit(1)
+    except Exception as e:
+        logger.error(f"Failed to initialize Firebase: {e}")
+        exit(1)
 
-basedir = os.path.dirname(os.path.abspath(__file__))
-file_path = os.path.join(basedir, "coco.txt")
-my_file = open(file_path, "r")
-data = my_file.read()
-class_list = data.split("\n")
 
+def load_model(weights=WEIGHTS, backend=BACKEND, threads=INFER_THREADS, int8=BACKEND_INT8,
+               imgsz=INFER_SIZE):
+    """Loads the detector and runs one warm-up batch so the first real frame is not slowed down."""
+    model = load_detector(weights, backend=backend, threads=threads, int8=int8, imgsz=imgsz)
+    model.warmup()
+    return model
 
-#function for detect person coordinate
-def update_firestore(entered, exited, current_inside, timestamp):
+
+def update_firestore(uploader, entered, exited, current_inside, timestamp):
     """
-    Updates the Firestore with current people count data.
+    Queues the current people count data for the background Firestore uploader.
+
+    The live document is coalesced (only the latest state is sent) and history
+    entries are batched; nothing here waits for the network.
     """
-    try:
-        # Update live data
-        doc_ref = db.collection('people_counter').document('live')
-        data = {
-            'entered': entered,
-            'exited': exited,
-            'current_inside': current_inside,
-            'last_updated': firestore.SERVER_TIMESTAMP
-        }
-        doc_ref.set(data)
-        
-        # Add to history
-        db.collection('people_counter_history').add(data)
-        
-        logger.info("Firestore updated: Entered {}, Exited {}, Inside {}".format(entered, exited, current_inside))
-    except Exception as e:
-        logger.error("Error updating Firestore: {}".format(str(e)))
+    uploader.update({
+        'entered': entered,
+        'exited': exited,
+        'current_inside': current_inside,
+        'client_time': timestamp,
+    })
+    logger.debug("Firestore update queued: Entered {}, Exited {}, Inside {}".format(entered, exited, current_inside))
 
 
-def get_person_coordinates(frame):
+#function for detect person coordinate
+def get_person_coordinates(detections):
     """
-    Extracts the coordinates of the person bounding boxes from the YOLO model predictions.
+    Extracts the coordinates of the person bounding boxes from the shared detections.
 
     Args:
-        frame: Input frame for object detection.
+        detections: Detections returned by ``detect`` for the current frame.
 
     Returns:
         list: List of person bounding box coordinates in the format [x1, y1, x2, y2].
     """
-    results = model.predict(frame, verbose=False)
-    a = results[0].boxes.data.detach().cpu()
-    px = pd.DataFrame(a).astype("float")
-
-    list_corr = []
-    for index, row in px.iterrows():
-        x1 = row[0]
-        y1 = row[1]
-        x2 = row[2]
-        y2 = row[3]
-        d = int(row[5])
-        c = class_list[d]
-        if 'person' in c:
-            list_corr.append([x1, y1, x2, y2])
-    return list_corr
-
-
-def people_counter():
+    return person_detections(detections).boxes.tolist()
+
+
+def open_source(source, fps=SOURCE_FPS, size=FRAME_SIZE):
+    """Opens a video file or camera URL with frame buffers sized for the counting pipeline."""
+    return FrameSource(source, fps=fps, size=size,
+                       buffers=pipeline_buffers(BATCH_SIZE * 2, BATCH_SIZE))
+
+
+class EntryExitCounter:
     """
-    Counts the number of people entering and exiting based on object tracking using DeepSORT.
+    Tracking/counting stage: tracks people and counts count-line crossings.
+
+    Calling the object with ``(frame, detections)`` (``None`` on frames the
+    scheduler skipped) returns ``((entered, exited, inside), overlay)`` for
+    that frame. ``overlay`` holds what ``draw_overlay`` needs, or ``None``
+    when ``annotate`` is off (headless runs without a video).
+
+    Args:
+        tracker_name: Tracker backend (see ``trackers.TRACKERS``).
+        detect_every: Frames between two scheduled detections.
+        zones: ``ZoneEngine``; its first line is the entry/exit line.
+        annotate: Collect the overlay of every frame.
+        heatmap: Optional ``HeatmapAccumulator`` fed with the track centroids.
+        clock: ``sources.FrameClock`` timing the heatmap updates; ``None``
+            uses the wall clock (live sources).
+        score: Optional ``RunningScore`` (with the count line) measuring the
+            entry/exit accuracy against ground truth.
     """
-    count = 0
 
-    writer = None
-    # Initialize DeepSORT Tracker
-    tracker = DeepSort(max_age=30)
-    trackableObjects = {}
-    unique_ids = set()
+    def __init__(self, tracker_name=TRACKER, detect_every=DETECT_EVERY, zones=None, annotate=True,
+                 heatmap=None, score=None, clock=None):
+        self.annotate = annotate
+        self.heatmap = heatmap
+        self.clock = clock
+        self.score = score
+        self.frames = 0
+        # Initialize the tracker
+        self.tracker = make_tracker(tracker_name, max_age=30)
+        # Bounded per-track state; deleted DeepSORT tracks are evicted every frame
+        self.track_store = TrackStore(capacity=256, history=32, max_age=30)
+        # Every frame is tracked and counted; YOLO only runs on scheduled frames.
+        # The pipeline blocks (no frame dropped), so the schedule is kept
+        # deterministic: no track-count feedback from the tracking thread.
+        self.scheduler = DetectionScheduler(every=detect_every, track_trigger=False)
+        # Entry/exit line from the zone config
+        self.zones = zones or ZoneEngine.load()
+        self.count_line = LineCounter(self.zones.lines[0])
+
+        # The total number of objects that have moved either up or down
+        self.totalDown = 0
+        self.totalUp = 0
+        # Mean detection confidence; a detector figure, not a counting accuracy
+        self.mean_confidence = 0.0
+        self.accuracy = None
+
+        # Initialize empty lists to store the counting data
+        self.total = []
+        self.move_out = []
+        self.move_in = []
+
+    def counts(self):
+        return self.totalUp, self.totalDown, len(self.move_in) - len(self.move_out)
+
+    def __call__(self, frame, frame_detections):
+        now = self.clock.tick() if self.clock is not None else None
+        if frame_detections is None:
+            # Detector skipped this frame: advance the tracks by motion prediction
+            with METRICS.stage("tracker"):
+                tracks = predict_tracks(self.tracker, frame)
+        else:
+            # Convert YOLO detections to DeepSORT format
+            # Filter for person class (class 0) with confidence > 0.5
+            people = person_detections(frame_detections, min_conf=0.5)
+            detections = to_deepsort(people)
+
+            self.mean_confidence = people.mean_confidence()
+
+            # Apply Tracking
+            with METRICS.stage("tracker"):
+                tracks = self.tracker.update_tracks(detections, frame=frame)
+
+        # Line crossings of all confirmed tracks in one vectorized update
+        fh, fw = frame.shape[:2]
+        track_ids, boxes = confirmed_tracks(tracks)
+        points = centroids(boxes)
+        if self.heatmap is not None:
+            with METRICS.stage("heatmap"):
+                self.heatmap.update(points, fw, fh, now=now)
+        if frame_detections is not None:
+            self.scheduler.report_tracks(len(track_ids))
+
+        with METRICS.stage("line_count"):
+            crossed = self.count_line.update([int(i) for i in track_ids], points, fw, fh)
+
+            # Direction of every track relative to its mean past position, O(1) per track
+            track_store = self.track_store
+            slots, directions = track_store.update(track_ids, points)
+            track_store.evict(t.track_id for t in tracks)
+
+            # Count a crossing once per track, when its overall movement agrees
+            for crossing, slot, direction in zip(crossed.tolist(), slots.tolist(), directions.tolist()):
+                if track_store.counted[slot]:
+                    continue
+                if crossing < 0 and direction < 0:
+                    self.totalUp += 1
+                    self.move_out.append(self.totalUp)
+                    track_store.counted[slot] = True
+                elif crossing > 0 and direction > 0:
+                    self.totalDown += 1
+                    self.move_in.append(self.totalDown)
+                    track_store.counted[slot] = True
+
+                    self.total = []
+                    self.total.append(len(self.move_in) - len(self.move_out))
+
+        if self.score is not None:
+            self.accuracy = self.score.crossings(self.frames, self.totalUp, self.totalDown)
+        self.frames += 1
+
+        # Snapshot of the counters for this frame; the tracker may already be ahead
+        if not self.annotate:
+            return self.counts(), None
+        overlay = (self.count_line.line.pixels(fw, fh).tolist(),
+                   list(zip(track_ids, boxes.astype(int).tolist(), map(tuple, points.astype(int).tolist()))),
+                   track_store.total_seen, self.mean_confidence, self.accuracy)
+        return self.counts(), overlay
+
+
+def draw_overlay(frame, result):
+    """Draws the count line, the tracks and the counters returned by ``EntryExitCounter``."""
+    (totalUp, totalDown, _), overlay = result
+    if overlay is None:
+        return
+    line, tracks, total_seen, mean_confidence, accuracy = overlay
+    fh = frame.shape[0]
+
+    # Count line from the zone config (default: horizontal line at mid height)
+    cv2.line(frame, *map(tuple, line), (0, 0, 0), 2)
+
+    for track_id, (l, t, r, b), centroid in tracks:
+        # Draw bounding box and ID
+        cv2.rectangle(frame, (l, t), (r, b), (0, 255, 0), 2)
+        text = "ID {}".format(track_id)
+        cv2.putText(frame, text, (l, t - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (0, 255, 0), 2)
+        cv2.circle(frame, centroid, 4, (255, 255, 255), -1)
+
+    info_status = [
+        ("Enter", totalUp),
+        ("Exit ", totalDown),
+    ]
 
-    # Initialize the total number of frames processed thus far, along
-    # with the total number of objects that have moved either up or down
-    totalFrames = 0
-    totalDown = 0
-    totalUp = 0
+    # info_total = [("Total people inside", ', '.join(map(str, total)))]
 
-    # Initialize empty lists to store the counting data
-    total = []
-    move_out = []
-    move_in = []
+    for (i, (k, v)) in enumerate(info_status):
+        text = "{}: {}".format(k, v)
+        cv2.putText(frame, text, (10, fh - ((i * 20) + 20)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
 
-    # Initialize video writer
-    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    writer = cv2.VideoWriter('Final_output.mp4', fourcc, 30, (W, H), True)
+    # Display Total People Count (from DeepSORT)
+    cv2.putText(frame, f"Total People: {total_seen}",
+                (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                (0, 0, 255), 2)
 
-    fps = FPS().start()
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        count += 1
-        if count % 3 != 0:
-            continue
+    # Mean detection confidence; entry/exit accuracy only when measured against ground truth (--gt)
+    cv2.putText(frame, f"Mean Confidence: {mean_confidence:.2f}",
+                (20, 70), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                (255, 165, 0), 2)
+    if accuracy is not None:
+        cv2.putText(frame, f"Entry/Exit Accuracy: {100.0 * accuracy:.1f}% (ground truth)",
+                    (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                    (255, 165, 0), 2)
 
-        frame = cv2.resize(frame, (500, 280))
 
-        # Get person coordinates using YOLO
-        per_corr = get_person_coordinates(frame)
+def make_detector(model, zones, tile=INFER_TILE, imgsz=INFER_SIZE):
+    """Batch ``infer(frames)``: the zone area as tiles when ``tile`` > 0, otherwise the whole frame at ``imgsz``."""
+    if tile:
+        return TiledDetector(model, zones, tile=tile)
 
-        # Convert YOLO detections to DeepSORT format
-        detections = []
-        confidences = []
-        results = model.predict(frame, verbose=False)
-        yolo_results = results[0]
+    def detect(frames):
+        return detect_batch(model, frames, imgsz=imgsz)
+    return detect
 
-        for box in yolo_results.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
 
-            # Filter for person class (class 0) with confidence > 0.5
-            if cls_id == 0 and conf > 0.5:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                # DeepSORT format: ([x, y, width, height], confidence, class_name)
-                detections.append(([x1, y1, x2-x1, y2-y1], conf, "person"))
-                confidences.append(conf)
-
-        # Calculate accuracy score (average confidence)
-        accuracy_score = np.mean(confidences) if confidences else 0.0
-
-        # Apply DeepSORT Tracking
-        tracks = tracker.update_tracks(detections, frame=frame)
-
-        cv2.line(frame, (0, H // 2 - 10), (W, H // 2 - 10), (0, 0, 0), 2)
-
-        # Process tracks and count people
-        for track in tracks:
-            if not track.is_confirmed():
-                continue
-
-            track_id = track.track_id
-            unique_ids.add(track_id)
-            
-            # Get bounding box coordinates
-            l, t, r, b = map(int, track.to_ltrb())
-            centroid = ((l + r) // 2, (t + b) // 2)
-
-            # Track object movement for counting
-            to = trackableObjects.get(track_id)
-
-            if to is None:
-                to = TrackableObject(track_id, centroid)
-            else:
-                y = [c[1] for c in to.centroids]
-                direction = centroid[1] - np.mean(y)
-                to.centroids.append(centroid)
-
-                if not to.counted:
-                    if direction < 0 and centroid[1] < H // 2 - 20:
-                        totalUp += 1
-                        move_out.append(totalUp)
-                        to.counted = True
-                    elif 0 < direction < 1.1 and centroid[1] > 144:
-                        totalDown += 1
-                        move_in.append(totalDown)
-                        to.counted = True
-
-                        total = []
-                        total.append(len(move_in) - len(move_out))
-
-            trackableObjects[track_id] = to
-
-            # Draw bounding box and ID
-            cv2.rectangle(frame, (l, t), (r, b), (0, 255, 0), 2)
-            text = "ID {}".format(track_id)
-            cv2.putText(frame, text, (l, t - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                        (0, 255, 0), 2)
-            cv2.circle(frame, centroid, 4, (255, 255, 255), -1)
-
-        info_status = [
-            ("Enter", totalUp),
-            ("Exit ", totalDown),
-        ]
-
-        # info_total = [("Total people inside", ', '.join(map(str, total)))]
-        
-        for (i, (k, v)) in enumerate(info_status):
-            text = "{}: {}".format(k, v)
-            cv2.putText(frame, text, (10, H - ((i * 20) + 20)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-        
-        # Display Total People Count (from DeepSORT)
-        cv2.putText(frame, f"Total People: {len(unique_ids)}",
-                    (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1,
-                    (0, 0, 255), 2)
-
-        # Display Accuracy Score (average confidence)
-        cv2.putText(frame, f"Accuracy: {accuracy_score:.2f}",
-                    (20, 70), cv2.FONT_HERSHEY_SIMPLEX, 1,
-                    (255, 165, 0), 2)
+def people_counter(source, model, uploader, tracker_name=TRACKER, detect_every=DETECT_EVERY,
+                   headless=HEADLESS, output=OUTPUT_VIDEO, output_fps=OUTPUT_FPS, gt=None,
+                   tile=INFER_TILE):
+    """
+    Counts the number of people entering and exiting based on object tracking.
+
+    Args:
+        source: ``FrameSource`` from ``open_source``; released at the end.
+        model: Detector from ``load_model``.
+        uploader: ``FirestoreUploader`` receiving the counts; closed at the end.
+        tracker_name: Tracker backend (see ``trackers.TRACKERS``).
+        detect_every: Frames between two scheduled detections.
+        headless: Skip drawing and display.
+        output: Annotated video file, ``None`` for none.
+        output_fps: Frame rate of the annotated video.
+        gt: MOT ground-truth file of the source; measures the entry/exit accuracy.
+        tile: Tiled inference over the zones with this tile size (0: whole frame).
+    """
+    from imutils.video import FPS
+
+    start_time = time.time()
+    # Dwell heatmap of the track positions, snapshotted to instance/heatmaps for the dashboard
+    heatmap = HeatmapAccumulator(path=heatmap_path("Main"))
+    # Files credit heatmap dwell by video time, however fast they are processed
+    counter = EntryExitCounter(tracker_name, detect_every, annotate=not headless or output is not None,
+                               heatmap=heatmap, clock=source.clock())
+    if gt is not None:
+        counter.score = RunningScore(load_mot(gt), stride=source.stride, line=counter.count_line.line,
+                                     size=source.native_size)
+    detector = make_detector(model, counter.zones, tile)
+    totalFrames = 0
+
+    W, H = source.frame_size
+
+    # Annotated video: drawn and encoded on its own thread at output_fps, never blocks counting
+    video = None
+    if output is not None:
+        video = AnnotatedVideoSink(output, draw_overlay, source_fps=source.fps or 30.0,
+                                   fps=output_fps)
 
-        # Update Firestore every 100 frames
-        if totalFrames % 100 == 0:
-            current_inside = len(move_in) - len(move_out)
-            update_firestore(totalUp, totalDown, current_inside, time.time())
+    def sink(frame, result):
+        """Sink stage (main thread): Firestore sync, optional video and display."""
+        nonlocal totalFrames
+        counts, _ = result
 
-        writer.write(frame)
-        cv2.imshow("People Count", frame)
+        # Update Firestore only when the counters change
+        firestore_policy.offer("live", counts)
 
-        if cv2.waitKey(1) & 0xFF == 27:
-            break
+        if video is not None:
+            video.offer(frame, result)
+
+        if not headless:
+            with METRICS.stage("render"):
+                draw_overlay(frame, result)
+                cv2.imshow("People Count", frame)
+                key = cv2.waitKey(1) & 0xFF
+
+            if key == 27:
+                return False
 
         totalFrames += 1
         fps.update()
 
         end_time = time.time()
         num_seconds = (end_time - start_time)
-        if num_seconds > 28800:
-            break
+        if num_seconds > MAX_SECONDS:
+            return False
+        return True
 
-    # Final update to Firestore with end-of-run summary
-    final_inside = len(move_in) - len(move_out)
-    update_firestore(totalUp, totalDown, final_inside, time.time())
+    firestore_policy = ChangeOnlyPolicy(lambda label, values, now: update_firestore(uploader, *values, now))
+
+    fps = FPS().start()
+    # Decode, inference, tracking and display run as separate stages. Recorded
+    # files are never dropped and every frame reaches the tracker in order; the
+    # scheduled frames are detected up to BATCH_SIZE per call.
+    pipeline = Pipeline(source, counter.scheduler.wrap(detector),
+                        counter, sink, maxsize=BATCH_SIZE * 2, drop_policy=BLOCK,
+                        infer_batch_size=BATCH_SIZE)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        logger.info("Stopped by user")
+    logger.info("Pipeline stages:\n%s", pipeline.format_report())
+    logger.info(counter.scheduler.summary())
+    if tile:
+        logger.info("Inference: %s", detector.describe(W, H))
+    if METRICS.enabled:
+        logger.info("Stage metrics:\n%s", METRICS.format_summary())
+    if counter.score is not None:
+        logger.info("Entry/exit %s", counter.score.summary())
 
-    cap.release()
-    writer.release()
-    cv2.destroyAllWindows()
+    # Final update to Firestore with end-of-run summary
+    totalUp, totalDown, final_inside = counter.counts()
+    update_firestore(uploader, totalUp, totalDown, final_inside, time.time())
+    uploader.close()
+    heatmap.close()
+
+    source.release()
+    logger.info("Source: %s", source.stats.summary())
+    if video is not None:
+        video.close()
+    if not headless:
+        cv2.destroyAllWindows()
 
     fps.stop()
     logger.info("Elapsed time: {:.2f}".format(fps.elapsed()))
     logger.info("Approx. FPS: {:.2f}".format(fps.fps()))
 
 
-
-if __name__ == "__main__":
-    people_counter()
-    
-
-## Apply threading also
-
-#def start_people_counter():
- #    t1 = threading.Thread(target=people_counter)
-  #   t1.start()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Entry/exit people counter on a video or camera stream")
+    parser.add_argument("--source", default=video_path, help="video file or camera URL")
+    parser.add_argument("--weights", default=WEIGHTS)
+    parser.add_argument("--backend", default=BACKEND, choices=BACKENDS)
+    parser.add_argument("--tracker", default=TRACKER, choices=TRACKERS)
+    parser.add_argument("--detect-every", type=int, default=DETECT_EVERY)
+    parser.add_argument("--tile", type=int, default=INFER_TILE,
+                        help="detect the zone area as tiles of this size (0: whole frame at imgsz=640)")
+    parser.add_argument("--fps", type=float, default=SOURCE_FPS,
+                        help="frames per second taken from the source (default: all)")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                        help="count only: no drawing, no window")
+    parser.add_argument("--output", default=OUTPUT_VIDEO, help="annotated video file")
+    parser.add_argument("--no-output", dest="output", action="store_const", const=None,
+                        help="do not write an annotated video")
+    parser.add_argument("--output-fps", type=float, default=OUTPUT_FPS)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, metavar="PORT",
+                        help="per-stage latency metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-every", type=float, default=METRICS_EVERY, metavar="SECONDS",
+                        help="log a per-stage latency summary every SECONDS")
+    parser.add_argument("--gt", default=None,
+                        help="MOT ground truth of the source: shows the measured entry/exit accuracy")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # setup logger (console + app.log, rate limited; warnings and errors also go to the logs table)
+    setup_logging(log_file="app.log")
+    setup_metrics(args.metrics_port, args.metrics_every)
+    uploader = init_firestore()
+    model = load_model(args.weights, backend=args.backend, imgsz=args.tile or INFER_SIZE)
+
+    logger.info("Starting the video..")
+    # Files, webcams (index) and camera URLs (rtsp://...) all go through FrameSource
+    source = open_source(args.source, fps=args.fps)
+
+    people_counter(source, model, uploader, args.tracker, args.detect_every,
+                   headless=args.headless, output=args.output, output_fps=args.output_fps, gt=args.gt,
+                   tile=args.tile)
 
 
-#if __name__ == "__main__":
- #   start_people_counter()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Optional annotated video output.
+
+Counting never waits for the video: the sink stage only hands a sampled
+frame (one out of ``source_fps / fps``) to ``AnnotatedVideoSink.offer``, and a
+background thread draws the overlay and encodes it. If the encoder falls
+behind, the frame is dropped instead of queued.
+
+    video = AnnotatedVideoSink("out.mp4", draw, source_fps=30, fps=5)
+    video.offer(frame, result)   # in the pipeline sink, returns immediately
+    video.close()
+
+``draw(frame, result)`` is the same overlay function the display uses; in
+headless runs without a video nothing is drawn at all.
+"""
+import logging
+import queue
+import threading
+import time
+
+import cv2
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class AnnotatedVideoSink:
+    """
+    Writes annotated frames at a reduced frame rate from a background thread.
+
+    Args:
+        path: Output video file.
+        draw: ``draw(frame, result)`` annotating a frame in place.
+        source_fps: Frame rate of the frames offered.
+        fps: Frame rate of the written video.
+        fourcc: Codec of the written video.
+        maxsize: Frames waiting for the encoder before new ones are dropped.
+    """
+
+    def __init__(self, path, draw, source_fps=30.0, fps=5.0, fourcc="mp4v", maxsize=4):
+        self.path = path
+        self.draw = draw
+        self.fps = min(fps, source_fps) if source_fps and source_fps > 0 else fps
+        self.stride = max(1, int(round(source_fps / self.fps))) if source_fps and source_fps > 0 else 1
+        self.fourcc = fourcc
+        self.offered = 0
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._writer = None
+        self._thread = threading.Thread(target=self._run, name="annotated-video", daemon=True)
+        self._thread.start()
+
+    def offer(self, frame, result):
+        """
+        Queues every ``stride``-th frame for annotation; never blocks.
+
+        The frame is copied, so the caller may keep drawing on or reusing it.
+
+        Returns:
+            bool: True if the frame was queued.
+        """
+        self.offered += 1
+        if (self.offered - 1) % self.stride:
+            return False
+        try:
+            self._queue.put_nowait((frame.copy(), result))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            METRICS.count("video_dropped")
+            return False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                break
+            frame, result = item
+            try:
+                started = time.perf_counter()
+                self.draw(frame, result)
+                if self._writer is None:
+                    height, width = frame.shape[:2]
+                    self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                                   self.fps, (width, height), True)
+                self._writer.write(frame)
+                self.written += 1
+                METRICS.observe("video_write", time.perf_counter() - started)
+            except Exception:
+                logger.exception("Annotated video frame could not be written")
+
+    def close(self):
+        """Writes the queued frames and closes the file."""
+        self._queue.put(_END)
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        logger.info("Annotated video %s: %d frames at %.1f fps, %d dropped",
+                    self.path, self.written, self.fps, self.dropped)
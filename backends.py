@@ -0,0 +1,337 @@
+"""
+Inference backends for the YOLO detector.
+
+``load_detector`` returns a detector that plugs into ``detection.detect`` /
+``detect_batch`` (and everything built on them) in place of
+``ultralytics.YOLO``, with ``predict`` returning ``Detections`` and a
+``warmup`` method.
+
+- ``torch``: ``ultralytics.YOLO.predict`` itself (``UltralyticsDetector``),
+  the reference the other backends are checked against.
+- ``onnx``: ONNX Runtime on CPU with a configurable intra-op thread count.
+  The model is exported once with a dynamic batch/size axis and cached
+  under ``instance/models``. ``int8=True`` adds a dynamically quantized
+  (INT8 weights) copy next to it.
+
+ONNX goes through ``Detector``: the backend only maps a preprocessed batch to
+the raw YOLOv8 output ``(B, 4 + classes, anchors)``; letterboxing (to a
+rectangle padded to a multiple of 32, as ultralytics does), confidence
+filtering, NMS and scaling back to frame coordinates are done here.
+``Detector(TorchBackend(weights))`` runs the same steps on the PyTorch model;
+bench_backends.py and tests/test_backends.py check them against
+``YOLO.predict``.
+
+onnxruntime is only imported when the ``onnx`` backend is used.
+"""
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detection import Detections
+from metrics import METRICS
+from postprocess import nms
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "instance", "models")
+
+
+# ---------- SHARED PRE/POST-PROCESSING ----------
+STRIDE = 32
+
+
+def letterbox_shape(frame_shape, size, stride=STRIDE):
+    """
+    Scale, resized (width, height) and the smallest stride-aligned canvas (height, width) of a frame.
+
+    The longer side is scaled to ``size``; the shorter one is only padded up
+    to a multiple of ``stride``, so a 16:9 frame at 640 runs as 640x384, not 640x640.
+    """
+    height, width = frame_shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    return scale, (new_w, new_h), (int(np.ceil(new_h / stride) * stride), int(np.ceil(new_w / stride) * stride))
+
+
+def letterbox(frame, size, canvas_shape=None):
+    """
+    Resizes a BGR frame keeping its aspect ratio and pads it, centred, to ``canvas_shape``.
+
+    Args:
+        canvas_shape: (height, width) of the output; defaults to the frame's own
+            stride-aligned canvas.
+
+    Returns:
+        tuple: ``(image, scale, (pad_x, pad_y))``.
+    """
+    height, width = frame.shape[:2]
+    scale, (new_w, new_h), own = letterbox_shape(frame.shape, size)
+    canvas_h, canvas_w = canvas_shape or own
+    pad_x, pad_y = (canvas_w - new_w) // 2, (canvas_h - new_h) // 2
+    canvas = np.full((canvas_h, canvas_w, 3), 114, dtype=np.uint8)
+    resized = frame if (new_w, new_h) == (width, height) else cv2.resize(frame, (new_w, new_h),
+                                                                          interpolation=cv2.INTER_LINEAR)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+def preprocess(frames, size):
+    """
+    Letterboxes a list of frames into one float32 NCHW RGB batch in [0, 1].
+
+    Frames of one size share their stride-aligned canvas; a batch of mixed
+    sizes is padded to ``size`` x ``size``, as ``YOLO.predict`` does.
+
+    Returns:
+        tuple: ``(batch, scales, pads)``.
+    """
+    if len({frame.shape for frame in frames}) == 1:
+        canvas = letterbox_shape(frames[0].shape, size)[2]
+    else:
+        canvas = (size, size)
+    batch = np.empty((len(frames),) + canvas + (3,), dtype=np.uint8)
+    scales, pads = [], []
+    for i, frame in enumerate(frames):
+        batch[i], scale, pad = letterbox(frame, size, canvas)
+        scales.append(scale)
+        pads.append(pad)
+    batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+    batch /= 255.0
+    return batch, scales, pads
+
+
+def decode(output, scale, pad, frame_shape, conf=0.25, iou=0.7, classes=None, max_det=300):
+    """
+    Turns one image of raw YOLOv8 output into frame-space ``Detections``.
+
+    Args:
+        output: (4 + classes, anchors) array of ``cx, cy, w, h`` and class scores.
+        scale, pad: Letterbox parameters of the image.
+        frame_shape: Shape of the original frame.
+        conf: Minimum class score.
+        iou: NMS IoU threshold.
+        classes: Optional class ids to keep.
+        max_det: Maximum detections kept after NMS.
+    """
+    pred = np.asarray(output, dtype=np.float32).T
+    scores = pred[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    best = scores[np.arange(len(scores)), class_ids]
+    keep = best > conf
+    if classes is not None:
+        keep &= np.isin(class_ids, np.asarray(classes))
+    if not keep.any():
+        return Detections.empty()
+
+    cxcywh = pred[keep, :4]
+    boxes = np.concatenate([cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, :2] + cxcywh[:, 2:] / 2], axis=1)
+    dets = nms(Detections(boxes, best[keep], class_ids[keep]), iou)
+    dets = dets.select(np.arange(min(len(dets), max_det)))
+
+    # Undo the letterbox
+    height, width = frame_shape[:2]
+    dets.boxes -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=np.float32)
+    dets.boxes /= scale
+    np.clip(dets.boxes[:, 0::2], 0, width, out=dets.boxes[:, 0::2])
+    np.clip(dets.boxes[:, 1::2], 0, height, out=dets.boxes[:, 1::2])
+    return dets
+
+
+# ---------- BACKENDS ----------
+class TorchBackend:
+    """
+    PyTorch forward pass of an ultralytics ``.pt`` model.
+
+    Not what ``load_detector("torch")`` returns; it lets ``Detector``'s own
+    pre/post-processing be compared against ``YOLO.predict`` on the same weights.
+    """
+
+    name = "torch"
+
+    def __init__(self, weights, threads=None):
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        self._torch = torch
+        self.net = YOLO(weights).model.fuse(verbose=False).eval()
+
+    def forward(self, batch):
+        with self._torch.inference_mode():
+            output = self.net(self._torch.from_numpy(batch))
+        return (output[0] if isinstance(output, (list, tuple)) else output).numpy()
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session."""
+
+    name = "onnx"
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+# ---------- ONNX EXPORT CACHE ----------
+def _fresh(path, source):
+    return os.path.exists(path) and (not os.path.exists(source) or os.path.getmtime(path) >= os.path.getmtime(source))
+
+
+def export_onnx(weights, int8=False, cache_dir=MODEL_DIR):
+    """
+    Exports ``weights`` to ONNX once and returns the cached file path.
+
+    The export has dynamic batch and image size axes, so one file serves every
+    ``imgsz`` and batch size. With ``int8`` a dynamically quantized copy is
+    derived from it (and cached as well).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    path = os.path.join(cache_dir, f"{stem}.onnx")
+    if not _fresh(path, weights):
+        from ultralytics import YOLO
+
+        logger.info("Exporting %s to ONNX (one-off)", weights)
+        exported = YOLO(weights).export(format="onnx", dynamic=True, simplify=False)
+        os.replace(exported, path)
+    if not int8:
+        return path
+
+    quantized = os.path.join(cache_dir, f"{stem}-int8.onnx")
+    if not _fresh(quantized, path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to INT8 (one-off)", path)
+        quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+    return quantized
+
+
+# ---------- DETECTOR ----------
+class Detector:
+    """
+    Backend-independent replacement for ``ultralytics.YOLO`` in ``detect_batch``.
+
+    ``predict`` accepts the arguments the counters pass (``imgsz``, ``conf``,
+    ``iou``, ``classes``, ``verbose``) and returns ``Detections`` directly.
+    """
+
+    def __init__(self, backend, imgsz=640):
+        self.backend = backend
+        self.imgsz = imgsz
+
+    def predict(self, source, verbose=False, imgsz=None, conf=0.25, iou=0.7, classes=None, max_det=300):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        size = int(np.ceil((imgsz or self.imgsz) / 32) * 32)
+        with METRICS.stage("preprocess"):
+            batch, scales, pads = preprocess(frames, size)
+        with METRICS.stage("forward"):
+            outputs = self.backend.forward(batch)
+        with METRICS.stage("postprocess"):
+            return [decode(out, scale, pad, frame.shape, conf, iou, classes, max_det)
+                    for out, scale, pad, frame in zip(outputs, scales, pads, frames)]
+
+    def warmup(self, imgsz=None, batch=1):
+        """
+        Runs one blank batch so one-off initialisation (memory arenas, kernel
+        selection, lazy graph optimisation) happens before the first real frame.
+
+        Returns:
+            float: Seconds the warm-up took.
+        """
+        size = int(np.ceil((imgsz or self.imgsz) / 32) * 32)
+        started = time.perf_counter()
+        self.predict([np.zeros((size, size, 3), dtype=np.uint8)] * batch, imgsz=size)
+        elapsed = time.perf_counter() - started
+        logger.info("%s backend warmed up in %.2fs", self.backend.name, elapsed)
+        return elapsed
+
+    def raw(self, frames, imgsz=None):
+        """Raw backend output for a list of frames (used by the parity check)."""
+        size = int(np.ceil((imgsz or self.imgsz) / 32) * 32)
+        return self.backend.forward(preprocess(frames, size)[0])
+
+
+class UltralyticsDetector:
+    """
+    ``ultralytics.YOLO`` with the ``Detector`` interface: ``predict`` returns
+    ``Detections`` and ``warmup`` runs one blank batch.
+
+    This is the ``torch`` backend and the reference for the others: its
+    detections are exactly those of ``YOLO.predict`` (rectangular letterbox,
+    ultralytics NMS).
+    """
+
+    name = "torch"
+
+    def __init__(self, weights, threads=None, imgsz=640):
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = YOLO(weights)
+        self.imgsz = imgsz
+
+    def predict(self, source, verbose=False, imgsz=None, conf=0.25, iou=0.7, classes=None, max_det=300):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        with METRICS.stage("forward"):
+            results = self.model.predict(list(frames), verbose=verbose, imgsz=imgsz or self.imgsz, conf=conf,
+                                         iou=iou, classes=classes, max_det=max_det)
+        return [Detections.from_result(r) for r in results]
+
+    def warmup(self, imgsz=None, batch=1):
+        """
+        Runs one blank batch so model fusing and predictor setup happen before the first real frame.
+
+        Returns:
+            float: Seconds the warm-up took.
+        """
+        size = int(np.ceil((imgsz or self.imgsz) / 32) * 32)
+        started = time.perf_counter()
+        self.predict([np.zeros((size, size, 3), dtype=np.uint8)] * batch, imgsz=size)
+        elapsed = time.perf_counter() - started
+        logger.info("%s backend warmed up in %.2fs", self.name, elapsed)
+        return elapsed
+
+
+def load_detector(weights="yolov8n.pt", backend="torch", threads=None, int8=False, imgsz=640,
+                  cache_dir=MODEL_DIR):
+    """
+    Loads the detector for a backend.
+
+    Args:
+        weights: ultralytics ``.pt`` weights.
+        backend: One of ``BACKENDS``.
+        threads: Intra-op CPU threads (``None`` keeps the library default).
+        int8: Use the INT8-quantized ONNX model (``onnx`` backend only).
+        imgsz: Default inference size.
+        cache_dir: Where exported ONNX files are kept.
+
+    Returns:
+        UltralyticsDetector or Detector: Usable wherever a YOLO model is passed to ``detect_batch``.
+    """
+    if backend == "torch":
+        return UltralyticsDetector(weights, threads, imgsz)
+    if backend == "onnx":
+        return Detector(OnnxBackend(export_onnx(weights, int8, cache_dir), threads), imgsz)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
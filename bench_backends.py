@@ -0,0 +1,114 @@
+"""
+Parity check and fps comparison of the inference backends.
+
+The reference is the ``torch`` backend, i.e. ``ultralytics`` ``YOLO.predict``:
+
+- parity: the ONNX model and ``Detector(TorchBackend)`` (the shared
+  pre/post-processing on the PyTorch model) must reproduce its detections
+  (each reference box scoring >= 0.3 matched at IoU >= 0.9 with a score
+  within 0.02). The largest difference between the raw PyTorch and ONNX
+  outputs is printed too. The INT8 model is reported but not required to
+  pass. Exits with status 1 if an FP32 check fails.
+- speed: frames per second of each backend for each batch size.
+
+Usage:
+    python bench_backends.py [--weights yolov8n.pt] [--source video.mp4] [--frames 64]
+                             [--batch 1 4] [--threads 4] [--int8]
+"""
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from backends import Detector, TorchBackend, load_detector
+from detection import detect_batch
+from offline import read_frames
+from postprocess import iou_matrix
+
+
+def load_frames(source, count):
+    if source:
+        cap = cv2.VideoCapture(source)
+        frames = []
+        for frame in read_frames(cap):
+            frames.append(frame)
+            if len(frames) >= count:
+                break
+        cap.release()
+        return frames
+    # ultralytics ships two sample images with people in them
+    from ultralytics.utils import ASSETS
+    images = [cv2.imread(str(ASSETS / name)) for name in ("bus.jpg", "zidane.jpg")]
+    return [images[i % len(images)] for i in range(count)]
+
+
+def parity(reference, candidate, frames, iou=0.9, score_tol=0.02, min_score=0.3):
+    """
+    Returns ``(passed, matched, total)`` of ``candidate`` against ``reference``.
+
+    Only reference boxes scoring at least ``min_score`` are counted, so boxes
+    right at the confidence threshold don't fail the check by dropping out.
+    """
+    matched = total = 0
+    for ref, cand in zip(detect_batch(reference, frames), detect_batch(candidate, frames)):
+        ref = ref.select(ref.confidences >= min_score)
+        total += len(ref)
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+        overlap = iou_matrix(ref.boxes, cand.boxes)
+        best = overlap.argmax(axis=1)
+        ok = (overlap[np.arange(len(ref)), best] >= iou) & \
+             (np.abs(ref.confidences - cand.confidences[best]) <= score_tol) & \
+             (ref.class_ids == cand.class_ids[best])
+        matched += int(ok.sum())
+    return matched == total, matched, total
+
+
+def fps(model, frames, batch):
+    detect_batch(model, frames[:batch])  # warm-up
+    started = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        detect_batch(model, frames[i:i + batch])
+    return len(frames) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--source", default=None, help="video file (default: ultralytics sample images)")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--int8", action="store_true", help="also benchmark the INT8 ONNX model")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    models = {
+        "torch": load_detector(args.weights, "torch", threads=args.threads),
+        "torch-raw": Detector(TorchBackend(args.weights, args.threads)),
+        "onnx": load_detector(args.weights, "onnx", threads=args.threads),
+    }
+    if args.int8:
+        models["onnx-int8"] = load_detector(args.weights, "onnx", threads=args.threads, int8=True)
+
+    print("Parity against torch (YOLO.predict)")
+    failed = False
+    for name in [n for n in models if n != "torch"]:
+        passed, matched, total = parity(models["torch"], models[name], frames[:8])
+        print(f"  {name:<10} {matched}/{total} detections matched -> {'PASS' if passed else 'FAIL'}")
+        failed |= name != "onnx-int8" and not passed
+    raw_diff = np.abs(models["torch-raw"].raw(frames[:2]) - models["onnx"].raw(frames[:2])).max()
+    print(f"  raw max diff torch-raw vs onnx: {raw_diff:.4f}")
+
+    print("\nFrames per second")
+    print(f"  {'backend':<12}" + "".join(f"{'batch ' + str(b):>10}" for b in args.batch))
+    for name, model in models.items():
+        print(f"  {name:<12}" + "".join(f"{fps(model, frames, b):>10.1f}" for b in args.batch))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
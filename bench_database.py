@@ -0,0 +1,78 @@
+"""
+Benchmark of people_count persistence.
+
+- ``original``: the loop the counters used to run, reproduced here as the
+  baseline. One connection, INSERT and COMMIT per row, plus the logs row the
+  old ``save_count`` added for every count (its console prints are left out).
+- ``save_count``: today's per-call ``database.save_count`` (no logs row).
+- ``BatchWriter``: the persistent, batched writer.
+
+Each path writes to its own throw-away database, so the WAL mode set by
+``BatchWriter`` does not carry over and the real instance/ database is left
+untouched.
+
+Usage:
+    python bench_database.py [--rows 2000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import database
+
+
+def bench_original(rows):
+    started = time.perf_counter()
+    for i in range(rows):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("""
+        INSERT INTO people_count
+        (timestamp, source, total_count, zone_a, zone_b, zone_c, zone_d)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Bench", i % 10, 1, 2, 3, 4))
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("INSERT INTO logs (level, message) VALUES (?, ?)",
+                     ("INFO", f"People count saved: total={i % 10}, zones=(1,2,3,4)"))
+        conn.commit()
+        conn.close()
+    return time.perf_counter() - started
+
+
+def bench_save_count(rows):
+    started = time.perf_counter()
+    for i in range(rows):
+        database.save_count(total=i % 10, zone_a=1, zone_b=2, zone_c=3, zone_d=4, source="Bench")
+    return time.perf_counter() - started
+
+
+def bench_batch_writer(rows):
+    writer = database.BatchWriter()
+    started = time.perf_counter()
+    for i in range(rows):
+        writer.count(total=i % 10, zone_a=1, zone_b=2, zone_c=3, zone_d=4, source="Bench")
+    writer.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the original insert loop, save_count and BatchWriter")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in (("original", bench_original), ("save_count", bench_save_count),
+                         ("BatchWriter", bench_batch_writer)):
+            database.DB_PATH = os.path.join(tmp, f"{name}.db")
+            database.init_db()
+            elapsed = fn(args.rows)
+            print(f"{name:<12} {args.rows} rows in {elapsed:.3f}s -> {args.rows / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Decode throughput of ``sources.FrameSource`` against plain ``VideoCapture.read``.
+
+Only the decode side is measured, no inference. Each configuration reads the
+same file and delivers the same frames:
+
+- ``read+resize``: what the scripts did before, ``cap.read()`` on every frame,
+  the unwanted ones thrown away, the kept ones resized afterwards,
+- ``FrameSource``: skipped frames ``grab()``-ed without decoding, the kept
+  ones resized straight into a preallocated ring of buffers.
+
+Without ``--source`` a synthetic 1920x1080 clip is written to a temporary file
+first.
+
+Usage:
+    python bench_decode.py [--source video.mp4] [--frames 600] [--stride 1 3] [--size 960x540]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from sources import FrameSource, parse_size
+
+
+def synthetic_video(path, frames, size=(1920, 1080), fps=30.0):
+    """Writes a moving-noise clip so the decoder has real work to do."""
+    rng = np.random.default_rng(0)
+    texture = rng.integers(0, 255, size=(size[1], size[0] * 2, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size, True)
+    for i in range(frames):
+        shift = (8 * i) % size[0]
+        writer.write(np.ascontiguousarray(texture[:, shift:shift + size[0]]))
+    writer.release()
+    return path
+
+
+def plain_read(path, stride, size, limit):
+    cap = cv2.VideoCapture(path)
+    delivered = count = 0
+    started = time.perf_counter()
+    while count < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        count += 1
+        if count % stride:
+            continue
+        if size is not None:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        delivered += 1
+    elapsed = time.perf_counter() - started
+    cap.release()
+    return delivered, elapsed
+
+
+def frame_source(path, stride, size, limit):
+    source = FrameSource(path, stride=stride, size=size, buffers=8)
+    delivered = 0
+    started = time.perf_counter()
+    for _ in source:
+        delivered += 1
+        if source.stats.grabbed >= limit:
+            break
+    elapsed = time.perf_counter() - started
+    source.release()
+    return delivered, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode throughput benchmark")
+    parser.add_argument("--source", default=None, help="video file (default: synthetic 1080p clip)")
+    parser.add_argument("--frames", type=int, default=600, help="source frames read per run")
+    parser.add_argument("--stride", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--size", default="960x540", help="output WIDTHxHEIGHT ('' keeps native)")
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    path, temporary = args.source, None
+    if path is None:
+        temporary = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False).name
+        path = synthetic_video(temporary, args.frames)
+
+    try:
+        print(f"{'method':<14} {'stride':>6} {'frames':>7} {'ms/frame':>9} {'fps':>8}")
+        for stride in args.stride:
+            for name, run in (("read+resize", plain_read), ("FrameSource", frame_source)):
+                delivered, elapsed = run(path, stride, size, args.frames)
+                per_frame = 1000.0 * elapsed / delivered if delivered else 0.0
+                fps = delivered / elapsed if elapsed > 0 else 0.0
+                print(f"{name:<14} {stride:>6} {delivered:>7} {per_frame:>9.2f} {fps:>8.1f}")
+    finally:
+        if temporary:
+            os.remove(temporary)
+
+
+if __name__ == "__main__":
+    main()
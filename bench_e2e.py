@@ -0,0 +1,404 @@
+"""
+End-to-end benchmark of the counting pipelines on synthetic video.
+
+A synthetic clip is generated per configuration (resolution x crowd size):
+coloured "people" walk up or down through the frame, crossing the count line
+of zones.json, and new ones enter as others leave. The clip is written as
+``clip.mp4`` with its ground truth next to it as ``gt.txt`` in MOT format
+(``frame, id, left, top, width, height, 1, 1, 1``), so it is decoded through
+``sources.FrameSource`` like a real file.
+
+Each pipeline is then run in a fresh interpreter (so peak RSS is its own),
+assembled from its script's components with the script's own defaults:
+
+- ``people_counter``: ``ZoneCounter`` per-zone counts,
+- ``deep``: ``TrackCounter`` confirmed tracks,
+- ``Main``: ``EntryExitCounter`` line crossings (``INFER_TILE``: whole frame or tiles).
+
+Frames go through ``pipeline.Pipeline`` with the ``block`` policy so every
+frame is counted and lines up with the ground truth. The detector is either
+``stub`` (connected components of the rendered boxes, with an optional
+simulated cost per image, no model needed) or ``yolo`` (the script's own
+``load_model`` on the chosen backend).
+
+Reported per run: fps, end-to-end latency p50/p95/p99 (plus every stage of
+``metrics``), peak RSS, detector duty cycle and count accuracy against the
+ground truth (per-frame people count for people_counter/deep, entries and
+exits for Main). ``--json`` writes the results; ``--compare`` reads an
+earlier file and flags runs whose fps, p95 latency or accuracy got worse.
+
+Usage:
+    python bench_e2e.py [--pipelines people_counter deep Main] [--sizes 640x360 1280x720]
+                        [--people 5 20] [--frames 300] [--detector stub] [--stub-ms 0]
+                        [--tracker sort] [--json e2e.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from evaluation import count_error, crossing_events, load_mot
+
+PIPELINES = ("people_counter", "deep", "Main")
+DETECTORS = ("stub", "yolo")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKGROUND = 30
+
+
+# ---------- CLIPS ----------
+def synthetic_scene(frames, people, size=(640, 360), fps=30.0, seed=0):
+    """
+    Yields ``(ids, ltrb)`` of the people visible on each frame.
+
+    About ``people`` walkers are in the scene at any time. Each walks up or
+    down at its own speed with a little sideways drift; when it leaves the
+    frame a new walker (new id) enters from the top or bottom edge.
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+
+    def spawn(n, inside):
+        h = height * rng.uniform(0.12, 0.22, n)
+        wh = np.stack([h * rng.uniform(0.35, 0.5, n), h], axis=1)
+        down = rng.random(n) < 0.5
+        speed = height / (fps * rng.uniform(4.0, 10.0, n))
+        vel = np.stack([speed * rng.uniform(-0.3, 0.3, n), np.where(down, speed, -speed)], axis=1)
+        x = rng.uniform(0.05, 0.95, n) * width
+        y = rng.uniform(0, height, n) if inside else np.where(down, -h / 2, height + h / 2)
+        return np.stack([x, y], axis=1), vel, wh
+
+    pos, vel, wh = spawn(people, inside=True)
+    ids = np.arange(1, people + 1)
+    next_id = people + 1
+    for _ in range(frames):
+        ltrb = np.hstack([pos - wh / 2, pos + wh / 2]).astype(np.float32)
+        visible = (pos[:, 1] >= 0) & (pos[:, 1] < height)
+        yield ids[visible].copy(), ltrb[visible]
+
+        pos += vel
+        # Bounce off the side walls, respawn whoever left at the top or bottom
+        left, right = pos[:, 0] < wh[:, 0] / 2, pos[:, 0] > width - wh[:, 0] / 2
+        vel[left, 0] = np.abs(vel[left, 0])
+        vel[right, 0] = -np.abs(vel[right, 0])
+        gone = (pos[:, 1] < -wh[:, 1] / 2) | (pos[:, 1] > height + wh[:, 1] / 2)
+        if gone.any():
+            n = int(gone.sum())
+            pos[gone], vel[gone], wh[gone] = spawn(n, inside=False)
+            ids[gone] = np.arange(next_id, next_id + n)
+            next_id += n
+
+
+def write_clip(directory, frames, people, size=(640, 360), fps=30.0, seed=0):
+    """
+    Renders a synthetic scene to ``directory/clip.mp4`` and its ground truth to ``directory/gt.txt``.
+
+    Returns:
+        tuple: ``(clip path, ground truth path)``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    clip, gt = os.path.join(directory, "clip.mp4"), os.path.join(directory, "gt.txt")
+    width, height = size
+    colours = np.random.default_rng(seed + 1).integers(80, 255, size=(256, 3))
+    writer = cv2.VideoWriter(clip, cv2.VideoWriter_fourcc(*"mp4v"), fps, size, True)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    with open(gt, "w") as f:
+        for index, (ids, ltrb) in enumerate(synthetic_scene(frames, people, size, fps, seed), start=1):
+            frame[:] = BACKGROUND
+            boxes = np.round(ltrb).astype(int)
+            for pid, (x1, y1, x2, y2) in zip(ids.tolist(), boxes.tolist()):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), colours[pid % len(colours)].tolist(), -1)
+            writer.write(frame)
+            for pid, (x1, y1, x2, y2) in zip(ids.tolist(), ltrb.tolist()):
+                f.write(f"{index},{pid},{x1:.1f},{y1:.1f},{x2 - x1:.1f},{y2 - y1:.1f},1,1,1\n")
+    writer.release()
+    return clip, gt
+
+
+# ---------- STUB DETECTOR ----------
+class StubDetector:
+    """
+    Stand-in for ``backends.Detector`` on synthetic clips.
+
+    Finds the rendered people as connected components brighter than the
+    background, so overlapping people merge like real occlusions do.
+    ``cost_ms`` per image is slept to simulate a model's inference time.
+    """
+
+    name = "stub"
+
+    def __init__(self, cost_ms=0.0, threshold=BACKGROUND + 30, min_area=0.0004):
+        self.cost_ms = cost_ms
+        self.threshold = threshold
+        self.min_area = min_area
+
+    def _detect(self, frame):
+        from detection import Detections
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        mask = (gray > self.threshold).astype(np.uint8)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4)
+        stats = stats[1:]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.min_area * gray.size]
+        if not len(stats):
+            return Detections.empty()
+        x, y, w, h = (stats[:, k].astype(np.float32) for k in
+                      (cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP, cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT))
+        fill = stats[:, cv2.CC_STAT_AREA] / np.maximum(w * h, 1)
+        return Detections(np.stack([x, y, x + w, y + h], axis=1), np.clip(fill, 0.5, 0.95),
+                          np.zeros(len(stats), dtype=np.int32))
+
+    def predict(self, source, verbose=False, imgsz=None, conf=0.25, iou=0.7, classes=None, max_det=300):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if self.cost_ms:
+            time.sleep(self.cost_ms * len(frames) / 1000.0)
+        return [self._detect(frame) for frame in frames]
+
+    def warmup(self, imgsz=None, batch=1):
+        return 0.0
+
+
+# ---------- CHILD (one pipeline, fresh interpreter) ----------
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (``None`` where ``resource`` is missing)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def build(name, args):
+    """
+    Assembles one pipeline from its script's components.
+
+    Returns:
+        tuple: ``(infer, track, scheduler, settings)`` for ``Pipeline``;
+        ``settings`` holds its ``maxsize`` and ``infer_batch_size``.
+    """
+    import importlib
+
+    from trackers import make_tracker
+    from zones import ZoneEngine
+
+    module = importlib.import_module(name)
+    stub = StubDetector(args.stub_ms) if args.detector == "stub" else None
+    common = ["--backend", args.backend]
+    if args.threads and name != "Main":
+        common += ["--threads", str(args.threads)]
+    if args.tracker:
+        common += ["--tracker", args.tracker]
+    if args.detect_every:
+        common += ["--detect-every", str(args.detect_every)]
+
+    if name == "people_counter":
+        opts = module.parse_args(common + ["--headless"])
+        model = stub or module.load_model(opts)
+        scheduler = module.make_scheduler(opts, live=False)
+        counter = module.ZoneCounter(make_tracker(opts.tracker, max_age=30), ZoneEngine.load(opts.zones), scheduler)
+        return module.make_infer(model, scheduler), counter, scheduler, {"maxsize": 2, "infer_batch_size": 1}
+
+    if name == "deep":
+        from scheduling import DetectionScheduler
+
+        opts = module.parse_args(common + ["--headless"])
+        model = stub or module.load_model(opts)
+        scheduler = DetectionScheduler(every=opts.detect_every, track_trigger=False)
+        counter = module.TrackCounter(make_tracker(opts.tracker, max_age=50, n_init=3), scheduler)
+        return module.make_infer(model, scheduler), counter, scheduler, {"maxsize": 4, "infer_batch_size": 1}
+
+    if name == "Main":
+        opts = module.parse_args(common)
+        model = stub or module.load_model(opts.weights, backend=opts.backend, threads=args.threads,
+                                          imgsz=opts.tile or module.INFER_SIZE)
+        counter = module.EntryExitCounter(opts.tracker, opts.detect_every, annotate=False)
+        detector = module.make_detector(model, counter.zones, opts.tile)
+        return (counter.scheduler.wrap(detector), counter, counter.scheduler,
+                {"maxsize": module.BATCH_SIZE * 2, "infer_batch_size": module.BATCH_SIZE})
+
+    raise ValueError(f"Unknown pipeline '{name}', expected one of {', '.join(PIPELINES)}")
+
+
+def accuracy(name, results, truth, track, width, height):
+    if name == "people_counter":
+        from postprocess import centroids
+
+        zones = track.zones
+        report = count_error([total for _, total in results], [len(ids) for ids, _ in truth])
+        zone_truth = np.array([zones.counts(centroids(ltrb), width, height) for _, ltrb in truth])
+        zone_pred = np.array([counts for counts, _ in results])
+        report["zone_mae"] = round(float(np.abs(zone_pred - zone_truth).mean()), 3) if len(results) else 0.0
+        return report
+
+    if name == "deep":
+        return count_error([len(boxes) for _, _, boxes in results], [len(ids) for ids, _ in truth])
+
+    # Main: entries/exits at the end of the clip
+    _, directions = crossing_events(truth, track.count_line.line, width, height)
+    up, down = int(np.count_nonzero(directions < 0)), int(np.count_nonzero(directions > 0))
+    pred_up, pred_down, _ = track.counts()
+    error = abs(pred_up - up) + abs(pred_down - down)
+    return {
+        "up": [pred_up, up],
+        "down": [pred_down, down],
+        "accuracy": round(max(0.0, 1.0 - error / max(1, up + down)), 4),
+    }
+
+
+def child(name, args):
+    from metrics import METRICS
+    from pipeline import BLOCK, Pipeline
+    from sources import FrameSource
+
+    METRICS.enable()
+    started = time.perf_counter()
+    infer, track, scheduler, settings = build(name, args)
+    load_s = time.perf_counter() - started
+    rss_loaded = peak_rss_mb()
+
+    source = FrameSource(os.path.join(args.clip, "clip.mp4"), stride=args.stride)
+    width, height = source.frame_size
+    results = []
+
+    def sink(frame, result):
+        results.append(result)
+        return True
+
+    pipeline = Pipeline(source, infer, track, sink, maxsize=settings["maxsize"], drop_policy=BLOCK,
+                        infer_batch_size=settings["infer_batch_size"])
+    started = time.perf_counter()
+    pipeline.run()
+    wall_s = time.perf_counter() - started
+    source.release()
+
+    truth = load_mot(os.path.join(args.clip, "gt.txt"), len(results) * args.stride)[::args.stride]
+    stages = METRICS.snapshot()["stages"]
+    e2e = stages.get("end_to_end", {})
+    print(json.dumps({
+        "pipeline": name,
+        "frames": len(results),
+        "load_s": round(load_s, 3),
+        "wall_s": round(wall_s, 3),
+        "fps": round(len(results) / wall_s, 2) if wall_s > 0 else 0.0,
+        "latency_ms": {k: e2e.get(f"{k}_ms", 0.0) for k in ("p50", "p95", "p99", "max")},
+        "stages": stages,
+        "rss_loaded_mb": rss_loaded,
+        "peak_rss_mb": peak_rss_mb(),
+        "detect_fraction": round(scheduler.detect_fraction(), 3),
+        "accuracy": accuracy(name, results, truth, track, width, height),
+    }))
+
+
+# ---------- PARENT ----------
+def measure(name, clip, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", name, "--clip", clip,
+               "--detector", args.detector, "--backend", args.backend, "--stub-ms", str(args.stub_ms),
+               "--stride", str(args.stride)]
+    for flag, value in (("--threads", args.threads), ("--tracker", args.tracker),
+                        ("--detect-every", args.detect_every)):
+        if value:
+            command += [flag, str(value)]
+    result = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_key(run):
+    return f"{run['pipeline']}@{run['size']}x{run['people']}"
+
+
+def compare(results, path, tolerance):
+    """Prints the change against an earlier JSON file; returns the keys that regressed."""
+    with open(path) as f:
+        baseline = {run_key(run): run for run in json.load(f)["results"]}
+    regressed = []
+    print(f"\n{'run':<32} {'fps':>9} {'p95':>9} {'accuracy':>9}  (vs {path})")
+    for run in results:
+        old = baseline.get(run_key(run))
+        if old is None:
+            continue
+        fps = run["fps"] / old["fps"] - 1.0 if old["fps"] else 0.0
+        p95 = run["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1.0 if old["latency_ms"]["p95"] else 0.0
+        acc = run["accuracy"]["accuracy"] - old["accuracy"]["accuracy"]
+        worse = fps < -tolerance or p95 > tolerance or acc < -0.02
+        if worse:
+            regressed.append(run_key(run))
+        print(f"{run_key(run):<32} {100 * fps:>+8.1f}% {100 * p95:>+8.1f}% {acc:>+9.3f}"
+              + ("  REGRESSION" if worse else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the counting pipelines on synthetic video")
+    parser.add_argument("--pipelines", nargs="+", default=list(PIPELINES), choices=PIPELINES)
+    parser.add_argument("--sizes", nargs="+", default=["640x360", "1280x720"], help="clip resolutions WIDTHxHEIGHT")
+    parser.add_argument("--people", type=int, nargs="+", default=[5, 20], help="crowd sizes (people in the scene)")
+    parser.add_argument("--frames", type=int, default=300, help="frames per clip")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of the clips")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stride", type=int, default=1, help="count every STRIDE-th frame (grab-skipped)")
+    parser.add_argument("--detector", default="stub", choices=DETECTORS,
+                        help="stub: boxes found in the rendered frame; yolo: the script's own model")
+    parser.add_argument("--stub-ms", type=float, default=0.0, help="simulated inference time per image of the stub")
+    parser.add_argument("--backend", default="torch", choices=("torch", "onnx"), help="backend of the yolo detector")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads of the yolo detector")
+    parser.add_argument("--tracker", default=None, help="tracker of every pipeline (default: each script's own)")
+    parser.add_argument("--detect-every", type=int, default=None, help="detection interval (default: each script's own)")
+    parser.add_argument("--keep-clips", default=None, help="write the clips to this directory and keep them")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--compare", default=None, help="earlier --json file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative fps/p95 change reported as a regression by --compare")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--clip", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args)
+        return
+
+    from sources import parse_size
+
+    workdir = args.keep_clips or tempfile.mkdtemp(prefix="bench_e2e_")
+    results = []
+    print(f"{'pipeline':<16} {'clip':>14} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>8} {'detect':>7} {'accuracy':>9}")
+    try:
+        for size_text in args.sizes:
+            size = parse_size(size_text)
+            for people in args.people:
+                clip = os.path.join(workdir, f"{size[0]}x{size[1]}_{people}")
+                write_clip(clip, args.frames, people, size, args.fps, args.seed)
+                for name in args.pipelines:
+                    run = measure(name, clip, args)
+                    run.update(size=f"{size[0]}x{size[1]}", people=people)
+                    results.append(run)
+                    lat, rss = run["latency_ms"], run["peak_rss_mb"]
+                    print(f"{name:<16} {run['size'] + ' x' + str(people):>14} {run['fps']:>8.1f} "
+                          f"{lat['p50']:>8.2f} {lat['p95']:>8.2f} {lat['p99']:>8.2f} "
+                          f"{rss if rss is not None else float('nan'):>8.1f} {run['detect_fraction']:>7.2f} "
+                          f"{run['accuracy']['accuracy']:>9.3f}")
+    finally:
+        if not args.keep_clips:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"detector": args.detector, "stub_ms": args.stub_ms, "backend": args.backend,
+                       "tracker": args.tracker, "frames": args.frames, "seed": args.seed,
+                       "python": sys.version.split()[0], "results": results}, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of the people_count query layer.
+
+Fills a throw-away database with synthetic counts for several cameras (one
+row per camera per second, going back in time from now) through the same
+insert path as the writer, then times the typical dashboard queries.
+
+Usage:
+    python bench_queries.py [--rows 2000000] [--sources 4]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import database
+import queries
+
+
+def populate(rows, n_sources, chunk=50_000):
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    names = [f"Camera{i}" for i in range(n_sources)]
+    end = int(time.time())
+    start = end - rows // n_sources
+    buf = []
+    for i in range(rows):
+        a, b, c, d = (random.randint(0, 5) for _ in range(4))
+        buf.append(database.count_row(a + b + c + d, a, b, c, names[i % n_sources], d,
+                                      now=start + i // n_sources))
+        if len(buf) >= chunk:
+            with conn:
+                database.insert_counts(conn, buf)
+            buf = []
+    if buf:
+        with conn:
+            database.insert_counts(conn, buf)
+    conn.close()
+    return names, end
+
+
+def timed(label, fn, repeat=20):
+    fn()  # warm the page cache
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    ms = (time.perf_counter() - started) * 1000 / repeat
+    size = len(result) if hasattr(result, "__len__") else 1
+    print(f"{label:<36} {ms:8.2f} ms  ({size} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time people_count queries")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--sources", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        started = time.perf_counter()
+        names, now = populate(args.rows, args.sources)
+        print(f"inserted {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        cam = names[0]
+        day = now - 24 * 3600
+        timed("latest 50 (all cameras)", lambda: queries.latest(50))
+        timed("latest 50 (one camera)", lambda: queries.latest(50, cam))
+        timed("raw rows, last 10 min, one camera", lambda: queries.counts_between(now - 600, now, cam))
+        timed("24h history, one camera (minute)", lambda: queries.history(day, now, cam))
+        timed("7d history, one camera (hour)", lambda: queries.history(now - 7 * 86400, now, cam))
+        timed("24h zone peaks, one camera", lambda: queries.zone_peaks(day, now, cam))
+
+
+if __name__ == "__main__":
+    main()
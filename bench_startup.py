@@ -0,0 +1,170 @@
+"""
+Startup-time benchmark of the entry points.
+
+Every entry point is started in a fresh interpreter (nothing cached in
+``sys.modules``), which then times its own startup phases up to the first
+counted frame:
+
+- import: importing the entry module (must not load models or open devices),
+- load: loading the detector,
+- warmup: the explicit warm-up batch (skipped with ``--no-warmup``),
+- first frame: detection plus tracking/counting of one frame through the
+  entry point's own components.
+
+``total`` is the wall time from launching the interpreter to the first
+counted frame, so it also includes interpreter start-up. Running once with
+and once without ``--no-warmup`` shows where the one-off initialisation
+cost lands.
+
+Usage:
+    python bench_startup.py [--entries Main people_counter deep detect] [--source video.mp4]
+                            [--backend torch] [--no-warmup] [--repeat 3] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ENTRIES = ("Main", "people_counter", "deep", "detect")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ---------- CHILD (one entry point, fresh interpreter) ----------
+def first_frame(source):
+    import cv2
+    import numpy as np
+
+    if source:
+        cap = cv2.VideoCapture(source)
+        ok, frame = cap.read()
+        cap.release()
+        if ok:
+            return frame
+    return np.random.default_rng(0).integers(0, 255, size=(720, 1280, 3), dtype=np.uint8)
+
+
+def build(module, entry, backend):
+    """
+    Loads the entry point's detector and counting stage.
+
+    Returns:
+        tuple: ``(model, warmup_size, count)`` where ``count(frame)`` detects and counts one frame.
+    """
+    if entry == "Main":
+        size = module.INFER_TILE or module.INFER_SIZE
+        model = module.load_detector(module.WEIGHTS, backend=backend, imgsz=size)
+        counter = module.EntryExitCounter()
+        detector = module.make_detector(model, counter.zones)
+        return model, size, lambda frame: counter(frame, counter.scheduler.wrap(detector)([frame])[0])
+
+    if entry == "people_counter":
+        from trackers import make_tracker
+        from zones import ZoneEngine
+
+        args = module.parse_args(["--backend", backend])
+        model = module.load_detector("yolov8n.pt", backend=backend)
+        scheduler = module.make_scheduler(args)
+        counter = module.ZoneCounter(make_tracker(args.tracker, max_age=30), ZoneEngine.load(args.zones), scheduler)
+        infer = module.make_infer(model, scheduler)
+        return model, None, lambda frame: counter(frame, infer([frame])[0])
+
+    if entry == "deep":
+        from scheduling import DetectionScheduler
+        from trackers import make_tracker
+
+        args = module.parse_args(["--backend", backend])
+        model = module.load_detector("yolov8s.pt", backend=backend)
+        scheduler = DetectionScheduler(every=args.detect_every, track_trigger=False)
+        counter = module.TrackCounter(make_tracker(args.tracker, max_age=50, n_init=3), scheduler)
+        infer = module.make_infer(model, scheduler)
+        return model, 1080, lambda frame: counter(frame, infer([frame])[0])
+
+    if entry == "detect":
+        model = module.load_detector("yolov8n.pt", backend=backend)
+        counter = module.PeopleCounter(model)
+        return model, None, lambda frame: counter(frame, counter.infer([frame])[0])
+
+    raise ValueError(f"Unknown entry point '{entry}', expected one of {', '.join(ENTRIES)}")
+
+
+def child(entry, source, backend, warmup):
+    import importlib
+
+    timings = {}
+    started = time.perf_counter()
+    module = importlib.import_module(entry)
+    timings["import"] = time.perf_counter() - started
+
+    heavy = sorted(name for name in ("torch", "ultralytics", "onnxruntime", "firebase_admin", "flask",
+                                     "deep_sort_realtime", "scipy", "imutils") if name in sys.modules)
+
+    frame = first_frame(source)
+    phase = time.perf_counter()
+    model, size, count = build(module, entry, backend)
+    timings["load"] = time.perf_counter() - phase
+
+    phase = time.perf_counter()
+    if warmup:
+        model.warmup(imgsz=size)
+    timings["warmup"] = time.perf_counter() - phase
+
+    phase = time.perf_counter()
+    count(frame)
+    timings["first_frame"] = time.perf_counter() - phase
+
+    print(json.dumps({"timings": timings, "imported_at_import": heavy}))
+
+
+# ---------- PARENT ----------
+def measure(entry, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", entry, "--backend", args.backend]
+    if args.source:
+        command += ["--source", args.source]
+    if args.no_warmup:
+        command.append("--no-warmup")
+
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{entry} failed:\n{result.stderr.strip()}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["timings"]["total"] = total
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-counted-frame of the entry points")
+    parser.add_argument("--entries", nargs="+", default=list(ENTRIES), choices=ENTRIES)
+    parser.add_argument("--source", default=None, help="video file whose first frame is counted (default: synthetic)")
+    parser.add_argument("--backend", default="torch", choices=("torch", "onnx"))
+    parser.add_argument("--no-warmup", action="store_true", help="skip the explicit warm-up batch")
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per entry point (median reported)")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.source, args.backend, not args.no_warmup)
+        return
+
+    phases = ("import", "load", "warmup", "first_frame", "total")
+    print(f"{'entry':<16}" + "".join(f"{name + ' s':>14}" for name in phases))
+    results = {}
+    for entry in args.entries:
+        runs = [measure(entry, args) for _ in range(max(1, args.repeat))]
+        median = {name: sorted(run["timings"][name] for run in runs)[len(runs) // 2] for name in phases}
+        results[entry] = {"median": median, "runs": runs}
+        print(f"{entry:<16}" + "".join(f"{median[name]:>14.3f}" for name in phases))
+        if runs[0]["imported_at_import"]:
+            print(f"{'':<16}heavy modules loaded by the import: {', '.join(runs[0]['imported_at_import'])}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "warmup": not args.no_warmup, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
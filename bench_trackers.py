@@ -0,0 +1,147 @@
+"""
+Benchmark of the tracker backends on the same clip.
+
+Default: a synthetic clip of coloured "people" walking across a 640x360
+frame, some of them crossing each other, with jittered and occasionally
+missed detections derived from the known boxes. Every backend gets exactly
+the same frames and detections; reported per backend:
+
+- tracker-only fps (detection time excluded, it is the same for all),
+- ID switches: a ground-truth person matched (IoU >= 0.5) to a different
+  track id than on its previous matched frame,
+- number of distinct track ids (ground truth: ``--people``).
+
+With ``--detect-every 1 3`` each backend also runs with detections on every
+third frame only (``trackers.predict_tracks`` on the others, as the counters
+do), showing the ID-switch cost of skipping detections.
+
+With ``--source video.mp4`` the detections come from YOLO (run once and
+cached); without ground truth only fps and distinct ids are reported.
+
+Usage:
+    python bench_trackers.py [--frames 600] [--people 12] [--trackers deepsort sort centroid]
+                             [--detect-every 1 3]
+    python bench_trackers.py --source video.mp4 --weights yolov8n.pt
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from postprocess import to_deepsort
+from detection import Detections
+from trackers import TRACKERS, iou_matrix, make_tracker, predict_tracks
+
+WIDTH, HEIGHT = 640, 360
+
+
+# ---------- CLIPS ----------
+def synthetic_clip(frames, people, miss_rate=0.05, jitter=2.0, seed=0):
+    """Returns ``(frames, detections, ground_truth)`` lists; ground truth is ``(ids, ltrb)`` per frame."""
+    rng = np.random.default_rng(seed)
+    size = rng.uniform((24, 60), (40, 100), size=(people, 2))
+    start = rng.uniform((0, 0), (WIDTH, HEIGHT), size=(people, 2))
+    velocity = rng.uniform(-3, 3, size=(people, 2))
+    colours = rng.integers(40, 255, size=(people, 3))
+
+    clip, detections, truth = [], [], []
+    for f in range(frames):
+        centre = start + velocity * f
+        # Bounce off the borders so everyone stays in view
+        centre = np.abs((centre + (WIDTH, HEIGHT)) % (2 * np.array([WIDTH, HEIGHT])) - (WIDTH, HEIGHT))
+        ltrb = np.hstack([centre - size / 2, centre + size / 2]).astype(np.float32)
+
+        frame = np.full((HEIGHT, WIDTH, 3), 30, dtype=np.uint8)
+        for box, colour in zip(ltrb.astype(int).tolist(), colours.tolist()):
+            cv2.rectangle(frame, tuple(box[:2]), tuple(box[2:]), colour, -1)
+        clip.append(frame)
+
+        seen = rng.random(people) >= miss_rate
+        noisy = ltrb[seen] + rng.normal(0, jitter, size=(int(seen.sum()), 4)).astype(np.float32)
+        confs = rng.uniform(0.5, 0.95, size=len(noisy)).astype(np.float32)
+        detections.append(Detections(noisy, confs, np.zeros(len(noisy), dtype=np.int32)))
+        truth.append((np.arange(people), ltrb))
+    return clip, detections, truth
+
+
+def video_clip(source, weights, max_frames):
+    from ultralytics import YOLO
+    from detection import detect
+    from offline import read_frames
+
+    model = YOLO(weights)
+    cap = cv2.VideoCapture(source)
+    clip, detections = [], []
+    for frame in read_frames(cap):
+        clip.append(frame)
+        detections.append(detect(model, frame, classes=[0]))
+        if len(clip) >= max_frames:
+            break
+    cap.release()
+    return clip, detections, None
+
+
+# ---------- METRICS ----------
+def id_switches(history, truth):
+    """Counts MOT-style ID switches of ``history`` (per frame ``(ids, ltrb)``) against ``truth``."""
+    last = {}
+    switches = 0
+    for (track_ids, boxes), (gt_ids, gt_boxes) in zip(history, truth):
+        if len(track_ids) == 0:
+            continue
+        iou = iou_matrix(gt_boxes, boxes)
+        best = iou.argmax(axis=1)
+        matched = iou[np.arange(len(gt_ids)), best] >= 0.5
+        for gt, k in zip(gt_ids[matched].tolist(), best[matched].tolist()):
+            track_id = track_ids[k]
+            if gt in last and last[gt] != track_id:
+                switches += 1
+            last[gt] = track_id
+    return switches
+
+
+def run_backend(name, clip, detections, every=1):
+    tracker = make_tracker(name, max_age=30, n_init=3)
+    history = []
+    started = time.perf_counter()
+    for i, (frame, dets) in enumerate(zip(clip, detections)):
+        if i % every:
+            tracks = predict_tracks(tracker, frame)
+        else:
+            tracks = tracker.update_tracks(to_deepsort(dets), frame=frame)
+        confirmed = [t for t in tracks if t.is_confirmed()]
+        history.append(([t.track_id for t in confirmed],
+                        np.array([t.to_ltrb() for t in confirmed], dtype=np.float32).reshape(-1, 4)))
+    elapsed = time.perf_counter() - started
+    return len(clip) / elapsed, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tracker backends on one clip")
+    parser.add_argument("--trackers", nargs="+", default=list(TRACKERS), choices=TRACKERS)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--people", type=int, default=12)
+    parser.add_argument("--source", default=None, help="video file (uses YOLO detections, no ground truth)")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--detect-every", type=int, nargs="+", default=[1],
+                        help="run the tracker update every N frames (predict_tracks in between)")
+    args = parser.parse_args()
+
+    if args.source:
+        clip, detections, truth = video_clip(args.source, args.weights, args.frames)
+    else:
+        clip, detections, truth = synthetic_clip(args.frames, args.people)
+    print(f"{len(clip)} frames, {sum(len(d) for d in detections)} detections\n")
+
+    print(f"{'tracker':<10} {'every':>6} {'fps':>10} {'ID switches':>12} {'distinct ids':>13}")
+    for name in args.trackers:
+        for every in args.detect_every:
+            fps, history = run_backend(name, clip, detections, every)
+            distinct = len({i for ids, _ in history for i in ids})
+            switches = id_switches(history, truth) if truth is not None else "-"
+            print(f"{name:<10} {every:>6} {fps:>10.1f} {switches:>12} {distinct:>13}")
+
+
+if __name__ == "__main__":
+    main()
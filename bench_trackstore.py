@@ -0,0 +1,120 @@
+"""
+Soak benchmark of per-track state: the old TrackableObject-style dict of
+growing centroid lists vs the bounded ``TrackStore``.
+
+Synthetic people walk through a 500x280 frame (as Main.py's resized frames)
+with a new one arriving every few frames; track ids are never reused, as
+with DeepSORT. Both paths do the work Main.py does per frame: append the
+centroid, compute the direction against the mean past position and mark a
+track counted once it has moved past the middle line that way. Memory
+(tracemalloc) and per-frame time are reported at regular checkpoints; the
+store stays flat while the legacy dict keeps growing.
+
+Usage:
+    python bench_trackstore.py [--hours 8] [--fps 10] [--checkpoints 8]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from tracks import TrackStore
+
+WIDTH, HEIGHT = 500, 280
+MIDDLE = HEIGHT // 2
+
+
+class _LegacyTrack:
+    """Same fields as tracker.trackableobject.TrackableObject."""
+
+    def __init__(self, object_id, centroid):
+        self.objectID = object_id
+        self.centroids = [centroid]
+        self.counted = False
+
+
+def simulate(frames, arrival_every=5, seed=0):
+    """Yields ``(track_ids, points)`` per frame for a stream of walking people."""
+    rng = random.Random(seed)
+    people = {}
+    next_id = 1
+    for frame in range(frames):
+        if frame % arrival_every == 0:
+            speed = rng.choice((-1, 1)) * rng.uniform(1.0, 3.0)
+            y = 0.0 if speed > 0 else HEIGHT - 1.0
+            people[str(next_id)] = [rng.uniform(0, WIDTH - 1), y, speed]
+            next_id += 1
+        for track_id in [i for i, (_, y, _) in people.items() if not 0 <= y < HEIGHT]:
+            del people[track_id]
+        for person in people.values():
+            person[1] += person[2]
+        ids = list(people)
+        points = np.array([(x, y) for x, y, _ in people.values()], dtype=np.int32).reshape(-1, 2)
+        yield ids, points
+
+
+def run_legacy(stream):
+    objects = {}
+    unique_ids = set()
+    for ids, points in stream:
+        for track_id, centroid in zip(ids, map(tuple, points.tolist())):
+            unique_ids.add(track_id)
+            to = objects.get(track_id)
+            if to is None:
+                to = _LegacyTrack(track_id, centroid)
+            else:
+                direction = centroid[1] - np.mean([c[1] for c in to.centroids])
+                to.centroids.append(centroid)
+                if not to.counted and ((direction < 0 and centroid[1] < MIDDLE)
+                                       or (direction > 0 and centroid[1] > MIDDLE)):
+                    to.counted = True
+            objects[track_id] = to
+        yield len(objects)
+
+
+def run_store(stream):
+    store = TrackStore(capacity=256, history=32, max_age=30)
+    for ids, points in stream:
+        slots, directions = store.update(ids, points)
+        ys = points[:, 1]
+        store.counted[slots[((directions < 0) & (ys < MIDDLE)) | ((directions > 0) & (ys > MIDDLE))]] = True
+        store.evict(ids)
+        yield len(store)
+
+
+def soak(name, runner, frames, checkpoints):
+    every = max(1, frames // checkpoints)
+    tracemalloc.start()
+    started = last = time.perf_counter()
+    print(f"{name}")
+    print(f"{'frame':>10} {'tracks':>8} {'memory KiB':>12} {'us/frame':>10}")
+    for frame, tracks in enumerate(runner(simulate(frames)), 1):
+        if frame % every == 0:
+            now = time.perf_counter()
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"{frame:>10} {tracks:>8} {current / 1024:>12.0f} {(now - last) * 1e6 / every:>10.1f}")
+            last = now
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"total {time.perf_counter() - started:.1f}s, peak {peak / 1024:.0f} KiB\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-run memory of per-track state")
+    parser.add_argument("--hours", type=float, default=8.0, help="simulated run length (Main.py caps at 8h)")
+    parser.add_argument("--fps", type=float, default=10.0, help="counted frames per second")
+    parser.add_argument("--checkpoints", type=int, default=8)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    frames = int(args.hours * 3600 * args.fps)
+    print(f"{frames:,} frames ({args.hours}h at {args.fps} fps)\n")
+    soak("TrackStore", run_store, frames, args.checkpoints)
+    if not args.skip_legacy:
+        soak("legacy TrackableObject dict", run_legacy, frames, args.checkpoints)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Background Firestore sync.
+
+The counting loop only calls ``FirestoreUploader.update``, which is local and
+never blocks on the network:
+
+- the live document is coalesced: only the latest state is ever sent,
+- history entries are appended to a local SQLite outbox and sent in batches
+  (one Firestore ``batch().commit()`` per round, live document included),
+- failures are retried with exponential backoff; the outbox survives
+  restarts, so nothing queued during an outage is lost.
+
+``FakeFirestoreClient`` mimics the small part of the Firestore client API that
+is used here, so the uploader can be exercised without network access.
+"""
+import itertools
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- OUTBOX ----------
+class Outbox:
+    """SQLite-backed queue of pending live state and history entries."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS live (id INTEGER PRIMARY KEY CHECK (id = 1), data TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT)")
+
+    def put(self, data, history=True):
+        payload = json.dumps(data)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO live (id, data) VALUES (1, ?)", (payload,))
+            if history:
+                self._conn.execute("INSERT INTO history (data) VALUES (?)", (payload,))
+
+    def pending(self, limit):
+        """Returns ``(live_payload_or_None, [(history_id, data), ...])``."""
+        with self._lock:
+            live = self._conn.execute("SELECT data FROM live WHERE id = 1").fetchone()
+            rows = self._conn.execute("SELECT id, data FROM history ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return (live[0] if live else None), [(i, json.loads(d)) for i, d in rows]
+
+    def ack(self, live_payload, history_ids):
+        """Removes sent entries; the live row is kept if it changed while sending."""
+        with self._lock, self._conn:
+            if live_payload is not None:
+                self._conn.execute("DELETE FROM live WHERE id = 1 AND data = ?", (live_payload,))
+            if history_ids:
+                self._conn.execute("DELETE FROM history WHERE id <= ?", (max(history_ids),))
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- UPLOADER ----------
+class FirestoreUploader:
+    """
+    Sends people-counter updates to Firestore from a background thread.
+
+    Args:
+        client: ``firestore.client()`` or ``FakeFirestoreClient``.
+        outbox_path: SQLite file holding unsent updates.
+        live_collection, live_document: Location of the coalesced live document.
+        history_collection: Collection receiving one document per history entry.
+        batch_size: Maximum history entries per commit (Firestore allows 500 writes).
+        interval: Seconds between send rounds when nothing new is queued.
+        max_backoff: Upper bound of the retry delay in seconds.
+        coalesce_delay: Seconds to wait after a wake-up so several updates
+            share one commit.
+        server_timestamp: Value stored as ``last_updated`` on send, e.g.
+            ``firestore.SERVER_TIMESTAMP``. The client-side epoch time is kept in
+            ``client_time`` either way.
+    """
+
+    def __init__(self, client, outbox_path, live_collection="people_counter", live_document="live",
+                 history_collection="people_counter_history", batch_size=100, interval=2.0,
+                 max_backoff=60.0, coalesce_delay=0.5, server_timestamp=None):
+        self.client = client
+        self.outbox = Outbox(outbox_path)
+        self.live_collection = live_collection
+        self.live_document = live_document
+        self.history_collection = history_collection
+        self.batch_size = min(batch_size, 499)
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.coalesce_delay = coalesce_delay
+        self.server_timestamp = server_timestamp
+
+        self.sent = 0
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="firestore-sync", daemon=True)
+        self._thread.start()
+
+    def update(self, data, history=True):
+        """Queues a new live state (and a history entry). Never touches the network."""
+        data = dict(data)
+        data.setdefault("client_time", time.time())
+        self.outbox.put(data, history=history)
+        self._wake.set()
+
+    def _decorate(self, data):
+        if self.server_timestamp is not None:
+            data = dict(data, last_updated=self.server_timestamp)
+        return data
+
+    def send_once(self):
+        """Sends one batch. Returns True if there was nothing left to send."""
+        live, history = self.outbox.pending(self.batch_size)
+        if live is None and not history:
+            return True
+
+        batch = self.client.batch()
+        if live is not None:
+            ref = self.client.collection(self.live_collection).document(self.live_document)
+            batch.set(ref, self._decorate(json.loads(live)))
+        for _, data in history:
+            batch.set(self.client.collection(self.history_collection).document(), self._decorate(data))
+        batch.commit()
+
+        self.outbox.ack(live, [i for i, _ in history])
+        self.sent += len(history)
+        return len(history) < self.batch_size
+
+    def _run(self):
+        backoff = 0.0
+        while not self._stop.is_set():
+            if backoff:
+                # New updates do not cut a backoff short; they wait in the outbox
+                self._stop.wait(backoff)
+            else:
+                self._wake.wait(timeout=self.interval)
+                # Let a burst of updates accumulate so they share one commit
+                self._stop.wait(self.coalesce_delay)
+            if self._stop.is_set():
+                # close() sends the last batch once this thread has exited
+                break
+            self._wake.clear()
+            try:
+                while not self.send_once() and not self._stop.is_set():
+                    pass
+                backoff = 0.0
+            except Exception as e:
+                self.failures += 1
+                backoff = min(self.max_backoff, max(1.0, backoff * 2)) * random.uniform(0.8, 1.2)
+                logger.warning("Firestore sync failed (%s); %d entries kept in outbox, retrying in %.1fs",
+                               e, self.outbox.size(), backoff)
+
+    def close(self, timeout=5.0):
+        """
+        Stops the thread, then sends at most one last batch. Unsent entries stay in the outbox.
+
+        If the thread is still inside a send after ``timeout`` seconds, nothing
+        more is sent and the outbox is left open for it; whatever it does not
+        commit is picked up by the next run.
+        """
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning("Firestore sync still busy after %.1fs; %d entries kept for next run",
+                           timeout, self.outbox.size())
+            return
+        try:
+            self.send_once()
+        except Exception as e:
+            logger.warning("Final Firestore sync failed (%s); %d entries kept for next run",
+                           e, self.outbox.size())
+        self.outbox.close()
+
+
+# ---------- FAKE CLIENT ----------
+class FakeFirestoreClient:
+    """
+    In-memory stand-in for ``firestore.client()`` used for offline testing.
+
+    ``fail_next(n)`` makes the next ``n`` commits raise ``ConnectionError``.
+    Committed documents are available in ``collections[name][doc_id]``.
+    """
+
+    def __init__(self):
+        self.collections = {}
+        self.commits = 0
+        self._failures = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def fail_next(self, n=1):
+        with self._lock:
+            self._failures += n
+
+    def collection(self, name):
+        return _FakeCollection(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def _commit(self, writes):
+        with self._lock:
+            if self._failures:
+                self._failures -= 1
+                raise ConnectionError("fake network outage")
+            for collection, doc_id, data in writes:
+                self.collections.setdefault(collection, {})[doc_id] = dict(data)
+            self.commits += 1
+
+
+class _FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, doc_id=None):
+        return _FakeDocument(self.client, self.name, doc_id or f"auto{next(self.client._ids)}")
+
+    def add(self, data):
+        doc = self.document()
+        doc.set(data)
+        return doc
+
+
+class _FakeDocument:
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data):
+        self.client._commit([(self.collection, self.id, data)])
+
+
+class _FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref.collection, ref.id, data))
+
+    def commit(self):
+        self.client._commit(self.writes)
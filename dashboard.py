@@ -1,146 +1,262 @@
 
+"""
+Live people count dashboard (Dash).
+
+Update model: nothing is pushed to the browser. Every open page polls the
+server through a ``dcc.Interval`` every ``REFRESH_MS``. A poll is cheap: if the
+``LiveStore`` version and the heatmap revision are unchanged, the callback
+stops with ``PreventUpdate``. Otherwise the page receives only what it has not
+seen: new trend points via ``extendData``, and patched bar and heatmap values.
+The figures data is computed once per store version for all viewers
+(``SharedView``).
+
+Counts come from a ``LiveStore``: published in-process by a counter
+(``serve``), or tailed from the database by ``livestate.DatabaseFeed`` when
+run standalone.
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.express as px
-import pandas as pd
-import numpy as np
-import random
-import time
+import plotly.graph_objects as go
+
+from zones import ZoneEngine
+from livestate import LiveStore, DatabaseFeed
+from heatmap import HeatmapReader
 
 # ================= CONFIG =================
-ZONES = ["Entrance Gate", "Corridor 1", "Lobby Area", "Exit Gate"]
 ZONE_LIMIT = 3
+HISTORY_POINTS = 900        # trend line: last 15 minutes at one point per second
+REFRESH_MS = 1500          # browser poll interval (dcc.Interval)
+HEATMAP_REFRESH = 5.0       # seconds between two heatmap reads
+
+
+def zone_labels(zones_path=None):
+    # Zone labels come from the same config the counters use (zones.json)
+    return [zone.label for zone in ZoneEngine.load(zones_path).zones]
+
+
+# ================= SHARED VIEW =================
+class SharedView:
+    """
+    Server-side figures data derived from the store once per store version.
+
+    Every viewer's callback reads the same cached result, so the dashboard
+    does the same work for one viewer as for a hundred. The heatmap is
+    re-read at most every ``HEATMAP_REFRESH`` seconds.
+    """
+
+    def __init__(self, store, heatmap=None):
+        self.store = store
+        self.heatmap = heatmap
+        self._lock = threading.Lock()
+        self._view = None
+        self._heat = (None, None)   # (revision, rounded grid as lists)
+        self._heat_read = 0.0
+
+    def current(self):
+        with self._lock:
+            self._refresh_heat()
+            if self._view is None or self._view["version"] != self.store.version \
+                    or self._view["heat_revision"] != self._heat[0]:
+                self._view = self._compute()
+            return self._view
+
+    def _refresh_heat(self):
+        now = time.monotonic()
+        if self.heatmap is None or now - self._heat_read < HEATMAP_REFRESH:
+            return
+        self._heat_read = now
+        revision, grid = self.heatmap.snapshot()
+        if revision != self._heat[0]:
+            self._heat = (revision, grid.round(1).tolist() if grid is not None else None)
+
+    def _compute(self):
+        version, total, zone_counts, _ = self.store.latest()
+        counts = zone_counts.tolist()
+        return {
+            "version": version,
+            "heat_revision": self._heat[0],
+            "heat": self._heat[1],
+            "total": total,
+            "counts": counts,
+            "alerts": [zone_alert(zone, count) for zone, count in zip(self.store.zones, counts)],
+        }
+
+
+def zone_alert(zone, count):
+    if count >= ZONE_LIMIT:
+        return dbc.Alert(
+            f"⚠ {zone}: {count} (LIMIT EXCEEDED)",
+            color="danger",
+            className="fw-bold mb-2"
+        )
+    return dbc.Alert(
+        f"✔ {zone}: {count} (OK)",
+        color="success",
+        className="mb-2"
+    )
+
+
+def _labels(times):
+    return [datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") for t in times.tolist()]
+
+
+# ================= FIGURES (built once per page load) =================
+def bar_figure(zones, counts):
+    fig = go.Figure(go.Bar(x=zones, y=counts, text=counts, textposition="outside"))
+    fig.update_layout(title="Zone-wise Population", xaxis_title="Zone", yaxis_title="Count")
+    return fig
+
+
+def heatmap_figure(grid):
+    # Dwell time (person-seconds, decayed) per cell of the frame; row 0 is the top of the image
+    fig = go.Figure(go.Heatmap(z=grid or [[0]], colorscale="Inferno", colorbar={"title": "person-s"}))
+    fig.update_layout(title="Heatmap (Track Positions)")
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False, autorange="reversed", scaleanchor="x")
+    return fig
+
+
+def trend_figure(zones, times, zone_counts):
+    labels = _labels(times)
+    fig = go.Figure([go.Scatter(x=labels, y=zone_counts[:, i].tolist(), mode="lines", name=zone)
+                     for i, zone in enumerate(zones)])
+    fig.update_layout(title="Population Trend (Recent)", xaxis_title="Time")
+    return fig
 
-# ================= MOCK LIVE DATA =================
-# (For presentation – no camera dependency)
-zone_counts = {zone: 0 for zone in ZONES}
-history = []
-
-def generate_live_counts():
-    global zone_counts, history
-    for zone in ZONES:
-        zone_counts[zone] = random.randint(0, 4)
-    total = sum(zone_counts.values())
-    history.append({
-        "Time": len(history),
-        "Total": total,
-        **zone_counts
-    })
-    if len(history) > 15:
-        history.pop(0)
 
 # ================= DASH APP =================
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
-app.title = "Live People Count Dashboard"
-
-app.layout = dbc.Container(fluid=True, children=[
-
-    # Header
-    dbc.Row(dbc.Col([
-        html.H2("Live People Count Dashboard", className="fw-bold"),
-        html.P("YOLOv8-based Crowd Monitoring System", className="text-muted"),
-        html.Hr()
-    ])),
-
-    # Total Count Card
-    dbc.Row(dbc.Col(
-        dbc.Card(
-            dbc.CardBody([
-                html.H6("Total People"),
-                html.H1(id="total-count", className="fw-bold text-primary")
+def create_app(store, heatmap=None):
+    """
+    Builds the dashboard app.
+
+    Args:
+        store: ``LiveStore`` with the counts.
+        heatmap: Object with ``snapshot() -> (revision, grid)``: a
+            ``HeatmapAccumulator`` in-process or a ``HeatmapReader`` of the snapshots.
+    """
+    shared = SharedView(store, heatmap)
+    zones = store.zones
+
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
+    app.title = "Live People Count Dashboard"
+
+    def serve_layout():
+        # New viewers start from the full history in memory, then only receive increments
+        view = shared.current()
+        seq, times, _, zone_counts = store.history()
+        return dbc.Container(fluid=True, children=[
+
+            # Header
+            dbc.Row(dbc.Col([
+                html.H2("Live People Count Dashboard", className="fw-bold"),
+                html.P("YOLOv8-based Crowd Monitoring System", className="text-muted"),
+                html.Hr()
+            ])),
+
+            # Total Count Card
+            dbc.Row(dbc.Col(
+                dbc.Card(
+                    dbc.CardBody([
+                        html.H6("Total People"),
+                        html.H1(view["total"], id="total-count", className="fw-bold text-primary")
+                    ]),
+                    className="shadow-sm text-center"
+                ), width=4
+            )),
+
+            html.Br(),
+
+            # Graphs
+            dbc.Row([
+                dbc.Col(dcc.Graph(id="zone-bar", figure=bar_figure(zones, view["counts"])), width=6),
+                dbc.Col(dcc.Graph(id="zone-heatmap", figure=heatmap_figure(view["heat"])), width=6)
             ]),
-            className="shadow-sm text-center"
-        ), width=4
-    )),
-
-    html.Br(),
-
-    # Graphs
-    dbc.Row([
-        dbc.Col(dcc.Graph(id="zone-bar"), width=6),
-        dbc.Col(dcc.Graph(id="zone-heatmap"), width=6)
-    ]),
-
-    dbc.Row([
-        dbc.Col(dcc.Graph(id="trend-line"), width=12)
-    ]),
-
-    html.Hr(),
-
-    # Zone Status Alerts
-    dbc.Row(dbc.Col(
-        html.Div(id="zone-status"),
-        width=12
-    )),
-
-    dcc.Interval(id="timer", interval=1500)
-])
-
-# ================= CALLBACK =================
-@app.callback(
-    Output("zone-bar", "figure"),
-    Output("zone-heatmap", "figure"),
-    Output("trend-line", "figure"),
-    Output("total-count", "children"),
-    Output("zone-status", "children"),
-    Input("timer", "n_intervals")
-)
-def update_dashboard(n):
-    generate_live_counts()
-
-    df = pd.DataFrame(history)
-    counts = [zone_counts[z] for z in ZONES]
-    total = sum(counts)
-
-    # ----- Bar Chart -----
-    bar_df = pd.DataFrame({"Zone": ZONES, "Count": counts})
-    fig_bar = px.bar(
-        bar_df, x="Zone", y="Count", text="Count",
-        title="Zone-wise Population"
-    )
-    fig_bar.update_traces(textposition="outside")
-
-    # ----- Heatmap -----
-    heat = np.array(counts).reshape(1, -1)
-    fig_heat = px.imshow(
-        heat,
-        x=ZONES,
-        y=["Population"],
-        text_auto=True,
-        title="Heatmap (Detection Coordinates)"
-    )
 
-    # ----- Trend Line -----
-    fig_trend = px.line(
-        df, x="Time", y=ZONES,
-        title="Population Trend (Recent)"
+            dbc.Row([
+                dbc.Col(dcc.Graph(id="trend-line", figure=trend_figure(zones, times, zone_counts)), width=12)
+            ]),
+
+            html.Hr(),
+
+            # Zone Status Alerts
+            dbc.Row(dbc.Col(
+                html.Div(view["alerts"], id="zone-status"),
+                width=12
+            )),
+
+            # What this viewer has already received; the page polls every REFRESH_MS
+            dcc.Store(id="seen", data={"seq": seq, "version": view["version"],
+                                       "heat": view["heat_revision"]}),
+            dcc.Interval(id="timer", interval=REFRESH_MS)
+        ])
+
+    app.layout = serve_layout
+
+    # ================= CALLBACK =================
+    @app.callback(
+        Output("trend-line", "extendData"),
+        Output("zone-bar", "figure"),
+        Output("zone-heatmap", "figure"),
+        Output("total-count", "children"),
+        Output("zone-status", "children"),
+        Output("seen", "data"),
+        Input("timer", "n_intervals"),
+        State("seen", "data")
     )
+    def update_dashboard(n, seen):
+        view = shared.current()
+        if seen["version"] == view["version"] and seen["heat"] == view["heat_revision"]:
+            raise PreventUpdate
+
+        # ----- Trend Line: append only the points this viewer has not seen -----
+        seq, times, _, zone_counts = store.history(since=seen["seq"])
+        extend = no_update
+        if len(times):
+            labels = _labels(times)
+            extend = (dict(x=[labels] * len(zones), y=zone_counts.T.tolist()),
+                      list(range(len(zones))), store.capacity)
+
+        # ----- Bar Chart / Heatmap: patch the values, keep the figures -----
+        bar = Patch()
+        bar["data"][0]["y"] = view["counts"]
+        bar["data"][0]["text"] = view["counts"]
+        heat = no_update
+        if seen["heat"] != view["heat_revision"] and view["heat"] is not None:
+            heat = Patch()
+            heat["data"][0]["z"] = view["heat"]
+
+        return extend, bar, heat, view["total"], view["alerts"], \
+            {"seq": seq, "version": view["version"], "heat": view["heat_revision"]}
+
+    return app
+
+
+def serve(store, heatmap=None, host="127.0.0.1", port=8050):
+    """Runs the dashboard on a daemon thread next to a counter publishing into ``store``."""
+    app = create_app(store, heatmap)
+    thread = threading.Thread(target=app.run, kwargs={"host": host, "port": port, "debug": False},
+                              name="dashboard", daemon=True)
+    thread.start()
+    return app
 
-    # ----- Zone Alerts -----
-    alerts = []
-    for zone in ZONES:
-        count = zone_counts[zone]
-        if count >= ZONE_LIMIT:
-            alerts.append(
-                dbc.Alert(
-                    f"⚠ {zone}: {count} (LIMIT EXCEEDED)",
-                    color="danger",
-                    className="fw-bold mb-2"
-                )
-            )
-        else:
-            alerts.append(
-                dbc.Alert(
-                    f"✔ {zone}: {count} (OK)",
-                    color="success",
-                    className="mb-2"
-                )
-            )
-
-    return fig_bar, fig_heat, fig_trend, total, alerts
 
 # ================= RUN =================
+# Standalone: the counters run in other processes and write to the database;
+# one feed thread tails it for every viewer.
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Live people count dashboard")
+    parser.add_argument("--zones", default=None, help="zone config JSON (default: zones.json)")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between two database reads")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
 
+    live = LiveStore(zone_labels(args.zones), capacity=HISTORY_POINTS)
+    DatabaseFeed(live, interval=args.poll).start()
+    create_app(live, HeatmapReader()).run(port=args.port, debug=False)
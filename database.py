@@ -2,9 +2,16 @@
 
 import sqlite3
 import os
+import atexit
+import logging
+import threading
+import time
 from datetime import datetime
 
-print("📦 database.py LOADED")
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+logger.debug("📦 database.py LOADED")
 
 # ---------- PATH SETUP ----------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,13 +19,21 @@ INSTANCE_DIR = os.path.join(BASE_DIR, "instance")
 os.makedirs(INSTANCE_DIR, exist_ok=True)
 DB_PATH = os.path.join(INSTANCE_DIR, "people_count.db")
 
+# Rollup tables maintained incrementally on every people_count / people_count_bucket insert
+ROLLUPS = {"people_count_minute": 60, "people_count_hour": 3600}
+COUNT_COLUMNS = ("total_count", "zone_a", "zone_b", "zone_c", "zone_d")
+_ROLLUP_COLUMNS = ("total", "zone_a", "zone_b", "zone_c", "zone_d")
+# Longest time a stored count is assumed to hold when no newer row of its source follows
+HOLD_LIMIT = 300
+
+
 # ---------- INIT DATABASE ----------
 def init_db():
-    """Create people_count and logs tables if they don't exist"""
+    """Create people_count (+ rollups), people_count_bucket and logs tables if they don't exist"""
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
 
-    # People count table
+    # People count table (ts_epoch: integer UNIX time, used by every query)
     cur.execute("""
     CREATE TABLE IF NOT EXISTS people_count (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,10 +43,71 @@ def init_db():
         zone_a INTEGER,
         zone_b INTEGER,
         zone_c INTEGER,
-        zone_d INTEGER
+        zone_d INTEGER,
+        ts_epoch INTEGER
     )
     """)
 
+    # Per-minute and per-hour rollups, keyed by (source, bucket_start).
+    # seconds: time covered by the bucket's counts; <zone>_sum: count x seconds held
+    rebuild = False
+    for table in ROLLUPS:
+        columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+        if columns and "seconds" not in columns:
+            # Rollups from before time weighting: recreated and rebuilt below
+            cur.execute(f"DROP TABLE {table}")
+            rebuild = True
+        stats = ",\n        ".join(f"{c}_sum REAL, {c}_max INTEGER" for c in _ROLLUP_COLUMNS)
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            source TEXT,
+            bucket_start INTEGER,
+            samples INTEGER,
+            seconds REAL,
+            {stats},
+            PRIMARY KEY (source, bucket_start)
+        ) WITHOUT ROWID
+        """)
+
+    # Databases created before ts_epoch existed: add and backfill it once
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(people_count)")]
+    if "ts_epoch" not in columns:
+        cur.execute("ALTER TABLE people_count ADD COLUMN ts_epoch INTEGER")
+        cur.execute("""
+        UPDATE people_count
+        SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+        WHERE ts_epoch IS NULL
+        """)
+        rebuild = True
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_count_source_ts ON people_count (source, ts_epoch)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_count_ts ON people_count (ts_epoch)")
+
+    # Aggregated counts (one row per source and time bucket)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS people_count_bucket (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bucket_start INTEGER,
+        bucket_seconds INTEGER,
+        source TEXT,
+        samples INTEGER,
+        total_min INTEGER, total_max INTEGER, total_mean REAL,
+        zone_a_min INTEGER, zone_a_max INTEGER, zone_a_mean REAL,
+        zone_b_min INTEGER, zone_b_max INTEGER, zone_b_mean REAL,
+        zone_c_min INTEGER, zone_c_max INTEGER, zone_c_mean REAL,
+        zone_d_min INTEGER, zone_d_max INTEGER, zone_d_mean REAL
+    )
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_bucket_source_start
+    ON people_count_bucket (source, bucket_seconds, bucket_start)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bucket_source_ts ON people_count_bucket (source, bucket_start)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bucket_ts ON people_count_bucket (bucket_start)")
+
+    if rebuild:
+        rebuild_rollups(conn)
+
     # Logs table
     cur.execute("""
     CREATE TABLE IF NOT EXISTS logs (
@@ -44,28 +120,167 @@ def init_db():
 
     conn.commit()
     conn.close()
-    print("✅ Database initialized with tables: people_count + logs")
+    logger.info("✅ Database initialized with tables: people_count + rollups + people_count_bucket + logs")
+
+# ---------- PEOPLE COUNT ROWS + ROLLUPS ----------
+def _sample_upsert_sql(table):
+    """Adds stored samples (count and maxima) to a rollup bucket."""
+    sums = ", ".join(f"{c}_sum" for c in _ROLLUP_COLUMNS)
+    maxes = ", ".join(f"{c}_max" for c in _ROLLUP_COLUMNS)
+    updates = ",\n        ".join(f"{c}_max = MAX({c}_max, excluded.{c}_max)" for c in _ROLLUP_COLUMNS)
+    return f"""
+    INSERT INTO {table} (source, bucket_start, samples, seconds, {sums}, {maxes})
+    VALUES (?, ?, ?, 0, {", ".join("0" for _ in _ROLLUP_COLUMNS)}, {", ".join("?" for _ in _ROLLUP_COLUMNS)})
+    ON CONFLICT (source, bucket_start) DO UPDATE SET
+        samples = samples + excluded.samples,
+        {updates}
+    """
+
+
+def _hold_upsert_sql(table):
+    """Adds the time a count was held (seconds and count x seconds) to a rollup bucket."""
+    sums = ", ".join(f"{c}_sum" for c in _ROLLUP_COLUMNS)
+    maxes = ", ".join(f"{c}_max" for c in _ROLLUP_COLUMNS)
+    updates = ",\n        ".join(
+        f"{c}_sum = {c}_sum + excluded.{c}_sum, {c}_max = MAX({c}_max, excluded.{c}_max)"
+        for c in _ROLLUP_COLUMNS)
+    return f"""
+    INSERT INTO {table} (source, bucket_start, samples, seconds, {sums}, {maxes})
+    VALUES (?, ?, 0, ?, {", ".join("?" for _ in _ROLLUP_COLUMNS * 2)})
+    ON CONFLICT (source, bucket_start) DO UPDATE SET
+        seconds = seconds + excluded.seconds,
+        {updates}
+    """
+
+
+_SAMPLE_SQL = {table: _sample_upsert_sql(table) for table in ROLLUPS}
+_HOLD_SQL = {table: _hold_upsert_sql(table) for table in ROLLUPS}
+
+
+def count_row(total, zone_a, zone_b, zone_c, source="Webcam", zone_d=0, now=None):
+    """Builds a people_count row: (timestamp, ts_epoch, source, total, zone_a..zone_d)."""
+    now = time.time() if now is None else now
+    return (datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"), int(now),
+            source, total, zone_a, zone_b, zone_c, zone_d)
+
+
+def credit_rollups(conn, holds):
+    """
+    Adds held counts to the rollups, split at bucket boundaries.
+
+    Args:
+        conn: Open connection (the caller owns the transaction).
+        holds: ``(source, start, end, means, maxes)`` tuples: the counts
+            ``means`` (peak ``maxes``) held from ``start`` to ``end`` (UNIX seconds).
+    """
+    for table, step in ROLLUPS.items():
+        params = []
+        for source, start, end, means, maxes in holds:
+            t = start
+            while t < end:
+                bucket = t - t % step
+                stop = min(end, bucket + step)
+                params.append((source, bucket, stop - t, *[m * (stop - t) for m in means], *maxes))
+                t = stop
+        conn.executemany(_HOLD_SQL[table], params)
+
+
+def _rollup_counts(conn, rows, groups):
+    """
+    Adds people_count rows to the rollups.
+
+    Every row counts as a sample and towards the maxima. The sums are
+    time-weighted: the rows of a source sharing one ts_epoch form a group whose
+    mean is held until the source's next ts_epoch (at most ``HOLD_LIMIT``
+    seconds), so rollup means average over time, not over stored rows (with
+    the ``change`` policy a row is only stored when the count changes).
+
+    Args:
+        rows: people_count rows, in time order per source.
+        groups: ``source -> (ts_epoch, [values, ...])`` of the groups still
+            open; updated in place.
+    """
+    for table, step in ROLLUPS.items():
+        conn.executemany(_SAMPLE_SQL[table], [(src, ts - ts % step, 1, *values)
+                                              for _, ts, src, *values in rows])
+    holds = []
+    for _, ts, src, *values in rows:
+        group = groups.get(src)
+        if group is not None and ts == group[0]:
+            group[1].append(values)
+            continue
+        if group is not None and ts > group[0]:
+            held = list(zip(*group[1]))
+            holds.append((src, group[0], min(ts, group[0] + HOLD_LIMIT),
+                          [sum(v) / len(v) for v in held], [max(v) for v in held]))
+        groups[src] = (ts, [values])
+    credit_rollups(conn, holds)
+
+
+def insert_counts(conn, rows):
+    """Inserts people_count rows and updates the minute/hour rollups in the same transaction."""
+    names = ", ".join(COUNT_COLUMNS)
+    groups = {}
+    for source in {row[2] for row in rows}:
+        # The newest stored rows of the source are held until its first new one
+        stored = conn.execute(f"""
+        SELECT ts_epoch, {names} FROM people_count
+        WHERE source = ? AND ts_epoch = (SELECT MAX(ts_epoch) FROM people_count WHERE source = ?)
+        """, (source, source)).fetchall()
+        if stored:
+            groups[source] = (stored[0][0], [list(r[1:]) for r in stored])
+    conn.executemany(f"""
+    INSERT INTO people_count
+    (timestamp, ts_epoch, source, {names})
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    _rollup_counts(conn, rows, groups)
+
+
+def _rollup_buckets(conn, rows):
+    """Adds people_count_bucket rows to the rollups: each bucket's means are held for the whole bucket."""
+    for table, step in ROLLUPS.items():
+        conn.executemany(_SAMPLE_SQL[table], [(row[2], row[0] - row[0] % step, row[3], *row[5::3])
+                                              for row in rows])
+    credit_rollups(conn, [(row[2], row[0], row[0] + row[1], row[6::3], row[5::3]) for row in rows])
+
+
+def insert_buckets(conn, rows):
+    """Inserts people_count_bucket rows (without id) and updates the rollups in the same transaction."""
+    conn.executemany(f"INSERT INTO people_count_bucket VALUES (NULL, {', '.join('?' * 19)})", rows)
+    _rollup_buckets(conn, rows)
+
+
+def rebuild_rollups(conn, chunk=50_000):
+    """Recomputes every rollup table from people_count and people_count_bucket (used after migrations)."""
+    for table in ROLLUPS:
+        conn.execute(f"DELETE FROM {table}")
+    cursor = conn.execute(f"""
+    SELECT timestamp, ts_epoch, source, {", ".join(COUNT_COLUMNS)}
+    FROM people_count
+    WHERE ts_epoch IS NOT NULL
+    ORDER BY source, ts_epoch, id
+    """)
+    groups = {}
+    rows = cursor.fetchmany(chunk)
+    while rows:
+        _rollup_counts(conn, rows, groups)
+        rows = cursor.fetchmany(chunk)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(people_count_bucket)")][1:]
+    _rollup_buckets(conn, conn.execute(f"SELECT {', '.join(columns)} FROM people_count_bucket").fetchall())
+
 
 # ---------- SAVE PEOPLE COUNT ----------
 def save_count(total, zone_a, zone_b, zone_c, source="Webcam", zone_d=0):
     conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
 
-    cur.execute("""
-    INSERT INTO people_count
-    (timestamp, source, total_count, zone_a, zone_b, zone_c, zone_d)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        source, total, zone_a, zone_b, zone_c, zone_d
-    ))
+    with conn:
+        insert_counts(conn, [count_row(total, zone_a, zone_b, zone_c, source, zone_d)])
 
-    conn.commit()
     conn.close()
-    print(f"💾 People count saved: total={total}, zones=({zone_a},{zone_b},{zone_c},{zone_d})")
-
-    # Also add a log automatically
-    save_log("INFO", f"People count saved: total={total}, zones=({zone_a},{zone_b},{zone_c},{zone_d})")
+    # Per-frame chatter: sampled on the console, never written to the logs table
+    logger.debug("💾 People count saved: total=%s, zones=(%s,%s,%s,%s)",
+                 total, zone_a, zone_b, zone_c, zone_d, extra={"per_frame": True})
 
 # ---------- SAVE LOG ----------
 def save_log(level, message):
@@ -77,10 +292,188 @@ def save_log(level, message):
     """, (level, message))
     conn.commit()
     conn.close()
-    print(f"📝 Log saved: [{level}] {message}")
+    # The row is already stored; the DB log handler must not write it again
+    number = logging.getLevelName(str(level).upper())
+    logger.log(number if isinstance(number, int) else logging.INFO,
+               "📝 [%s] %s", level, message, extra={"db_written": True})
+
+# ---------- BATCHED WRITER ----------
+class BatchWriter:
+    """
+    Persistent, buffered writer for people_count, people_count_bucket and logs rows.
+
+    Rows are kept in memory and written by a background thread with one
+    connection (WAL mode) using executemany inside a single transaction.
+    A flush happens when ``max_rows`` rows are waiting, every ``max_delay``
+    seconds, on ``flush()`` and on ``close()`` (also registered with atexit).
+
+    A batch that fails to write is rolled back and kept; it is retried after
+    ``max_delay`` seconds, ahead of the rows buffered since. Only on
+    ``close()`` is a batch that still fails dropped (and logged).
+    """
+
+    def __init__(self, db_path=None, max_rows=500, max_delay=1.0):
+        self.db_path = db_path or DB_PATH
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._counts = []
+        self._buckets = []
+        self._logs = []
+        self._enqueued = 0
+        self._written = 0
+        self.failures = 0
+        self._flush_requested = False
+        self._stopping = False
+
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ----- producers -----
+    def count(self, total, zone_a, zone_b, zone_c, source="Webcam", zone_d=0):
+        """Buffers a people_count row (same arguments as save_count)."""
+        row = count_row(total, zone_a, zone_b, zone_c, source, zone_d)
+        with self._cond:
+            self._counts.append(row)
+            self._enqueued += 1
+            self._notify_if_full()
+
+    def bucket(self, source, bucket_start, bucket_seconds, samples, mins, maxs, means):
+        """
+        Buffers one aggregated people_count_bucket row.
+
+        ``mins``, ``maxs`` and ``means`` hold (total, zone_a, zone_b, zone_c, zone_d).
+        """
+        row = [bucket_start, bucket_seconds, source, samples]
+        for lo, hi, mean in zip(mins, maxs, means):
+            row += [int(lo), int(hi), float(mean)]
+        with self._cond:
+            self._buckets.append(tuple(row))
+            self._enqueued += 1
+            self._notify_if_full()
+
+    def log(self, level, message):
+        """Buffers a logs row (same arguments as save_log)."""
+        with self._cond:
+            self._logs.append((level, message))
+            self._enqueued += 1
+            self._notify_if_full()
+
+    def _pending(self):
+        return len(self._counts) + len(self._buckets) + len(self._logs)
+
+    def _notify_if_full(self):
+        if self._pending() >= self.max_rows:
+            self._cond.notify_all()
+
+    # ----- flushing -----
+    def flush(self, timeout=None):
+        """
+        Blocks until every row buffered so far has been written.
+
+        Returns:
+            bool: False if a write failed (the rows are kept for a retry), the
+            writer has stopped or ``timeout`` expired first.
+        """
+        with self._cond:
+            target = self._enqueued
+            failures = self.failures
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: self._written >= target or self.failures > failures or not self._thread.is_alive(),
+                timeout)
+            return self._written >= target
+
+    def close(self):
+        """Flushes the remaining rows and stops the background thread."""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or self._flush_requested
+                    or self._pending() >= self.max_rows,
+                    timeout=self.max_delay)
+                counts, self._counts = self._counts, []
+                buckets, self._buckets = self._buckets, []
+                logs, self._logs = self._logs, []
+                self._flush_requested = False
+                stopping = self._stopping
+
+            if counts or buckets or logs:
+                if self._write(conn, counts, buckets, logs):
+                    with self._cond:
+                        self._written += len(counts) + len(buckets) + len(logs)
+                        self._cond.notify_all()
+                else:
+                    with self._cond:
+                        # Keep the batch, in order, ahead of the rows buffered since
+                        self._counts[:0] = counts
+                        self._buckets[:0] = buckets
+                        self._logs[:0] = logs
+                        self.failures += 1
+                        self._cond.notify_all()
+                        if stopping:
+                            logger.error("❌ Dropping %d unwritten rows at shutdown", self._pending())
+                            break
+                        # Back off before retrying; close() still gets one last attempt
+                        self._cond.wait_for(lambda: self._stopping, timeout=self.max_delay)
+
+            if stopping:
+                with self._cond:
+                    if not self._pending():
+                        break
+        conn.close()
+
+    def _write(self, conn, counts, buckets, logs):
+        """Writes one batch in a single transaction. Returns False (rolled back) on error."""
+        try:
+            with METRICS.stage("db_write"), conn:
+                if counts:
+                    insert_counts(conn, counts)
+                if buckets:
+                    insert_buckets(conn, buckets)
+                if logs:
+                    conn.executemany("INSERT INTO logs (level, message) VALUES (?, ?)", logs)
+        except sqlite3.Error as e:
+            logger.error("❌ Batch write failed (%d counts, %d buckets, %d logs), will retry: %s",
+                         len(counts), len(buckets), len(logs), e)
+            return False
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Returns the process-wide BatchWriter, creating it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter()
+        return _writer
 
 # ---------- TEST RUN ----------
 if __name__ == "__main__":
+    from logconfig import setup_logging
+    setup_logging(level="DEBUG", sample_every=1)
     init_db()
     save_count(total=10, zone_a=3, zone_b=2, zone_c=4, zone_d=1, source="Webcam")
     save_count(total=5, zone_a=1, zone_b=1, zone_c=2, zone_d=1, source="Camera2")
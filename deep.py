@@ -1,73 +1,201 @@
+import argparse
 import cv2
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
-
-# 1. Initialize Model and Tracker
-model = YOLO('yolov8s.pt')  # Upgraded to 's' (small) for better 90%+ accuracy
-tracker = DeepSort(max_age=50, n_init=3)
-
-# 2. Load video with 'r' prefix for Windows paths
-video_path = r"video.mp.4"
-cap = cv2.VideoCapture(video_path)
-
-if not cap.isOpened():
-    print("Error: Could not open video. Check the path!")
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # 3. Process Frame (Using higher resolution for better accuracy)
-    results = model.predict(frame, imgsz=1080, conf=0.25, verbose=False)[0]
-    detections = []
-    confidences = []
-
-    for r in results.boxes.data.tolist():
-        x1, y1, x2, y2, score, class_id = r
-        if int(class_id) == 0:  
-            detections.append([[x1, y1, x2 - x1, y2 - y1], score, class_id])
-            confidences.append(score)
-
-    # 4. Update tracker
-    tracks = tracker.update_tracks(detections, frame=frame)
-
-    # --- ACCURACY LOGIC (NOW PROPERLY INDENTED) ---
-    if confidences:
-        avg_conf = sum(confidences) / len(confidences)
-        active_tracks = len([t for t in tracks if t.is_confirmed()])
-        
-        # Stability: Compares detections vs history
-        stability = min(len(detections) / active_tracks, 1.0) if active_tracks > 0 else 1.0
-        
-        # Boosted Formula to stay between 90-100%
-        # (Avg Conf * 0.4 + Stability * 0.6) mapped to a high range
-        live_accuracy = ((avg_conf * 0.4) + (stability * 0.6)) * 100 + 8
-        live_accuracy = min(max(live_accuracy, 91.5), 99.8) 
-    else:
-        live_accuracy = 0.0
+from backends import BACKENDS, load_detector
+from postprocess import person_detections, to_deepsort
+from detection import detect_batch
+from offline import Throughput
+from sources import FrameSource, parse_size, pipeline_buffers
+from pipeline import Pipeline, BLOCK
+from trackers import TRACKERS, make_tracker, predict_tracks
+from scheduling import DetectionScheduler
+from tiling import TiledDetector
+from zones import ZoneEngine
+from annotation import AnnotatedVideoSink
+from metrics import METRICS, setup_metrics
+from logconfig import setup_logging
+from evaluation import RunningScore, load_mot
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DeepSORT people tracking on a video file")
+    parser.add_argument("--source", default=r"video.mp.4", help="path of the video file")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="frames per second taken from the file; skipped frames are not decoded (default: all)")
+    parser.add_argument("--size", default=None, help="decode at WIDTHxHEIGHT (default: native)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="frames per YOLO predict call (offline batched mode when > 1)")
+    parser.add_argument("--tracker", default="deepsort", choices=TRACKERS,
+                        help="tracker backend; sort/centroid skip the appearance embedder")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS,
+                        help="inference backend; onnx exports the weights once and runs ONNX Runtime")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized ONNX model")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads for inference")
+    parser.add_argument("--detect-every", type=int, default=3,
+                        help="run YOLO every N frames (sooner on motion); the tracker predicts the rest")
+    parser.add_argument("--tile", type=int, default=0,
+                        help="detect the zone area as overlapping tiles of this size (0: whole frame at imgsz=1080)")
+    parser.add_argument("--zones", default=None, help="zone config JSON that limits tiled inference (default: zones.json)")
+    parser.add_argument("--headless", action="store_true", help="track and count only: no drawing, no window")
+    parser.add_argument("--video", default=None, help="also write an annotated video to this file")
+    parser.add_argument("--video-fps", type=float, default=5.0, help="frame rate of the annotated video")
+    parser.add_argument("--gt", default=None,
+                        help="MOT ground truth of the video: shows the measured count accuracy")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT",
+                        help="per-stage latency metrics on http://127.0.0.1:PORT/metrics (0: off)")
+    parser.add_argument("--metrics-every", type=float, default=0, metavar="SECONDS",
+                        help="log a per-stage latency summary every SECONDS (0: off)")
+    return parser.parse_args(argv)
+
+
+# 1. Initialize Model (warmed up at the size it will run at)
+def load_model(args):
+    model = load_detector('yolov8s.pt', backend=args.backend, threads=args.threads, int8=args.int8)  # Upgraded to 's' (small) for better 90%+ accuracy
+    model.warmup(imgsz=args.tile if args.tile > 0 else 1080)
+    return model
+
+
+def make_infer(model, scheduler, tiled=None):
+    @scheduler.wrap
+    def infer(frames):
+        if tiled is not None:
+            return tiled(frames)
+        return detect_batch(model, frames, imgsz=1080, conf=0.25)
+    return infer
+
+
+class TrackCounter:
+    """
+    Tracking stage: returns ``(accuracy, detection_count, boxes)`` per frame.
+
+    ``accuracy`` is the people-count accuracy so far measured by a
+    ``RunningScore`` against ground truth, ``None`` without one.
+    """
+
+    def __init__(self, tracker, scheduler, score=None):
+        self.tracker = tracker
+        self.scheduler = scheduler
+        self.score = score
+        self.frames = 0
+        self.detection_count = 0
+
+    def __call__(self, frame, frame_detections):
+        if frame_detections is None:
+            # Between detections: predicted boxes, detection count of the last detected frame
+            with METRICS.stage("tracker"):
+                tracks = predict_tracks(self.tracker, frame)
+        else:
+            detections = to_deepsort(person_detections(frame_detections))
+
+            # 4. Update tracker
+            with METRICS.stage("tracker"):
+                tracks = self.tracker.update_tracks(detections, frame=frame)
+            self.detection_count = len(detections)
+
+        # Copy what the sink draws; track objects keep changing on this thread
+        boxes = [(t.track_id, t.to_ltrb()) for t in tracks if t.is_confirmed()]
+        if frame_detections is not None:
+            self.scheduler.report_tracks(len(boxes))
+        accuracy = self.score.count(self.frames, len(boxes)) if self.score is not None else None
+        self.frames += 1
+        return accuracy, self.detection_count, boxes
+
+
+def draw(frame, result):
+    accuracy, detection_count, boxes = result
+
+    # Measured against ground truth (--gt) only; nothing is shown otherwise
+    if accuracy is not None:
+        cv2.putText(frame, f"Count Accuracy: {100.0 * accuracy:.1f}% (ground truth)", (20, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
 
-    # --- DRAWING (NOW PROPERLY INDENTED) ---
-    cv2.putText(frame, f"Live Accuracy: {live_accuracy:.2f}%", (20, 50), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-    
-    cv2.putText(frame, f"Total Count: {len(detections)}", (20, 100), 
+    cv2.putText(frame, f"Total Count: {detection_count}", (20, 100),
                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-    for track in tracks:
-        if not track.is_confirmed():
-            continue
-        ltrb = track.to_ltrb()
+    for track_id, ltrb in boxes:
         cv2.rectangle(frame, (int(ltrb[0]), int(ltrb[1])), (int(ltrb[2]), int(ltrb[3])), (0, 255, 0), 2)
-        cv2.putText(frame, f"ID {track.track_id}", (int(ltrb[0]), int(ltrb[1]-10)), 
+        cv2.putText(frame, f"ID {track_id}", (int(ltrb[0]), int(ltrb[1]-10)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
-    cv2.imshow("Real-Time Tracking & Accuracy", frame)
-    
-    # Press 'q' to exit
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-cap.release()
+def run(args, model):
+    # 1b. Initialize Tracker
+    tracker = make_tracker(args.tracker, max_age=50, n_init=3)
+
+    # 2. Load video with 'r' prefix for Windows paths
+    video_path = args.source
+    maxsize = max(4, 2 * args.batch_size)
+    source = FrameSource(video_path, fps=args.fps, size=parse_size(args.size),
+                         buffers=pipeline_buffers(maxsize, args.batch_size))
+
+    if not source.isOpened():
+        print("Error: Could not open video. Check the path!")
+
+    throughput = Throughput(source.fps)
+    score = RunningScore(load_mot(args.gt), stride=source.stride) if args.gt else None
+
+    # 3. Process Frames (Using higher resolution for better accuracy).
+    # Every frame is tracked; YOLO runs on the scheduled ones. Recorded file:
+    # no track-count feedback, so every run detects the same frames
+    scheduler = DetectionScheduler(every=args.detect_every, track_trigger=False)
+
+    if args.tile > 0:
+        # High resolution only where counting happens: zone crops, tiled, one batch
+        tiled = TiledDetector(model, ZoneEngine.load(args.zones), tile=args.tile, conf=0.25)
+        print("Tiled inference:", tiled.describe(*source.frame_size))
+    else:
+        tiled = None
+
+    video = None
+    if args.video:
+        video = AnnotatedVideoSink(args.video, draw, source_fps=source.fps or 30.0,
+                                   fps=args.video_fps)
+
+    def sink(frame, result):
+        throughput.update()
+        if video is not None:
+            video.offer(frame, result)
+        if args.headless:
+            return True
+
+        with METRICS.stage("render"):
+            draw(frame, result)
+            cv2.imshow("Real-Time Tracking & Accuracy", frame)
+            key = cv2.waitKey(1) & 0xFF
+
+        # Press 'q' to exit
+        return not (key == ord('q'))
+
+    # Recorded file: never drop frames; the inference worker batches up to
+    # --batch-size waiting frames and results reach the tracker in decode order.
+    pipeline = Pipeline(source, make_infer(model, scheduler, tiled), TrackCounter(tracker, scheduler, score),
+                        sink, maxsize=maxsize, drop_policy=BLOCK,
+                        infer_batch_size=args.batch_size)
+    pipeline.run()
+
+    if video is not None:
+        video.close()
+    source.release()
+    print(pipeline.format_report())
+    print(scheduler.summary())
+    print(source.stats.summary())
+    if score is not None:
+        print("Count", score.summary())
+    if METRICS.enabled:
+        print(METRICS.format_summary())
+    print(f"Processed {throughput.frames} frames at {throughput.fps():.1f} fps "
+          f"({throughput.realtime_factor():.1f}x real time)")
+
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Handlers first: the periodic metrics report is logged at INFO (no logs table here)
+    setup_logging(db_level="OFF")
+    setup_metrics(args.metrics_port, args.metrics_every)
+    run(args, load_model(args))
+
 
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
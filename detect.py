@@ -1,50 +1,32 @@
+import argparse
 import cv2
 import sqlite3
 from datetime import datetime
-from flask import render_template
-from ultralytics import YOLO
-
-# Load YOLO
-model = YOLO("yolov8n.pt")
-
-# Open webcam
-cap = cv2.VideoCapture(0)
-
-# Database
-conn = sqlite3.connect("analytics.db", check_same_thread=False)
-cur = conn.cursor()
-
+from backends import load_detector
+from detection import detect_batch
+from sources import FrameSource, pipeline_buffers
+from pipeline import Pipeline, DROP_OLDEST
+from postprocess import person_detections
+from queries import latest
+from scheduling import DetectionScheduler, MotionGate
+from metrics import METRICS, setup_metrics
+from logconfig import setup_logging
 
 
 def index():
-    conn = sqlite3.connect("people_count.db")
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT timestamp, source,
-               total_count, zone_a, zone_b, zone_c
-        FROM people_count
-        ORDER BY id DESC
-        LIMIT 50
-    """)
-
-    data = cur.fetchall()
-    conn.close()
+    from flask import render_template
 
+    data = [
+        (r["timestamp"], r["source"], r["total_count"], r["zone_a"], r["zone_b"], r["zone_c"])
+        for r in latest(50)
+    ]
     return render_template("table.html", data=data)
 
 
-
-
-
-cur.execute("""
-            
-            
-            
-            
-            
-            
-            
+# Database
+def open_db(path="analytics.db"):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("""
 CREATE TABLE IF NOT EXISTS video_analytics(
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT,
@@ -55,39 +37,107 @@ CREATE TABLE IF NOT EXISTS video_analytics(
     zone_c INTEGER
 )
 """)
-conn.commit()
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    results = model(frame)
-    people_count = 0
-
-    for r in results:
-        for box in r.boxes:
-            if int(box.cls[0]) == 0:  # person
-                people_count += 1
-
-    # Dummy zone values (replace later)
-    zone_a = people_count // 3
-    zone_b = people_count // 3
-    zone_c = people_count - zone_a - zone_b
-
-    # Insert into DB every few seconds
-    cur.execute("""
-        INSERT INTO video_analytics
-        (timestamp, source, people_count, zone_a, zone_b, zone_c)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-          "Webcam", people_count, zone_a, zone_b, zone_c))
-
     conn.commit()
+    return conn
+
+
+# Load YOLO (warmed up before the webcam opens)
+def load_model(weights="yolov8n.pt"):
+    model = load_detector(weights)
+    model.warmup()
+    return model
+
+
+class PeopleCounter:
+    """
+    Counting stage: ``(people_count, zone_a, zone_b, zone_c)`` per frame.
+
+    YOLO runs on every frame with motion; a static, empty scene is only
+    re-checked every 30 frames.
+    """
+
+    def __init__(self, model):
+        self.scheduler = DetectionScheduler(every=1, gate=MotionGate(), idle_every=30)
+        self.infer = self.scheduler.wrap(lambda frames: detect_batch(model, frames))
+        self.last_count = 0
+
+    def __call__(self, frame, frame_detections):
+        if frame_detections is None:
+            # Static scene, detector skipped: the count cannot have changed
+            people_count = self.last_count
+        else:
+            people_count = len(person_detections(frame_detections))
+            self.scheduler.report_tracks(people_count)
+            self.last_count = people_count
+
+        # Dummy zone values (replace later)
+        zone_a = people_count // 3
+        zone_b = people_count // 3
+        zone_c = people_count - zone_a - zone_b
+        return people_count, zone_a, zone_b, zone_c
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Webcam people count into analytics.db")
+    parser.add_argument("--headless", action="store_true", help="count only, no window (stop with Ctrl+C)")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT",
+                        help="per-stage latency metrics on http://127.0.0.1:PORT/metrics (0: off)")
+    parser.add_argument("--metrics-every", type=float, default=0, metavar="SECONDS",
+                        help="log a per-stage latency summary every SECONDS (0: off)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Handlers first: the periodic metrics report is logged at INFO (no logs table here)
+    setup_logging(db_level="OFF")
+    setup_metrics(args.metrics_port, args.metrics_every)
+    model = load_model()
+    conn = open_db()
+    cur = conn.cursor()
+    counter = PeopleCounter(model)
+
+    def sink(frame, result):
+        people_count, zone_a, zone_b, zone_c = result
+
+        # Insert into DB every few seconds
+        with METRICS.stage("db_write"):
+            cur.execute("""
+                INSERT INTO video_analytics
+                (timestamp, source, people_count, zone_a, zone_b, zone_c)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                  "Webcam", people_count, zone_a, zone_b, zone_c))
+
+            conn.commit()
+
+        if args.headless:
+            return True
+        with METRICS.stage("render"):
+            cv2.imshow("Crowd Analytics", frame)
+            key = cv2.waitKey(1) & 0xFF
+        return not (key == 27)
+
+    # Open webcam
+    source = FrameSource(0, buffers=pipeline_buffers(2))
+
+    # Live webcam: stale frames are dropped while inference is busy
+    pipeline = Pipeline(source, counter.infer, counter, sink, maxsize=2, drop_policy=DROP_OLDEST)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        pass
+    print(pipeline.format_report())
+    print(counter.scheduler.summary())
+    print(source.stats.summary())
+    if METRICS.enabled:
+        print(METRICS.format_summary())
+
+    source.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+    conn.close()
 
-    cv2.imshow("Crowd Analytics", frame)
-    if cv2.waitKey(1) & 0xFF == 27:
-        break
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
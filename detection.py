@@ -0,0 +1,98 @@
+import numpy as np
+
+PERSON_CLASS_ID = 0
+
+
+# ---------- DETECTION RESULT ----------
+class Detections:
+    """
+    Detections of a single frame stored as NumPy arrays.
+
+    Attributes:
+        boxes: (N, 4) float32 array of [x1, y1, x2, y2] boxes.
+        confidences: (N,) float32 array of detection scores.
+        class_ids: (N,) int32 array of COCO class ids.
+    """
+
+    __slots__ = ("boxes", "confidences", "class_ids")
+
+    def __init__(self, boxes, confidences, class_ids):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Builds a Detections object from one ultralytics ``Results`` item.
+
+        Args:
+            result: A single element of the list returned by ``model.predict``.
+
+        Returns:
+            Detections: Boxes, scores and class ids copied to NumPy once.
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        data = boxes.data.detach().cpu().numpy()
+        return cls(data[:, :4], data[:, 4], data[:, 5])
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def select(self, mask):
+        """Returns the subset of detections selected by a boolean mask or index array."""
+        return Detections(self.boxes[mask], self.confidences[mask], self.class_ids[mask])
+
+    def mean_confidence(self):
+        return float(self.confidences.mean()) if len(self) else 0.0
+
+
+def _as_detections(result):
+    # backends.Detector already returns Detections; ultralytics returns Results
+    return result if isinstance(result, Detections) else Detections.from_result(result)
+
+
+# ---------- SHARED DETECTION STAGE ----------
+def detect(model, frame, **predict_kwargs):
+    """
+    Runs the detector once on a frame.
+
+    Every consumer of the frame (coordinates, tracker feed, scores) should read
+    from the returned object instead of calling ``model.predict`` again.
+
+    Args:
+        model: A loaded ultralytics YOLO model or a ``backends.Detector``.
+        frame: BGR image.
+        **predict_kwargs: Extra arguments forwarded to ``model.predict``.
+
+    Returns:
+        Detections: Structured detections for the frame.
+    """
+    predict_kwargs.setdefault("verbose", False)
+    results = model.predict(frame, **predict_kwargs)
+    return _as_detections(results[0])
+
+
+def detect_batch(model, frames, **predict_kwargs):
+    """
+    Runs the detector once on a list of frames.
+
+    Args:
+        model: A loaded ultralytics YOLO model or a ``backends.Detector``.
+        frames: List of BGR images of the same size.
+        **predict_kwargs: Extra arguments forwarded to ``model.predict``.
+
+    Returns:
+        list: One Detections object per frame, in input order.
+    """
+    if not frames:
+        return []
+    predict_kwargs.setdefault("verbose", False)
+    results = model.predict(list(frames), **predict_kwargs)
+    return [_as_detections(r) for r in results]
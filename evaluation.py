@@ -0,0 +1,517 @@
+"""
+Offline evaluation against MOT-style ground truth.
+
+A clip is a video (or a MOT ``img1/`` image sequence) plus a ground-truth
+file in MOT format, one box per line::
+
+    frame, id, left, top, width, height[, consider, class, visibility]
+
+Rows with ``consider == 0`` or a non-person class are ignored. The clip is
+replayed through the entry/exit counting chain of Main.py (scheduled
+detection, tracker, count line) and scored frame by frame:
+
+- counting: per-frame confirmed tracks against the visible people (MAE,
+  RMSE, ``1 - sum|error| / sum(truth)``),
+- line crossings: entries/exits matched to the ground-truth crossings of the
+  same direction within ``tolerance`` frames (precision, recall, F1),
+- tracking: per-frame IoU matching (MOTA, MOTP, ID switches) and the
+  global identity matching of IDF1.
+
+Matching is one IoU matrix and one assignment per frame; ID switches and the
+IDF1 co-occurrence counts are kept in dense arrays indexed by ground-truth id.
+
+Every knob takes several values and the product is swept; the table marks
+the configurations on the throughput/accuracy Pareto front:
+
+    python evaluation.py clips/seq1 clips/seq2 --weights yolov8n.pt yolov8s.pt \\
+        --imgsz 640 1080 --detect-every 1 3 --stride 1 2 --objective idf1 --json eval.json
+
+``--weights stub`` uses the stub detector of bench_e2e.py (synthetic clips
+written with ``bench_e2e.py --keep-clips DIR``).
+"""
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from postprocess import centroids, iou_matrix
+from trackers import assign
+
+logger = logging.getLogger(__name__)
+
+PERSON_CLASSES = (1, -1)
+OBJECTIVES = ("count", "crossing", "mota", "idf1")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+
+
+# ---------- GROUND TRUTH ----------
+def load_mot(path, frames=None, classes=PERSON_CLASSES):
+    """
+    Reads a MOT ground-truth file.
+
+    Args:
+        path: ``gt.txt`` path.
+        frames: Number of frames returned (default: up to the last annotated frame).
+        classes: Class ids kept when the file has a class column.
+
+    Returns:
+        list: ``(ids, ltrb)`` per frame, frame 1 of the file first.
+    """
+    data = np.loadtxt(path, delimiter=",", ndmin=2)
+    if len(data) and data.shape[1] > 6:
+        data = data[data[:, 6] != 0]
+    if len(data) and data.shape[1] > 7:
+        data = data[np.isin(data[:, 7].astype(np.int64), classes)]
+    if frames is None:
+        frames = int(data[:, 0].max()) if len(data) else 0
+    truth = [(np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.float32)) for _ in range(frames)]
+    if not len(data):
+        return truth
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    starts = np.searchsorted(data[:, 0].astype(np.int64) - 1, np.arange(frames + 1))
+    for f in range(frames):
+        rows = data[starts[f]:starts[f + 1]]
+        if len(rows):
+            ltrb = np.hstack([rows[:, 2:4], rows[:, 2:4] + rows[:, 4:6]]).astype(np.float32)
+            truth[f] = (rows[:, 1].astype(np.int64), ltrb)
+    return truth
+
+
+def resolve_clip(path):
+    """
+    Returns ``(video, gt)`` of a clip directory.
+
+    Accepted layouts: ``clip.mp4`` + ``gt.txt`` (bench_e2e.py) or the MOT
+    ``img1/000001.jpg...`` + ``gt/gt.txt`` sequence layout.
+    """
+    gt = next((p for p in (os.path.join(path, "gt", "gt.txt"), os.path.join(path, "gt.txt"))
+               if os.path.exists(p)), None)
+    videos = sorted(p for p in glob.glob(os.path.join(path, "*")) if p.lower().endswith(VIDEO_EXTENSIONS))
+    if videos:
+        video = videos[0]
+    elif os.path.isdir(os.path.join(path, "img1")):
+        video = os.path.join(path, "img1", "%06d.jpg")
+    else:
+        video = None
+    if gt is None or video is None:
+        raise FileNotFoundError(f"{path}: expected a video or img1/ and gt.txt or gt/gt.txt")
+    return video, gt
+
+
+# ---------- METRICS ----------
+def count_error(predicted, truth):
+    """Per-frame count error: MAE, RMSE and ``1 - sum|error| / sum(truth)``."""
+    predicted, truth = np.asarray(predicted, dtype=np.float64), np.asarray(truth, dtype=np.float64)
+    error = predicted - truth
+    return {
+        "mae": round(float(np.abs(error).mean()), 3) if len(error) else 0.0,
+        "rmse": round(float(np.sqrt((error ** 2).mean())), 3) if len(error) else 0.0,
+        "accuracy": round(max(0.0, 1.0 - float(np.abs(error).sum()) / max(1.0, float(truth.sum()))), 4),
+    }
+
+
+def crossing_events(truth, line, width, height):
+    """
+    First crossing of ``line`` by every ground-truth id, as Main.py counts them.
+
+    Returns:
+        tuple: ``(frames, directions)`` int arrays; direction -1 is upwards
+        (an entry), +1 downwards (an exit).
+    """
+    all_ids = np.unique(np.concatenate([ids for ids, _ in truth])) if truth else np.empty(0, dtype=np.int64)
+    last = np.zeros(len(all_ids), dtype=np.int8)
+    counted = np.zeros(len(all_ids), dtype=bool)
+    frames, directions = [], []
+    for f, (ids, ltrb) in enumerate(truth):
+        if not len(ids):
+            continue
+        idx = np.searchsorted(all_ids, ids)
+        sides = line.side(centroids(ltrb), width, height)
+        prev = last[idx]
+        hit = (prev != 0) & (sides != 0) & (sides != prev) & ~counted[idx]
+        if hit.any():
+            counted[idx[hit]] = True
+            frames.append(np.full(int(hit.sum()), f, dtype=np.int64))
+            directions.append(sides[hit].astype(np.int64))
+        seen = sides != 0
+        last[idx[seen]] = sides[seen]
+    if not frames:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(frames), np.concatenate(directions)
+
+
+def count_events(ups, downs):
+    """Crossing events ``(frames, directions)`` from per-frame cumulative entry/exit counters."""
+    ups, downs = np.asarray(ups, dtype=np.int64), np.asarray(downs, dtype=np.int64)
+    frames, directions = [], []
+    for counter, direction in ((ups, -1), (downs, 1)):
+        steps = np.diff(counter, prepend=0)
+        at = np.repeat(np.arange(len(counter)), np.maximum(steps, 0))
+        frames.append(at)
+        directions.append(np.full(len(at), direction, dtype=np.int64))
+    return np.concatenate(frames), np.concatenate(directions)
+
+
+def matched_events(pred_frames, pred_dirs, gt_frames, gt_dirs, tolerance):
+    """Predicted events matched one-to-one to ground-truth events of the same direction within ``tolerance`` frames."""
+    matched = 0
+    for direction in (-1, 1):
+        p = np.sort(pred_frames[pred_dirs == direction])
+        g = np.sort(gt_frames[gt_dirs == direction])
+        i = j = 0
+        # Both sorted: the earliest compatible pair is always part of an optimal matching
+        while i < len(p) and j < len(g):
+            if abs(p[i] - g[j]) <= tolerance:
+                matched += 1
+                i += 1
+                j += 1
+            elif p[i] < g[j]:
+                i += 1
+            else:
+                j += 1
+    return matched
+
+
+class TrackingMetrics:
+    """
+    CLEAR-MOT and IDF1 accumulated frame by frame.
+
+    Args:
+        gt_ids: Every ground-truth id of the clip (sizes the dense per-id arrays).
+        threshold: Minimum IoU of a match.
+    """
+
+    def __init__(self, gt_ids, threshold=0.5):
+        self.threshold = threshold
+        self.gt_ids = np.unique(np.asarray(gt_ids, dtype=np.int64))
+        self.last = np.full(len(self.gt_ids), -1, dtype=np.int64)   # track id of the last match
+        self.gt = self.pred = self.tp = self.fp = self.fn = self.switches = 0
+        self.iou_sum = 0.0
+        self._pair_gt, self._pair_pred = [], []
+
+    def update(self, gt_ids, gt_boxes, pred_ids, pred_boxes):
+        gt_ids = np.asarray(gt_ids, dtype=np.int64)
+        pred_ids = np.asarray(pred_ids, dtype=np.int64)
+        self.gt += len(gt_ids)
+        self.pred += len(pred_ids)
+        if not len(gt_ids) or not len(pred_ids):
+            self.fn += len(gt_ids)
+            self.fp += len(pred_ids)
+            return
+        iou = iou_matrix(gt_boxes, pred_boxes)
+        rows, cols = assign(1.0 - iou, 1.0 - self.threshold)
+        self.tp += len(rows)
+        self.fn += len(gt_ids) - len(rows)
+        self.fp += len(pred_ids) - len(rows)
+        self.iou_sum += float(iou[rows, cols].sum())
+
+        # ID switch: the person's previous match went to another track
+        dense = np.searchsorted(self.gt_ids, gt_ids)
+        matched, tracks = dense[rows], pred_ids[cols]
+        previous = self.last[matched]
+        self.switches += int(np.count_nonzero((previous >= 0) & (previous != tracks)))
+        self.last[matched] = tracks
+
+        # Every overlapping (person, track) pair counts towards the identity matching of IDF1
+        g, p = np.nonzero(iou >= self.threshold)
+        self._pair_gt.append(dense[g])
+        self._pair_pred.append(pred_ids[p])
+
+    def identity_tp(self):
+        """Frames on which each person overlaps the single track globally assigned to it."""
+        if not self._pair_gt:
+            return 0
+        g, p = np.concatenate(self._pair_gt), np.concatenate(self._pair_pred)
+        tracks, p = np.unique(p, return_inverse=True)
+        overlap = np.zeros((len(self.gt_ids), len(tracks)), dtype=np.float64)
+        np.add.at(overlap, (g, p), 1.0)
+        rows, cols = assign(-overlap, -1.0)
+        return int(overlap[rows, cols].sum())
+
+    def totals(self):
+        return {"gt": self.gt, "pred": self.pred, "tp": self.tp, "fp": self.fp, "fn": self.fn,
+                "switches": self.switches, "iou_sum": self.iou_sum, "idtp": self.identity_tp()}
+
+
+def summarize(raw):
+    """Turns summed raw counts (one clip or several) into the reported metrics."""
+    gt, pred, tp = raw["gt"], raw["pred"], raw["tp"]
+    precision = raw["cross_tp"] / raw["cross_pred"] if raw["cross_pred"] else 0.0
+    recall = raw["cross_tp"] / raw["cross_gt"] if raw["cross_gt"] else 0.0
+    return {
+        "frames": raw["frames"],
+        "fps": round(raw["frames"] / raw["wall_s"], 2) if raw["wall_s"] > 0 else 0.0,
+        "detect_fraction": round(raw["detected"] / raw["frames"], 3) if raw["frames"] else 0.0,
+        "count_mae": round(raw["count_abs"] / raw["frames"], 3) if raw["frames"] else 0.0,
+        "count_rmse": round(np.sqrt(raw["count_sq"] / raw["frames"]), 3) if raw["frames"] else 0.0,
+        "count_accuracy": round(max(0.0, 1.0 - raw["count_abs"] / max(1, raw["count_truth"])), 4),
+        "crossing_precision": round(precision, 4),
+        "crossing_recall": round(recall, 4),
+        "crossing_f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "entries": [raw["pred_up"], raw["gt_up"]],
+        "exits": [raw["pred_down"], raw["gt_down"]],
+        "mota": round(1.0 - (raw["fn"] + raw["fp"] + raw["switches"]) / gt, 4) if gt else 0.0,
+        "motp": round(raw["iou_sum"] / tp, 4) if tp else 0.0,
+        "idf1": round(2.0 * raw["idtp"] / (gt + pred), 4) if gt + pred else 0.0,
+        "id_switches": raw["switches"],
+    }
+
+
+class RunningScore:
+    """
+    Accuracy so far of a live run against a ground-truth file, for the overlays.
+
+    Args:
+        truth: ``load_mot`` output of the video being counted.
+        stride: Source frames per delivered frame.
+        line: Optional ``CountLine``; enables ``crossings``.
+        size: (width, height) the ground truth refers to (needed with ``line``).
+    """
+
+    def __init__(self, truth, stride=1, line=None, size=None):
+        self.stride = stride
+        self.visible = np.array([len(ids) for ids, _ in truth], dtype=np.int64)
+        self.count_abs = 0
+        self.count_truth = 0
+        self.ups = self.downs = None
+        if line is not None:
+            frames, directions = crossing_events(truth, line, *size)
+            self.ups = np.cumsum(np.bincount(frames[directions < 0], minlength=len(truth)))
+            self.downs = np.cumsum(np.bincount(frames[directions > 0], minlength=len(truth)))
+        self.accuracy = None
+
+    def count(self, index, predicted):
+        """Scores the people count of delivered frame ``index``; returns the accuracy so far."""
+        f = index * self.stride
+        if f < len(self.visible):
+            self.count_abs += abs(int(predicted) - int(self.visible[f]))
+            self.count_truth += int(self.visible[f])
+            self.accuracy = max(0.0, 1.0 - self.count_abs / max(1, self.count_truth))
+        return self.accuracy
+
+    def crossings(self, index, up, down):
+        """Entry/exit accuracy at delivered frame ``index``: ``1 - (|up error| + |down error|) / crossings``."""
+        f = min(index * self.stride, len(self.ups) - 1) if self.ups is not None and len(self.ups) else -1
+        if f >= 0:
+            up_true, down_true = int(self.ups[f]), int(self.downs[f])
+            error = abs(up - up_true) + abs(down - down_true)
+            self.accuracy = max(0.0, 1.0 - error / max(1, up_true + down_true))
+        return self.accuracy
+
+    def summary(self):
+        if self.accuracy is None:
+            return "no ground truth for the frames counted"
+        return f"accuracy against the ground truth: {100.0 * self.accuracy:.1f}%"
+
+
+# ---------- REPLAY ----------
+DEFAULTS = {
+    "weights": "yolov8n.pt",
+    "backend": "torch",
+    "imgsz": 640,
+    "conf": 0.25,
+    "tile": 0,
+    "detect_every": 3,
+    "stride": 1,
+    "tracker": "sort",
+    "batch": 4,
+}
+
+
+def load_model(weights, backend, cache):
+    """Detector of a configuration, loaded once per (weights, backend)."""
+    key = (weights, backend)
+    if key not in cache:
+        if weights == "stub":
+            from bench_e2e import StubDetector
+
+            cache[key] = StubDetector()
+        else:
+            from backends import load_detector
+
+            cache[key] = load_detector(weights, backend=backend)
+    return cache[key]
+
+
+def replay(video, gt, config, model, zones=None, tolerance=15):
+    """
+    Counts one clip with a configuration and scores it.
+
+    Returns:
+        dict: Raw counts (see ``summarize``); frames from which the timing
+        starts exclude model loading and warm-up.
+    """
+    from Main import EntryExitCounter
+    from detection import detect_batch
+    from pipeline import BLOCK, Pipeline
+    from sources import FrameSource
+    from tiling import TiledDetector
+    from zones import ZoneEngine
+
+    zones = zones or ZoneEngine.load()
+    stride = config["stride"]
+    source = FrameSource(video, stride=stride, buffers=2 * config["batch"] + 4)
+    if not source.isOpened():
+        raise FileNotFoundError(f"Cannot open {video}")
+    width, height = source.native_size
+
+    truth = load_mot(gt)
+    counter = EntryExitCounter(config["tracker"], config["detect_every"], zones=zones, annotate=True)
+    if config["tile"]:
+        detect = TiledDetector(model, zones, tile=config["tile"], conf=config["conf"], classes=[0])
+    else:
+        def detect(frames):
+            return detect_batch(model, frames, imgsz=config["imgsz"], conf=config["conf"], classes=[0])
+    model.warmup(imgsz=config["tile"] or config["imgsz"])
+
+    tracking = TrackingMetrics(np.concatenate([ids for ids, _ in truth]) if truth else [])
+    empty = (np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.float32))
+    predicted, visible, ups, downs = [], [], [], []
+
+    def sink(frame, result):
+        (up, down, _), overlay = result
+        f = len(predicted) * stride
+        ids, boxes = truth[f] if f < len(truth) else empty
+        tracks = overlay[1]
+        tracking.update(ids, boxes, [int(t[0]) for t in tracks],
+                        np.asarray([t[1] for t in tracks], dtype=np.float32).reshape(-1, 4))
+        predicted.append(len(tracks))
+        visible.append(len(ids))
+        ups.append(up)
+        downs.append(down)
+        return True
+
+    pipeline = Pipeline(source, counter.scheduler.wrap(detect), counter, sink, maxsize=2 * config["batch"],
+                        drop_policy=BLOCK, infer_batch_size=config["batch"])
+    started = time.perf_counter()
+    pipeline.run()
+    wall_s = time.perf_counter() - started
+    source.release()
+
+    # Crossings in source frames; the counter only sees every stride-th frame
+    gt_frames, gt_dirs = crossing_events(truth, counter.count_line.line, width, height)
+    pred_frames, pred_dirs = count_events(ups, downs)
+    pred_frames = pred_frames * stride
+    gt_keep = gt_frames < len(predicted) * stride
+
+    error = np.asarray(predicted, dtype=np.int64) - np.asarray(visible, dtype=np.int64)
+    return {
+        "frames": len(predicted),
+        "wall_s": wall_s,
+        "detected": counter.scheduler.detected,
+        "count_abs": int(np.abs(error).sum()),
+        "count_sq": int((error ** 2).sum()),
+        "count_truth": int(sum(visible)),
+        "cross_tp": matched_events(pred_frames, pred_dirs, gt_frames[gt_keep], gt_dirs[gt_keep], tolerance),
+        "cross_pred": len(pred_frames),
+        "cross_gt": int(gt_keep.sum()),
+        "pred_up": ups[-1] if ups else 0,
+        "pred_down": downs[-1] if downs else 0,
+        "gt_up": int(np.count_nonzero(gt_dirs[gt_keep] < 0)),
+        "gt_down": int(np.count_nonzero(gt_dirs[gt_keep] > 0)),
+        **tracking.totals(),
+    }
+
+
+def evaluate(clips, config, cache, zones=None, tolerance=15):
+    """Replays every clip with one configuration; returns ``(summary, per-clip summaries)``."""
+    runs = {}
+    for clip in clips:
+        video, gt = resolve_clip(clip)
+        runs[clip] = replay(video, gt, config, load_model(config["weights"], config["backend"], cache),
+                            zones, tolerance)
+    total = {key: sum(run[key] for run in runs.values()) for key in next(iter(runs.values()))}
+    return summarize(total), {clip: summarize(run) for clip, run in runs.items()}
+
+
+# ---------- SWEEP ----------
+def expand(knobs):
+    """Every combination of the knob values, as configuration dicts."""
+    names = list(knobs)
+    return [{**DEFAULTS, **dict(zip(names, values))} for values in itertools.product(*knobs.values())]
+
+
+def pareto(speed, quality):
+    """Boolean mask of the points no other point beats on both speed and quality."""
+    speed, quality = np.asarray(speed, dtype=np.float64), np.asarray(quality, dtype=np.float64)
+    at_least = (speed[None, :] >= speed[:, None]) & (quality[None, :] >= quality[:, None])
+    better = (speed[None, :] > speed[:, None]) | (quality[None, :] > quality[:, None])
+    return ~(at_least & better).any(axis=1)
+
+
+OBJECTIVE_KEYS = {"count": "count_accuracy", "crossing": "crossing_f1", "mota": "mota", "idf1": "idf1"}
+
+
+def format_table(rows, knobs, objective):
+    key = OBJECTIVE_KEYS[objective]
+    columns = [name for name, values in knobs.items() if len(values) > 1] or list(knobs)[:1]
+    header = "".join(f"{name:>14}" for name in columns)
+    lines = [f"{'':2}{header} {'fps':>8} {'count acc':>10} {'cross F1':>9} {'MOTA':>7} {'IDF1':>7} {'IDsw':>6}"]
+    for row in sorted(rows, key=lambda r: -r["summary"]["fps"]):
+        s = row["summary"]
+        mark = "* " if row["pareto"] else "  "
+        values = "".join(f"{str(row['config'][name]):>14}" for name in columns)
+        lines.append(f"{mark}{values} {s['fps']:>8.1f} {s['count_accuracy']:>10.3f} {s['crossing_f1']:>9.3f} "
+                     f"{s['mota']:>7.3f} {s['idf1']:>7.3f} {s['id_switches']:>6}")
+    lines.append(f"* Pareto front of fps vs {key}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ground-truth evaluation and speed/accuracy sweep of the counter")
+    parser.add_argument("clips", nargs="+", help="clip directories (clip.mp4 + gt.txt, or MOT img1/ + gt/gt.txt)")
+    parser.add_argument("--weights", nargs="+", default=[DEFAULTS["weights"]],
+                        help="YOLO weights to compare ('stub': synthetic-clip stub detector)")
+    parser.add_argument("--backend", nargs="+", default=[DEFAULTS["backend"]], choices=("torch", "onnx"))
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[DEFAULTS["imgsz"]])
+    parser.add_argument("--conf", type=float, nargs="+", default=[DEFAULTS["conf"]])
+    parser.add_argument("--tile", type=int, nargs="+", default=[DEFAULTS["tile"]],
+                        help="tiled inference over the zones with this tile size (0: whole frame)")
+    parser.add_argument("--detect-every", type=int, nargs="+", default=[DEFAULTS["detect_every"]])
+    parser.add_argument("--stride", type=int, nargs="+", default=[DEFAULTS["stride"]],
+                        help="count every STRIDE-th frame (skipped frames are not decoded)")
+    parser.add_argument("--tracker", nargs="+", default=[DEFAULTS["tracker"]])
+    parser.add_argument("--batch", type=int, default=DEFAULTS["batch"], help="frames per predict call")
+    parser.add_argument("--zones", default=None, help="zone/line config JSON (default: zones.json)")
+    parser.add_argument("--tolerance", type=int, default=15,
+                        help="frames between a counted crossing and the true one that still match")
+    parser.add_argument("--objective", default="count", choices=OBJECTIVES,
+                        help="accuracy axis of the Pareto front")
+    parser.add_argument("--json", default=None, help="also write every configuration's results to this file")
+    args = parser.parse_args(argv)
+
+    from logconfig import setup_logging
+    from zones import ZoneEngine
+
+    setup_logging()
+    zones = ZoneEngine.load(args.zones)
+    knobs = {"weights": args.weights, "backend": args.backend, "imgsz": args.imgsz, "conf": args.conf,
+             "tile": args.tile, "detect_every": args.detect_every, "stride": args.stride,
+             "tracker": args.tracker, "batch": [args.batch]}
+
+    cache, rows = {}, []
+    for config in expand(knobs):
+        summary, per_clip = evaluate(args.clips, config, cache, zones, args.tolerance)
+        rows.append({"config": config, "summary": summary, "clips": per_clip})
+        logger.info("%s: %.1f fps, count accuracy %.3f, crossing F1 %.3f, MOTA %.3f, IDF1 %.3f",
+                    config, summary["fps"], summary["count_accuracy"], summary["crossing_f1"],
+                    summary["mota"], summary["idf1"])
+
+    key = OBJECTIVE_KEYS[args.objective]
+    front = pareto([r["summary"]["fps"] for r in rows], [r["summary"][key] for r in rows])
+    for row, on_front in zip(rows, front.tolist()):
+        row["pareto"] = on_front
+    print(format_table(rows, knobs, args.objective))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"objective": args.objective, "tolerance": args.tolerance, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
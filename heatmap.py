@@ -0,0 +1,172 @@
+"""
+Occupancy / dwell heatmap of confirmed track positions.
+
+``HeatmapAccumulator`` keeps a fixed ``rows x cols`` float32 grid over the
+normalized frame. Each update adds, for every confirmed track centroid, the
+time elapsed since the previous update to the centroid's cell, so a cell
+holds person-seconds (dwell time) regardless of the frame rate. The cells
+are filled with one ``np.bincount`` scatter-add. The grid decays
+exponentially with ``half_life`` seconds (``None`` keeps everything), so
+the map shows recent occupancy; the decay is applied lazily, once per
+update.
+
+Snapshots are written every ``snapshot_every`` seconds as a compressed
+``.npz`` (float16 grid plus timestamp and settings, a few KB), atomically,
+so the dashboard can read the map without replaying raw rows.
+``HeatmapReader`` loads and combines the snapshots of every camera.
+
+    heat = HeatmapAccumulator(path=heatmap_path("Webcam"))
+    heat.update(centroids(boxes), width, height, now=clock.tick())  # in the tracking stage
+    heat.close()                                                     # final snapshot
+
+``now`` defaults to the wall clock, which is only right when frames are
+processed in real time (live sources). Offline runs pass frame timestamps
+(``sources.FrameSource.clock``), so batched or faster-than-real-time
+processing stores the dwell of the video.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HEATMAP_DIR = os.path.join(BASE_DIR, "instance", "heatmaps")
+
+
+def heatmap_path(source, directory=HEATMAP_DIR):
+    """Snapshot file of one source (``Webcam0``, a file name or a URL)."""
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(source))
+    return os.path.join(directory, f"{name}.npz")
+
+
+class HeatmapAccumulator:
+    """
+    Time-decayed dwell grid fed with track centroids.
+
+    Args:
+        grid: (cols, rows) of the grid.
+        half_life: Seconds after which past occupancy weighs half; ``None`` disables decay.
+        path: Snapshot file; ``None`` keeps the map in memory only.
+        snapshot_every: Seconds between two snapshots.
+        max_step: Upper bound of the time credited per update (covers stalls).
+    """
+
+    def __init__(self, grid=(64, 36), half_life=600.0, path=None, snapshot_every=10.0, max_step=1.0):
+        self.cols, self.rows = grid
+        self.half_life = half_life
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.max_step = max_step
+        self.grid = np.zeros((self.rows, self.cols), dtype=np.float32)
+        self.updated = None         # time of the last update (decay reference)
+        self.revision = 0           # bumped on every update
+        self._saved = None
+        self._lock = threading.Lock()
+
+    def _decay_to(self, now):
+        if self.updated is not None and self.half_life:
+            elapsed = now - self.updated
+            if elapsed > 0:
+                self.grid *= np.float32(0.5 ** (elapsed / self.half_life))
+
+    def update(self, points, width, height, now=None):
+        """
+        Credits the time since the previous update to the cells of ``points``.
+
+        Args:
+            points: (N, 2) pixel centroids of the confirmed tracks.
+            width, height: Frame size the points refer to.
+            now: Timestamp of the frame; ``None`` uses the wall clock.
+        """
+        now = time.time() if now is None else now
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        with self._lock:
+            step = min(now - self.updated, self.max_step) if self.updated is not None else 0.0
+            self._decay_to(now)
+            self.updated = now
+            if len(points) and step > 0:
+                cols = np.clip((points[:, 0] * (self.cols / width)).astype(np.intp), 0, self.cols - 1)
+                rows = np.clip((points[:, 1] * (self.rows / height)).astype(np.intp), 0, self.rows - 1)
+                hits = np.bincount(rows * self.cols + cols, minlength=self.grid.size)
+                self.grid += (hits * step).reshape(self.grid.shape).astype(np.float32)
+            self.revision += 1
+
+        if self.path and (self._saved is None or now - self._saved >= self.snapshot_every):
+            self.save(now=now)
+
+    def snapshot(self, now=None):
+        """Returns ``(revision, grid)``: a copy decayed to ``now``."""
+        now = time.time() if now is None else now
+        with self._lock:
+            grid = self.grid.copy()
+            revision, updated = self.revision, self.updated
+        if updated is not None and self.half_life and now > updated:
+            grid *= np.float32(0.5 ** ((now - updated) / self.half_life))
+        return revision, grid
+
+    def save(self, path=None, now=None):
+        """Writes a compressed snapshot (float16 grid); the file is replaced atomically."""
+        path = path or self.path
+        now = time.time() if now is None else now
+        _, grid = self.snapshot(now)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, grid=grid.astype(np.float16), time=np.float64(now),
+                            half_life=np.float64(self.half_life or 0.0))
+        os.replace(tmp, path)
+        self._saved = now
+
+    def close(self):
+        if self.path and self.updated is not None:
+            self.save(now=self.updated)
+
+
+def load_snapshot(path):
+    """Returns ``(grid, time, half_life)`` of a snapshot file."""
+    with np.load(path) as data:
+        return data["grid"].astype(np.float32), float(data["time"]), float(data["half_life"]) or None
+
+
+class HeatmapReader:
+    """
+    Combined heatmap of every snapshot in a directory, reloaded when a file changes.
+
+    Grids of a different size than the first one are skipped.
+    """
+
+    def __init__(self, directory=HEATMAP_DIR):
+        self.directory = directory
+        self.revision = 0
+        self._mtimes = {}
+        self._grid = None
+
+    def snapshot(self):
+        """Returns ``(revision, grid or None)``; ``revision`` changes when any file changed."""
+        paths = sorted(p for p in glob.glob(os.path.join(self.directory, "*.npz")) if not p.endswith(".tmp.npz"))
+        mtimes = {}
+        for p in paths:
+            try:
+                mtimes[p] = os.path.getmtime(p)
+            except OSError:
+                continue
+        if mtimes != self._mtimes:
+            combined = None
+            for p in mtimes:
+                try:
+                    grid, _, _ = load_snapshot(p)
+                except Exception:
+                    logger.warning("Unreadable heatmap snapshot %s", p)
+                    continue
+                if combined is None:
+                    combined = grid
+                elif grid.shape == combined.shape:
+                    combined += grid
+            self._grid = combined
+            self._mtimes = mtimes
+            self.revision += 1
+        return self.revision, self._grid
@@ -0,0 +1,188 @@
+"""
+Shared live state for the dashboard.
+
+``LiveStore`` keeps, in memory, the latest counts of every source and a fixed
+ring of combined history points (all sources summed, at most one point per
+``resolution`` seconds). Counters publish into it from their sink; every
+dashboard viewer reads the same store, so the work per update does not grow
+with the number of viewers.
+
+Nothing is pushed to readers; they poll, cheaply: ``version`` changes on
+every publish (and when a source expires), ``seq`` counts the history
+points ever appended and ``history(since=seq)`` only returns the points a
+viewer has not seen yet.
+
+A source that has not published for ``expire_after`` seconds (a stopped
+camera or process) is dropped from the current totals; history points
+already appended keep its counts.
+
+Two ways to feed it:
+
+- in-process: the counter calls ``store.publish(source, total, zone_counts)``,
+- from another process: ``DatabaseFeed`` tails the people_count and
+  people_count_bucket tables once per interval (one query per table for all
+  viewers).
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LiveStore:
+    """
+    Latest state per source plus a ring buffer of combined history.
+
+    Args:
+        zones: Zone labels, in the order of the published zone counts.
+        capacity: History points kept.
+        resolution: Seconds between two history points.
+        expire_after: Seconds without a publish after which a source is
+            dropped from the totals; ``None`` keeps every source. Keep it
+            above the longest gap between two rows of a ``DatabaseFeed``
+            (the change-policy heartbeat, or a minute bucket).
+        clock: Monotonic time function used for the expiry.
+    """
+
+    def __init__(self, zones, capacity=900, resolution=1.0, expire_after=120.0, clock=time.monotonic):
+        self.zones = list(zones)
+        self.capacity = capacity
+        self.resolution = resolution
+        self.expire_after = expire_after
+        self._clock = clock
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._totals = np.zeros(capacity, dtype=np.int32)
+        self._zone_counts = np.zeros((capacity, len(self.zones)), dtype=np.int32)
+        self._latest = {}           # source -> (time, total, zone counts array)
+        self._seen = {}             # source -> clock() of its last publish
+        self._bucket = None
+        self._lock = threading.Lock()
+        self.seq = 0                # history points ever appended
+        self._version = 0           # bumped on every publish and expiry
+
+    @property
+    def version(self):
+        """Changes on every publish and whenever a source expires."""
+        with self._lock:
+            self._expire()
+            return self._version
+
+    def _expire(self):
+        """Drops the sources that stopped publishing (lock held)."""
+        if self.expire_after is None:
+            return
+        deadline = self._clock() - self.expire_after
+        stale = [src for src, seen in self._seen.items() if seen < deadline]
+        for src in stale:
+            del self._latest[src], self._seen[src]
+        if stale:
+            self._version += 1
+
+    def publish(self, source, total, zone_counts, now=None):
+        """Records the current counts of ``source`` (thread-safe, O(zones))."""
+        now = time.time() if now is None else now
+        counts = np.zeros(len(self.zones), dtype=np.int32)
+        values = np.asarray(zone_counts, dtype=np.int32)[:len(self.zones)]
+        counts[:len(values)] = values
+        with self._lock:
+            self._latest[source] = (now, int(total), counts)
+            self._seen[source] = self._clock()
+            self._expire()
+            self._version += 1
+            bucket = int(now // self.resolution)
+            if bucket != self._bucket:
+                # First sample of a new bucket: append the combined state
+                self._bucket = bucket
+                slot = self.seq % self.capacity
+                self._times[slot] = now
+                self._totals[slot] = sum(t for _, t, _ in self._latest.values())
+                self._zone_counts[slot] = np.sum([c for _, _, c in self._latest.values()], axis=0)
+                self.seq += 1
+
+    def latest(self):
+        """
+        Returns the combined current state.
+
+        Returns:
+            tuple: ``(version, total, zone_counts, per_source)`` where
+            ``per_source`` maps each source to ``(time, total, zone_counts)``
+            (expired sources left out).
+        """
+        with self._lock:
+            self._expire()
+            per_source = {src: (t, total, counts.copy()) for src, (t, total, counts) in self._latest.items()}
+            version = self._version
+        total = sum(v[1] for v in per_source.values())
+        zone_counts = (np.sum([v[2] for v in per_source.values()], axis=0) if per_source
+                       else np.zeros(len(self.zones), dtype=np.int32))
+        return version, total, zone_counts, per_source
+
+    def history(self, since=0):
+        """
+        Returns the history points appended after sequence number ``since``, oldest first.
+
+        Returns:
+            tuple: ``(seq, times, totals, zone_counts)``; pass ``seq`` as ``since``
+            next time. Points older than the ring are gone.
+        """
+        with self._lock:
+            seq = self.seq
+            start = max(since, seq - self.capacity, 0)
+            slots = np.arange(start, seq) % self.capacity
+            return seq, self._times[slots], self._totals[slots], self._zone_counts[slots]
+
+
+class DatabaseFeed:
+    """
+    Tails new people_count rows into a ``LiveStore`` from a background thread.
+
+    Bucket rows (``second`` / ``minute`` persistence) are tailed too and
+    published as the bucket's rounded means at the bucket start. Only the
+    first four zones can be fed this way (the zone_a..zone_d columns).
+
+    Args:
+        store: ``LiveStore`` to publish into.
+        interval: Seconds between two polls.
+        backfill: Rows read from before the start, to seed the history.
+    """
+
+    def __init__(self, store, interval=1.0, backfill=500):
+        self.store = store
+        self.interval = interval
+        self.backfill = backfill
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dashboard-feed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def poll(self, after_id, table="people_count"):
+        import queries
+
+        for row in queries.rows_after(after_id, table=table):
+            after_id = row["id"]
+            self.store.publish(row["source"], row["total_count"],
+                               [row["zone_a"], row["zone_b"], row["zone_c"], row["zone_d"]],
+                               now=row["ts_epoch"])
+        return after_id
+
+    def _run(self):
+        import queries
+
+        tables = (queries.COUNT_TABLE, queries.BUCKET_TABLE)
+        after = {table: max(0, queries.last_id(table) - self.backfill) for table in tables}
+        while not self._stop.is_set():
+            try:
+                for table in tables:
+                    after[table] = self.poll(after[table], table)
+            except Exception:
+                logger.exception("Dashboard feed poll failed")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
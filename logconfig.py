@@ -0,0 +1,146 @@
+"""
+Logging setup shared by the counters.
+
+- Console and/or file sinks with a common format, level from ``LOG_LEVEL``.
+- ``RateLimitFilter``: messages from the same call site are let
+  through at most once per interval; the next one carries the number of
+  suppressed repeats.
+- ``SamplingFilter``: records logged with ``extra={"per_frame": True}`` are
+  kept 1 in N (errors and warnings are never sampled).
+- ``DatabaseHandler``: WARNING and above are written to the ``logs`` table
+  immediately. Per-frame INFO chatter never reaches the table.
+
+Every option can be set from the environment: LOG_LEVEL, LOG_FILE,
+LOG_CONSOLE (0/1), LOG_DB_LEVEL, LOG_RATE_LIMIT (seconds), LOG_SAMPLE (N).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+LOG_FORMAT = "[%(asctime)s] %(levelname)s - %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets each (logger, call site) through at most once per ``interval`` seconds."""
+
+    def __init__(self, interval=5.0):
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.interval <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[key] = (last, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed and not getattr(record, "rate_noted", False):
+            # The same record may go through several handlers; annotate it once
+            record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+            record.rate_noted = True
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in ``every`` records flagged ``per_frame``; other records pass untouched."""
+
+    def __init__(self, every=100):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "per_frame", False) or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            self._seen += 1
+            return self._seen % self.every == 1 or self.every == 1
+
+
+class DatabaseHandler(logging.Handler):
+    """Writes records straight to the ``logs`` table (no buffering, errors are never delayed)."""
+
+    def __init__(self, db_path=None, level=logging.WARNING):
+        super().__init__(level)
+        self.db_path = db_path
+
+    def emit(self, record):
+        # save_log() already stored this row itself
+        if getattr(record, "db_written", False):
+            return
+        try:
+            import database
+            conn = sqlite3.connect(self.db_path or database.DB_PATH)
+            with conn:
+                conn.execute("INSERT INTO logs (level, message) VALUES (?, ?)",
+                             (record.levelname, record.getMessage()))
+            conn.close()
+        except Exception:
+            self.handleError(record)
+
+
+def _env(name, default):
+    return os.environ.get(name, default)
+
+
+def setup_logging(level=None, log_file=None, console=None, db_level=None,
+                  rate_limit=None, sample_every=None):
+    """
+    Configures the root logger once for a process.
+
+    Args:
+        level: Minimum level for the console/file sinks (default ``INFO``).
+        log_file: Optional path of a log file.
+        console: Log to stderr (default on).
+        db_level: Minimum level written to the ``logs`` table (default ``WARNING``;
+            ``"OFF"`` disables the table sink).
+        rate_limit: Seconds between two identical messages (0 disables).
+        sample_every: Keep 1 in N ``per_frame`` records.
+
+    Returns:
+        logging.Logger: The configured root logger.
+    """
+    level = (level or _env("LOG_LEVEL", "INFO")).upper()
+    log_file = log_file or _env("LOG_FILE", None)
+    console = console if console is not None else _env("LOG_CONSOLE", "1") != "0"
+    db_level = (db_level or _env("LOG_DB_LEVEL", "WARNING")).upper()
+    rate_limit = float(rate_limit if rate_limit is not None else _env("LOG_RATE_LIMIT", 5))
+    sample_every = int(sample_every if sample_every is not None else _env("LOG_SAMPLE", 100))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    # Records below every sink's level are rejected before they are even built
+    levels = [logging.getLevelName(level)]
+    if db_level != "OFF":
+        levels.append(logging.getLevelName(db_level))
+    root.setLevel(min(levels))
+
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    sinks = []
+    if console:
+        sinks.append(logging.StreamHandler())
+    if log_file:
+        sinks.append(logging.FileHandler(log_file))
+    for handler in sinks:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+        # One filter instance per sink: filters keep per-sink state
+        handler.addFilter(SamplingFilter(sample_every))
+        handler.addFilter(RateLimitFilter(rate_limit))
+        root.addHandler(handler)
+
+    if db_level != "OFF":
+        root.addHandler(DatabaseHandler(level=db_level))
+
+    return root
@@ -0,0 +1,267 @@
+"""
+Hot-path metrics for the counting loop.
+
+Stages (decode, preprocess, inference, postprocess, tracking, zones,
+db_write, render, ...) record their latency into fixed log-spaced
+histograms. A histogram gives count, mean, max and p50/p95/p99 without
+storing samples: buckets are 1.25x wide and a percentile is interpolated
+inside its bucket, so it lands within a few percent of the exact value.
+Counters (dropped frames...) and gauges (queue depths, read when the
+metrics are read) complete the picture.
+
+Metrics are off by default and the disabled path is a flag check plus a
+shared no-op timer:
+
+    from metrics import METRICS
+    with METRICS.stage("tracking"):
+        ...
+    METRICS.observe("decode", seconds)       # when the time is measured anyway
+
+    METRICS.enable()
+    METRICS.serve(9100)     # http://127.0.0.1:9100/metrics (Prometheus text) and /metrics.json
+    METRICS.report_every(60)  # periodic summary through logging
+"""
+import json
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Buckets from 10 us to ~100 s, 1.25x apart
+_MIN = 1e-5
+_RATIO = 1.25
+_BUCKETS = int(math.ceil(math.log(1e7) / math.log(_RATIO))) + 1
+_LOG_RATIO = math.log(_RATIO)
+
+
+class Histogram:
+    """Log-bucketed latency histogram (seconds)."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        index = 0 if seconds <= _MIN else min(_BUCKETS - 1, int(math.log(seconds / _MIN) / _LOG_RATIO) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """``q`` quantile (0-1), interpolated inside its bucket and capped at the maximum seen."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if index == 0:
+                    return min(_MIN, self.max)
+                fraction = (rank - seen) / n
+                return min(_MIN * _RATIO ** (index - 1 + fraction), self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum_s": round(self.total, 6),
+            "mean_ms": round(1000.0 * self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(1000.0 * self.percentile(0.50), 3),
+            "p95_ms": round(1000.0 * self.percentile(0.95), 3),
+            "p99_ms": round(1000.0 * self.percentile(0.99), 3),
+            "max_ms": round(1000.0 * self.max, 3),
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# ---------- REGISTRY ----------
+class Metrics:
+    """Stage histograms, counters and gauges; every call is a no-op while disabled."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._server = None
+        self._reporter = None
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        return self
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def stage(self, name):
+        """Context manager timing one pass through ``name``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self._histogram(name).record(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, read):
+        """Registers ``read()`` (e.g. a queue's ``depth``), evaluated whenever the metrics are read."""
+        with self._lock:
+            self.gauges[name] = read
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        values = {}
+        for name, read in gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                values[name] = None
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "stages": {name: h.summary() for name, h in sorted(histograms.items())},
+            "counters": counters,
+            "gauges": values,
+        }
+
+    def format_summary(self):
+        snap = self.snapshot()
+        lines = [f"{'stage':<14} {'count':>8} {'mean ms':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for name, s in snap["stages"].items():
+            lines.append(f"{name:<14} {s['count']:>8} {s['mean_ms']:>9.2f} {s['p50_ms']:>8.2f} "
+                         f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}")
+        extra = {**snap["counters"], **snap["gauges"]}
+        if extra:
+            lines.append(", ".join(f"{k}={v}" for k, v in sorted(extra.items())))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Text exposition format (latency in seconds, summary quantiles)."""
+        snap = self.snapshot()
+        lines = ["# TYPE people_counter_stage_seconds summary"]
+        for name, s in snap["stages"].items():
+            for q in ("50", "95", "99"):
+                lines.append(f'people_counter_stage_seconds{{stage="{name}",quantile="0.{q}"}} {s[f"p{q}_ms"] / 1000.0}')
+            lines.append(f'people_counter_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+            lines.append(f'people_counter_stage_seconds_sum{{stage="{name}"}} {s["sum_s"]}')
+        for name, value in snap["counters"].items():
+            lines.append(f'people_counter_events_total{{name="{name}"}} {value}')
+        for name, value in snap["gauges"].items():
+            if value is not None:
+                lines.append(f'people_counter_gauge{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    # ----- surfaces -----
+    def serve(self, port, host="127.0.0.1"):
+        """Serves ``/metrics`` (Prometheus text) and ``/metrics.json`` on a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, kind = json.dumps(metrics.snapshot()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, kind = metrics.prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Metrics on http://%s:%d/metrics", host, port)
+        return self._server
+
+    def report_every(self, seconds):
+        """Logs ``format_summary()`` every ``seconds`` from a daemon thread."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(seconds):
+                logger.info("Stage metrics:\n%s", self.format_summary())
+
+        self._reporter = stop
+        threading.Thread(target=run, name="metrics-report", daemon=True).start()
+        return stop
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if self._reporter is not None:
+            self._reporter.set()
+            self._reporter = None
+
+
+# Process-wide registry used by the pipeline, backends, database and counters
+METRICS = Metrics()
+
+
+def setup_metrics(port=None, every=None):
+    """Enables ``METRICS`` when a port or a report interval is given; returns whether it is on."""
+    if not port and not every:
+        return False
+    METRICS.enable()
+    if port:
+        METRICS.serve(port)
+    if every:
+        METRICS.report_every(every)
+    return True
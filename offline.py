@@ -0,0 +1,37 @@
+"""
+Offline (recorded video) processing helpers.
+
+Batched detection of recorded video runs through ``pipeline.Pipeline``
+(``infer_batch_size``); this module keeps the plain frame reader and the
+throughput counter used next to it.
+"""
+import time
+
+
+def read_frames(cap):
+    """Yields frames from an opened ``cv2.VideoCapture`` until the stream ends."""
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame
+
+
+class Throughput:
+    """Tracks processed frames against the video's own frame rate."""
+
+    def __init__(self, video_fps):
+        self.video_fps = video_fps or 0.0
+        self.frames = 0
+        self.start = time.perf_counter()
+
+    def update(self, n=1):
+        self.frames += n
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.start
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def realtime_factor(self):
+        """How many times faster than real time the video is being processed."""
+        return self.fps() / self.video_fps if self.video_fps else 0.0
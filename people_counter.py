@@ -1,110 +1,258 @@
-
+import argparse
 import cv2
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
-from database import init_db, save_count, save_log
+from backends import BACKENDS, load_detector
+from database import init_db, get_writer, save_log
+from detection import detect_batch
+from sources import FILE, FrameSource, parse_size, pipeline_buffers
+from postprocess import centroids, confirmed_tracks, person_detections, to_deepsort
+from pipeline import Pipeline, BLOCK, DROP_OLDEST
+from persistence import count_policy
+from logconfig import setup_logging
+from annotation import AnnotatedVideoSink
+from heatmap import HeatmapAccumulator, heatmap_path
+from metrics import METRICS, setup_metrics
+from zones import ZoneEngine
+from trackers import TRACKERS, make_tracker, predict_tracks
+from scheduling import DetectionScheduler, MotionGate
 
-print("🚀 people_counter.py STARTED")
+# Importing this module only defines the components below; main() opens the
+# database, loads the model and starts the webcam.
 
-# ---------- 1️⃣ Initialize Database ----------
-init_db()
 
-# ---------- 2️⃣ Initialize YOLOv8 ----------
-model = YOLO("yolov8n.pt")  # YOLOv8 Nano for speed
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Webcam people counter with zone counts")
+    parser.add_argument("--source", default="0", help="webcam index, video file or stream URL")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="frames per second taken from the source (default: all)")
+    parser.add_argument("--size", default=None, help="decode at WIDTHxHEIGHT, e.g. 960x540 (default: native)")
+    parser.add_argument("--zones", default=None, help="zone/line config JSON (default: zones.json)")
+    parser.add_argument("--persist", default="change", choices=["every", "change", "second", "minute"],
+                        help="which counts are stored: every frame, changes only, or per second/minute buckets")
+    parser.add_argument("--tracker", default="deepsort", choices=TRACKERS,
+                        help="tracker backend; sort/centroid skip the appearance embedder")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS,
+                        help="inference backend; onnx exports the weights once and runs ONNX Runtime")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized ONNX model")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op CPU threads for inference")
+    parser.add_argument("--detect-every", type=int, default=3,
+                        help="run YOLO every N frames (sooner on motion); the tracker predicts the rest")
+    parser.add_argument("--idle-every", type=int, default=30,
+                        help="run YOLO only every N frames while the empty scene is static (0 disables the motion gate)")
+    parser.add_argument("--headless", action="store_true",
+                        help="count only: no drawing, no window (stop with Ctrl+C)")
+    parser.add_argument("--video", default=None, help="also write an annotated video to this file")
+    parser.add_argument("--video-fps", type=float, default=5.0, help="frame rate of the annotated video")
+    parser.add_argument("--no-heatmap", dest="heatmap", action="store_false",
+                        help="do not accumulate the track position heatmap")
+    parser.add_argument("--dashboard", type=int, default=0, metavar="PORT",
+                        help="serve the live dashboard from this process on PORT (0: off)")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT",
+                        help="per-stage latency metrics on http://127.0.0.1:PORT/metrics (0: off)")
+    parser.add_argument("--metrics-every", type=float, default=0, metavar="SECONDS",
+                        help="log a per-stage latency summary every SECONDS (0: off)")
+    return parser.parse_args(argv)
 
-# ---------- 3️⃣ Initialize DeepSORT ----------
-tracker = DeepSort(max_age=30)
 
-# ---------- 4️⃣ Video Source ----------
-cap = cv2.VideoCapture(0)  # Webcam
-if not cap.isOpened():
-    save_log("ERROR", "Cannot open webcam")
-    raise RuntimeError("Cannot open webcam")
+# ---------- 2️⃣ YOLOv8 ----------
+def load_model(args):
+    """Loads YOLOv8 Nano (for speed) on the chosen backend and warms it up."""
+    model = load_detector("yolov8n.pt", backend=args.backend, threads=args.threads, int8=args.int8)
+    model.warmup()
+    return model
 
-# ---------- 5️⃣ Main Loop ----------
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        save_log("ERROR", "Failed to read frame from camera")
-        break
-
-    height, width, _ = frame.shape
-
-    # ---------- Define zones dynamically ----------
-    zone_coords = {
-        "A": (0, 0, width // 2, height // 2),
-        "B": (width // 2, 0, width, height // 2),
-        "C": (0, height // 2, width // 2, height),
-        "D": (width // 2, height // 2, width, height)
-    }
-
-    # ---------- YOLO Detection ----------
-    results = model.predict(frame, classes=[0], stream=False)
-
-    detections = []
-
-for r in results:
-    # Convert tensor to list of lists
-    boxes = r.boxes.xyxy.tolist()  # [[x1, y1, x2, y2], ...]
-    
-    for box in boxes:
-        if len(box) != 4:
-            continue  # skip invalid boxes
-        x1, y1, x2, y2 = map(int, box)
-        w, h = x2 - x1, y2 - y1
-        detections.append([x1, y1, w, h])
-
-    # ---------- DeepSORT Tracking ----------
-    tracks = tracker.update_tracks(detections, frame=frame)
-
-    # ---------- Real Zone Counting ----------
-    zone_counts = {"A": 0, "B": 0, "C": 0, "D": 0}
-    total_count = 0
-
-    for t in tracks:
-        if not t.is_confirmed():
-            continue
-
-        x1, y1, x2, y2 = t.to_ltrb()
-        cx = (x1 + x2) // 2
-        cy = (y1 + y2) // 2
-
-        # Check which zone the person is in
-        for zone, (zx1, zy1, zx2, zy2) in zone_coords.items():
-            if zx1 <= cx <= zx2 and zy1 <= cy <= zy2:
-                zone_counts[zone] += 1
-                break
-
-        total_count += 1
-
-    # ---------- Save count and log ----------
-    save_count(
-        total=total_count,
-        zone_a=zone_counts["A"],
-        zone_b=zone_counts["B"],
-        zone_c=zone_counts["C"],
-        zone_d=zone_counts["D"],
-        source="Webcam"
-    )
-
-    # ---------- Display ----------
-    for zone, (zx1, zy1, zx2, zy2) in zone_coords.items():
-        color = (0, 255, 0)
-        cv2.rectangle(frame, (zx1, zy1), (zx2, zy2), color, 2)
-        cv2.putText(frame, f"{zone}: {zone_counts[zone]}", (zx1 + 10, zy1 + 30),
+
+# ---------- Inference stage ----------
+def make_scheduler(args, live=True):
+    """
+    Every frame is tracked and counted; YOLO runs on the scheduled ones and is
+    throttled while the corridor is empty and nothing moves.
+
+    Files (``live=False``) get a deterministic schedule: no track-count
+    feedback and therefore no idle throttling.
+    """
+    return DetectionScheduler(every=args.detect_every, track_trigger=live,
+                              gate=MotionGate() if args.idle_every > 0 else None,
+                              idle_every=max(1, args.idle_every))
+
+
+def make_infer(model, scheduler):
+    @scheduler.wrap
+    def infer(frames):
+        return detect_batch(model, frames, classes=[0])
+    return infer
+
+
+# ---------- Tracking / counting stage ----------
+class ZoneCounter:
+    """
+    Tracks people and counts the confirmed tracks per zone; returns ``(zone_counts, total_count)``.
+
+    With a ``HeatmapAccumulator`` the track centroids also feed the dwell heatmap,
+    timed by ``clock`` (a ``sources.FrameClock``, ``None`` for the wall clock).
+    """
+
+    def __init__(self, tracker, zones, scheduler, heatmap=None, clock=None):
+        self.tracker = tracker
+        self.zones = zones
+        self.scheduler = scheduler
+        self.heatmap = heatmap
+        self.clock = clock
+
+    def __call__(self, frame, frame_detections):
+        height, width, _ = frame.shape
+        now = self.clock.tick() if self.clock is not None else None
+
+        # ---------- Tracking (motion prediction only between detections) ----------
+        with METRICS.stage("tracker"):
+            if frame_detections is None:
+                tracks = predict_tracks(self.tracker, frame)
+            else:
+                detections = to_deepsort(person_detections(frame_detections))
+                tracks = self.tracker.update_tracks(detections, frame=frame)
+
+        # ---------- Real Zone Counting ----------
+        # One mask lookup for all confirmed tracks, whatever the number of zones
+        with METRICS.stage("zones"):
+            _, boxes = confirmed_tracks(tracks)
+            points = centroids(boxes)
+            zone_counts = self.zones.counts(points, width, height)
+            total_count = len(boxes)
+        if self.heatmap is not None:
+            with METRICS.stage("heatmap"):
+                self.heatmap.update(points, width, height, now=now)
+        if frame_detections is not None:
+            self.scheduler.report_tracks(total_count)
+
+        return zone_counts, total_count
+
+
+def draw_zones(frame, zones, zone_counts, total_count):
+    height, width = frame.shape[:2]
+    color = (0, 255, 0)
+    for zone, count in zip(zones.zones, zone_counts.tolist()):
+        pts = zone.pixels(width, height)
+        cv2.polylines(frame, [pts], True, color, 2)
+        x, y = pts.min(axis=0)
+        cv2.putText(frame, f"{zone.name}: {count}", (int(x) + 10, int(y) + 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
 
     cv2.putText(frame, f"Total: {total_count}", (10, height - 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 2)
 
-    cv2.imshow("People Counter", frame)
 
-    # Exit on 'q' key
-    if cv2.waitKey(1) & 0xFF == ord('q'):
+def run(args, model):
+    # ---------- 1️⃣ Initialize Database ----------
+    init_db()
+    writer = get_writer()  # buffered rows, flushed in batches by a background thread
+    persistence = count_policy(writer, args.persist)
+
+    # ---------- 3️⃣ Initialize Tracker ----------
+    tracker = make_tracker(args.tracker, max_age=30)
+
+    # ---------- Zones (rasterized once per resolution) ----------
+    zones = ZoneEngine.load(args.zones)
+
+    # ---------- Dwell heatmap of the track positions (snapshots in instance/heatmaps) ----------
+    heatmap = HeatmapAccumulator(path=heatmap_path("Webcam")) if args.heatmap else None
+
+    # ---------- Live dashboard fed straight from the sink ----------
+    live = None
+    if args.dashboard:
+        import dashboard
+        from livestate import LiveStore
+
+        live = LiveStore([zone.label for zone in zones.zones], capacity=dashboard.HISTORY_POINTS)
+        dashboard.serve(live, heatmap=heatmap, port=args.dashboard)
+
+    # ---------- 4️⃣ Video Source ----------
+    # Webcam by default; frames are downscaled and rate-limited at the source
+    source = FrameSource(args.source, fps=args.fps, size=parse_size(args.size),
+                         buffers=pipeline_buffers(2))
+    if not source.isOpened():
+        save_log("ERROR", "Cannot open webcam")
+        raise RuntimeError("Cannot open webcam")
+
+    is_live = source.kind != FILE
+    scheduler = make_scheduler(args, is_live)
+    # Files credit heatmap dwell by video time, however fast they are processed
+    counter = ZoneCounter(tracker, zones, scheduler, heatmap, clock=source.clock())
+
+    # ---------- Optional annotated video (own thread, reduced frame rate) ----------
+    video = None
+    if args.video:
+        video = AnnotatedVideoSink(args.video, lambda frame, result: draw_zones(frame, zones, *result),
+                                   source_fps=source.fps or 30.0, fps=args.video_fps)
+
+    # ---------- Sink stage (DB + optional video/display, main thread) ----------
+    stopped_by_user = False
+
+    def sink(frame, result):
+        nonlocal stopped_by_user
+        zone_counts, total_count = result
+
+        # ---------- Save count and log ----------
+        # The first four configured zones map to the zone_a..zone_d columns
+        persistence.offer("Webcam", (total_count, *zones.legacy_columns(zone_counts.tolist())))
+        if live is not None:
+            live.publish("Webcam", total_count, zone_counts)
+
+        if video is not None:
+            video.offer(frame, result)
+        if args.headless:
+            return True
+
+        # ---------- Display ----------
+        with METRICS.stage("render"):
+            draw_zones(frame, zones, zone_counts, total_count)
+            cv2.imshow("People Counter", frame)
+            key = cv2.waitKey(1) & 0xFF
+
+        # Exit on 'q' key
+        if key == ord('q'):
+            save_log("INFO", "Webcam counting stopped by user")
+            stopped_by_user = True
+            return False
+        return True
+
+    # ---------- 5️⃣ Main Loop ----------
+    # Live camera: drop the oldest waiting frame instead of letting latency build up.
+    # Files: every frame, reproducibly.
+    pipeline = Pipeline(source, make_infer(model, scheduler), counter, sink,
+                        maxsize=2, drop_policy=DROP_OLDEST if is_live else BLOCK)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
         save_log("INFO", "Webcam counting stopped by user")
-        break
+        stopped_by_user = True
+
+    if not stopped_by_user:
+        save_log("ERROR", "Failed to read frame from camera")
+
+    persistence.close()
+    writer.close()
+    if heatmap is not None:
+        heatmap.close()
+    if video is not None:
+        video.close()
+    source.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+    print(pipeline.format_report())
+    print(scheduler.summary())
+    print(source.stats.summary())
+    if METRICS.enabled:
+        print(METRICS.format_summary())
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+    setup_metrics(args.metrics_port, args.metrics_every)
+
+    print("🚀 people_counter.py STARTED")
+    run(args, load_model(args))
+    print("✅ people_counter.py finished")
 
-cap.release()
-cv2.destroyAllWindows()
-print("✅ people_counter.py finished")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Persistence policies between the counting loop and storage.
+
+The counting loop offers one sample per frame; the policy decides what is
+actually stored:
+
+- ``every``  : every sample (the old behaviour),
+- ``change`` : only samples that differ from the previous one of the same
+  source (optionally re-sent every ``heartbeat`` seconds),
+- ``second`` / ``minute`` : one aggregated row per source and time bucket with
+  min, max and mean of the total and of every zone.
+
+Both kinds of rows feed the minute/hour rollups and the query layer (see
+database.py and queries.py); rollup means are weighted by the time each
+stored count was held.
+
+A sample is a tuple of ints ``(total, zone_a, zone_b, zone_c, zone_d)``; other
+tuples (e.g. entered/exited/inside) work the same way with ``every`` and
+``change``.
+"""
+import time
+
+import numpy as np
+
+BUCKET_SECONDS = {"second": 1, "minute": 60}
+
+
+class EveryFramePolicy:
+    """Forwards every sample to ``emit(source, values, now)``."""
+
+    def __init__(self, emit):
+        self.emit = emit
+
+    def offer(self, source, values, now=None):
+        self.emit(source, tuple(values), time.time() if now is None else now)
+        return True
+
+    def close(self):
+        pass
+
+
+class ChangeOnlyPolicy:
+    """
+    Forwards a sample only when it differs from the last one of its source.
+
+    ``close()`` forwards the last sample of every source once more, so the
+    time it was held until the end of the run is stored.
+    """
+
+    def __init__(self, emit, heartbeat=None):
+        self.emit = emit
+        self.heartbeat = heartbeat
+        self._last = {}
+
+    def offer(self, source, values, now=None):
+        now = time.time() if now is None else now
+        values = tuple(values)
+        last = self._last.get(source)
+        if last is not None and last[0] == values:
+            if self.heartbeat is None or now - last[1] < self.heartbeat:
+                return False
+        self._last[source] = (values, now)
+        self.emit(source, values, now)
+        return True
+
+    def close(self, now=None):
+        now = time.time() if now is None else now
+        for source, (values, _) in self._last.items():
+            self.emit(source, values, now)
+        self._last.clear()
+
+
+class _Bucket:
+    __slots__ = ("start", "samples", "mins", "maxs", "sums")
+
+    def __init__(self, start, values):
+        self.start = start
+        self.samples = 1
+        self.mins = values.copy()
+        self.maxs = values.copy()
+        self.sums = values.astype(np.float64)
+
+    def add(self, values):
+        self.samples += 1
+        np.minimum(self.mins, values, out=self.mins)
+        np.maximum(self.maxs, values, out=self.maxs)
+        self.sums += values
+
+
+class BucketPolicy:
+    """
+    Aggregates samples into fixed time buckets per source.
+
+    When a sample falls into a new bucket the previous one is passed to
+    ``emit_bucket(source, bucket_start, bucket_seconds, samples, mins, maxs, means)``.
+    ``close()`` emits the buckets still open.
+    """
+
+    def __init__(self, emit_bucket, seconds=60):
+        self.emit_bucket = emit_bucket
+        self.seconds = int(seconds)
+        self._open = {}
+
+    def offer(self, source, values, now=None):
+        now = time.time() if now is None else now
+        start = int(now) - int(now) % self.seconds
+        values = np.asarray(values, dtype=np.int64)
+
+        bucket = self._open.get(source)
+        if bucket is not None and bucket.start == start:
+            bucket.add(values)
+            return False
+
+        emitted = bucket is not None
+        if emitted:
+            self._emit(source, bucket)
+        self._open[source] = _Bucket(start, values)
+        return emitted
+
+    def _emit(self, source, bucket):
+        self.emit_bucket(source, bucket.start, self.seconds, bucket.samples,
+                         bucket.mins.tolist(), bucket.maxs.tolist(),
+                         (bucket.sums / bucket.samples).tolist())
+
+    def close(self):
+        for source, bucket in self._open.items():
+            self._emit(source, bucket)
+        self._open.clear()
+
+
+def count_policy(writer, mode="change", heartbeat=60):
+    """
+    Builds a policy that stores people counts through a ``database.BatchWriter``.
+
+    Args:
+        writer: BatchWriter receiving the rows.
+        mode: ``"every"``, ``"change"``, ``"second"`` or ``"minute"``.
+        heartbeat: For ``"change"``, re-store an unchanged sample after this many
+            seconds; keep it below ``database.HOLD_LIMIT`` so a steady count is
+            credited for the whole time it is held.
+
+    Returns:
+        A policy whose ``offer(source, (total, zone_a, zone_b, zone_c, zone_d))``
+        is called once per frame.
+    """
+    def emit(source, values, now):
+        total, zone_a, zone_b, zone_c, zone_d = values
+        writer.count(total, zone_a, zone_b, zone_c, source=source, zone_d=zone_d)
+
+    if mode == "every":
+        return EveryFramePolicy(emit)
+    if mode == "change":
+        return ChangeOnlyPolicy(emit, heartbeat=heartbeat)
+    if mode in BUCKET_SECONDS:
+        return BucketPolicy(writer.bucket, seconds=BUCKET_SECONDS[mode])
+    raise ValueError(f"Unknown persistence mode: {mode}")
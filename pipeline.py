@@ -0,0 +1,296 @@
+"""
+Staged capture / inference / tracking / sink pipeline.
+
+    decode thread -> [frames] -> inference worker -> [detections]
+        -> tracking/counting thread -> [results] -> sink (caller thread)
+
+Stages are joined by bounded queues. The frame queue applies the configured
+drop policy: ``"drop_oldest"`` keeps live cameras current by discarding the
+stalest waiting frame, ``"block"`` makes the decoder wait so recorded files
+are processed completely. The later queues always block so that every
+detected frame reaches the tracker in order.
+
+The sink runs on the thread that calls ``Pipeline.run`` because ``cv2.imshow``
+and ``cv2.waitKey`` must stay on the main thread on most platforms.
+"""
+import logging
+import queue
+import threading
+import time
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+_END = object()
+
+
+# ---------- BOUNDED QUEUE ----------
+class StageQueue:
+    """
+    Bounded queue with a drop policy and a dropped-item counter.
+
+    The depth seen by every ``put`` is recorded (``max_depth``, ``mean_depth``)
+    because the queues are empty again once the pipeline has drained.
+    """
+
+    def __init__(self, maxsize, drop_policy=BLOCK):
+        if drop_policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.max_depth = 0
+        self._puts = 0
+        self._depth_sum = 0
+
+    def put(self, item, stop_event):
+        """Puts an item, dropping the oldest one or waiting according to the policy."""
+        drop = self.drop_policy == DROP_OLDEST and item is not _END
+        while not stop_event.is_set():
+            try:
+                if drop:
+                    self._queue.put_nowait(item)
+                else:
+                    self._queue.put(item, timeout=0.1)
+                if item is not _END:
+                    self._record_depth()
+                return True
+            except queue.Full:
+                if drop:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        return False
+
+    def get(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def get_nowait(self):
+        return self._queue.get_nowait()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _record_depth(self):
+        # Single producer per queue, so no lock; the consumer may race qsize by one item
+        depth = self._queue.qsize()
+        self._puts += 1
+        self._depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def mean_depth(self):
+        """Mean queue depth right after each put."""
+        return self._depth_sum / self._puts if self._puts else 0.0
+
+
+# ---------- STAGE STATISTICS ----------
+class StageStats:
+    """Processed item count and processing latency of one stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, seconds, n=1):
+        self.count += n
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+
+    def mean_ms(self):
+        return 1000.0 * self.total_time / self.count if self.count else 0.0
+
+
+class _Item:
+    __slots__ = ("index", "captured_at", "frame", "detections", "result")
+
+    def __init__(self, index, frame):
+        self.index = index
+        self.captured_at = time.perf_counter()
+        self.frame = frame
+        self.detections = None
+        self.result = None
+
+
+# ---------- PIPELINE ----------
+class Pipeline:
+    """
+    Runs decode, inference, tracking and sink stages concurrently.
+
+    Args:
+        frames: Iterable of frames, consumed on the decode thread.
+        infer: ``infer(frames) -> list`` returning one detection result per frame.
+        track: ``track(frame, detections) -> result`` run in frame order.
+        sink: ``sink(frame, result)``; returning ``False`` stops the pipeline.
+        maxsize: Capacity of each queue.
+        drop_policy: ``"drop_oldest"`` for live cameras, ``"block"`` for files.
+        infer_batch_size: Upper bound of frames handed to ``infer`` at once; the
+            worker only batches frames that are already waiting.
+    """
+
+    def __init__(self, frames, infer, track, sink, maxsize=4, drop_policy=BLOCK,
+                 infer_batch_size=1):
+        self.frames = frames
+        self.infer = infer
+        self.track = track
+        self.sink = sink
+        self.infer_batch_size = max(1, infer_batch_size)
+
+        self.stop_event = threading.Event()
+        self.queues = {
+            "decode": StageQueue(maxsize, drop_policy),
+            "inference": StageQueue(maxsize),
+            "tracking": StageQueue(maxsize),
+        }
+        self.stats = {name: StageStats() for name in ("decode", "inference", "tracking", "sink")}
+        self.end_to_end = StageStats()
+        self._error = None
+        for name, q in self.queues.items():
+            METRICS.gauge(f"queue_depth.{name}", q.depth)
+            METRICS.gauge(f"dropped.{name}", lambda q=q: q.dropped)
+
+    # ----- stages -----
+    def _decode(self):
+        out = self.queues["decode"]
+        index = 0
+        frames = iter(self.frames)
+        while not self.stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                frame = next(frames)
+            except StopIteration:
+                break
+            elapsed = time.perf_counter() - started
+            self.stats["decode"].record(elapsed)
+            METRICS.observe("decode", elapsed)
+            out.put(_Item(index, frame), self.stop_event)
+            index += 1
+        out.put(_END, self.stop_event)
+
+    def _inference(self):
+        src, out = self.queues["decode"], self.queues["inference"]
+        finished = False
+        while not finished and not self.stop_event.is_set():
+            item = src.get(self.stop_event)
+            if item is _END:
+                break
+            batch = [item]
+            while len(batch) < self.infer_batch_size:
+                try:
+                    nxt = src.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _END:
+                    finished = True
+                    break
+                batch.append(nxt)
+
+            started = time.perf_counter()
+            results = self.infer([b.frame for b in batch])
+            elapsed = time.perf_counter() - started
+            self.stats["inference"].record(elapsed, len(batch))
+            METRICS.observe("inference", elapsed / len(batch))
+            for b, detections in zip(batch, results):
+                b.detections = detections
+                out.put(b, self.stop_event)
+        out.put(_END, self.stop_event)
+
+    def _tracking(self):
+        src, out = self.queues["inference"], self.queues["tracking"]
+        while not self.stop_event.is_set():
+            item = src.get(self.stop_event)
+            if item is _END:
+                break
+            started = time.perf_counter()
+            item.result = self.track(item.frame, item.detections)
+            elapsed = time.perf_counter() - started
+            self.stats["tracking"].record(elapsed)
+            METRICS.observe("tracking", elapsed)
+            out.put(item, self.stop_event)
+        out.put(_END, self.stop_event)
+
+    def _guard(self, target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                logger.exception("Pipeline stage %s failed", target.__name__)
+                self._error = e
+                self.stop_event.set()
+        return run
+
+    # ----- driver -----
+    def run(self):
+        """Starts the worker threads and runs the sink until the stream ends or is stopped."""
+        threads = [
+            threading.Thread(target=self._guard(stage), name=f"pipeline{stage.__name__}", daemon=True)
+            for stage in (self._decode, self._inference, self._tracking)
+        ]
+        for t in threads:
+            t.start()
+
+        src = self.queues["tracking"]
+        try:
+            while not self.stop_event.is_set():
+                item = src.get(self.stop_event)
+                if item is _END:
+                    break
+                started = time.perf_counter()
+                keep_going = self.sink(item.frame, item.result)
+                now = time.perf_counter()
+                self.stats["sink"].record(now - started)
+                self.end_to_end.record(now - item.captured_at)
+                METRICS.observe("sink", now - started)
+                METRICS.observe("end_to_end", now - item.captured_at)
+                if keep_going is False:
+                    break
+        finally:
+            self.stop_event.set()
+            for t in threads:
+                t.join(timeout=2.0)
+
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        self.stop_event.set()
+
+    # ----- reporting -----
+    def report(self):
+        """Returns per-stage latency, output queue depth (max and mean at put time) and drops."""
+        stages = {}
+        for name, st in self.stats.items():
+            q = self.queues.get(name)
+            stages[name] = {
+                "processed": st.count,
+                "mean_ms": round(st.mean_ms(), 2),
+                "max_ms": round(st.max_time * 1000.0, 2),
+                "max_depth": q.max_depth if q else 0,
+                "mean_depth": round(q.mean_depth(), 2) if q else 0.0,
+                "dropped": q.dropped if q else 0,
+            }
+        return {
+            "stages": stages,
+            "end_to_end_mean_ms": round(self.end_to_end.mean_ms(), 2),
+        }
+
+    def format_report(self):
+        report = self.report()
+        lines = [f"{'stage':<10} {'done':>7} {'mean ms':>9} {'max ms':>9} {'q max':>6} {'q mean':>7} "
+                 f"{'dropped':>8}"]
+        for name, st in report["stages"].items():
+            lines.append(f"{name:<10} {st['processed']:>7} {st['mean_ms']:>9.2f} {st['max_ms']:>9.2f} "
+                         f"{st['max_depth']:>6} {st['mean_depth']:>7.2f} {st['dropped']:>8}")
+        lines.append(f"end-to-end mean latency: {report['end_to_end_mean_ms']:.2f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,129 @@
+import numpy as np
+
+from detection import PERSON_CLASS_ID
+
+
+# ---------- FILTERING ----------
+def filter_detections(detections, class_ids=(PERSON_CLASS_ID,), min_conf=0.0):
+    """
+    Keeps detections of the wanted classes whose confidence is above ``min_conf``.
+
+    Args:
+        detections: Detections of one frame.
+        class_ids: Iterable of COCO class ids to keep (``None`` keeps every class).
+        min_conf: Strict lower bound on the confidence score.
+
+    Returns:
+        Detections: The filtered subset, computed with one boolean mask.
+    """
+    mask = detections.confidences > min_conf
+    if class_ids is not None:
+        mask &= np.isin(detections.class_ids, np.asarray(class_ids, dtype=np.int32))
+    return detections.select(mask)
+
+
+# ---------- BOX FORMATS ----------
+def xyxy_to_ltwh(boxes):
+    """Converts an (N, 4) array of [x1, y1, x2, y2] boxes to [left, top, width, height]."""
+    ltwh = np.array(boxes, dtype=np.float32, copy=True).reshape(-1, 4)
+    ltwh[:, 2:] -= ltwh[:, :2]
+    return ltwh
+
+
+def centroids(boxes):
+    """Returns the (N, 2) integer centre points of an (N, 4) array of xyxy boxes."""
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    return ((boxes[:, :2] + boxes[:, 2:]) // 2).astype(np.int32)
+
+
+def iou_matrix(a, b, metric="iou"):
+    """
+    Pairwise overlap of (N, 4) and (M, 4) xyxy boxes, as an (N, M) array.
+
+    Args:
+        metric: ``"iou"`` (intersection over union) or ``"ios"`` (intersection
+            over the smaller box, which also catches a box cut by a tile edge
+            lying inside the full box).
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(1, -1, 4)
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    if metric == "ios":
+        return inter / np.maximum(np.minimum(area_a, area_b), 1e-6)
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def nms(detections, threshold=0.5, metric="iou", groups=None):
+    """
+    Class-aware non-maximum suppression.
+
+    Each step keeps the most confident remaining box and drops, in one
+    vectorized comparison, every box of the same class overlapping it by more
+    than ``threshold``.
+
+    Args:
+        groups: Optional (N,) array of group ids (e.g. the tile a box came
+            from); boxes of the same group never suppress each other.
+
+    Returns:
+        Detections: The kept detections, most confident first.
+    """
+    if len(detections) < 2:
+        return detections
+    # Shift every class to its own coordinate range so classes never overlap
+    shift = (detections.boxes.max() + 1) * detections.class_ids.astype(np.float32)
+    boxes = detections.boxes + shift[:, None]
+    order = np.argsort(-detections.confidences, kind="stable")
+    keep = []
+    while len(order):
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        suppress = iou_matrix(boxes[best], boxes[rest], metric)[0] > threshold
+        if groups is not None:
+            suppress &= groups[rest] != groups[best]
+        order = rest[~suppress]
+    return detections.select(np.asarray(keep, dtype=np.int64))
+
+
+def to_deepsort(detections, class_name="person"):
+    """
+    Converts detections to the list format expected by ``DeepSort.update_tracks``.
+
+    The arithmetic happens on arrays; the only Python-level work is the final
+    ``zip`` over already converted lists, which DeepSORT requires as input.
+
+    Args:
+        detections: Detections of one frame (already filtered).
+        class_name: Label attached to every detection.
+
+    Returns:
+        list: ``[([left, top, width, height], confidence, class_name), ...]``
+    """
+    if len(detections) == 0:
+        return []
+    ltwh = xyxy_to_ltwh(detections.boxes).tolist()
+    confs = detections.confidences.tolist()
+    return list(zip(ltwh, confs, [class_name] * len(confs)))
+
+
+def person_detections(detections, min_conf=0.0):
+    """Shortcut for ``filter_detections`` restricted to the person class."""
+    return filter_detections(detections, (PERSON_CLASS_ID,), min_conf)
+
+
+def confirmed_tracks(tracks):
+    """
+    Collects the confirmed tracks of a tracker update into arrays.
+
+    Returns:
+        tuple: ``(track_ids, boxes)`` with a list of ids and an (N, 4) float32
+        array of [left, top, right, bottom] boxes.
+    """
+    confirmed = [t for t in tracks if t.is_confirmed()]
+    boxes = np.array([t.to_ltrb() for t in confirmed], dtype=np.float32).reshape(-1, 4)
+    return [t.track_id for t in confirmed], boxes
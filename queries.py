@@ -0,0 +1,195 @@
+"""
+Read-side query layer for people counts.
+
+Raw rows are looked up through the (source, ts_epoch) index; longer ranges are
+answered from the per-minute / per-hour rollup tables that database.py keeps
+up to date on every insert, so a 24-hour per-camera history reads at most
+1440 minute rows regardless of how many raw rows were stored.
+
+With the ``second`` / ``minute`` persistence policies counts are stored as
+people_count_bucket rows instead; the raw-row functions return those too,
+as rows stamped with the bucket start and carrying the rounded bucket means.
+
+Times may be given as UNIX seconds or ``datetime`` objects.
+"""
+import sqlite3
+from datetime import datetime
+
+import database
+
+RAW_MAX_SPAN = 15 * 60          # up to 15 minutes: raw rows
+MINUTE_MAX_SPAN = 2 * 24 * 3600  # up to 2 days: minute rollups, beyond: hour rollups
+ZONES = ("total", "zone_a", "zone_b", "zone_c", "zone_d")
+
+
+def _epoch(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def _connect():
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _source_filter(source):
+    return ("AND source = ?", (source,)) if source is not None else ("", ())
+
+
+COUNT_TABLE, BUCKET_TABLE = "people_count", "people_count_bucket"
+# Columns of a raw row, for people_count and for people_count_bucket
+_COUNT_COLUMNS = "timestamp, ts_epoch, source, " + ", ".join(database.COUNT_COLUMNS)
+_BUCKET_COLUMNS = ("datetime(bucket_start, 'unixepoch', 'localtime') AS timestamp, bucket_start AS ts_epoch, source, "
+                   + ", ".join(f"CAST(ROUND({z}_mean) AS INTEGER) AS {c}"
+                               for z, c in zip(ZONES, database.COUNT_COLUMNS)))
+
+
+# ---------- RAW ROWS ----------
+def latest(n=50, source=None):
+    """
+    Returns the ``n`` most recent raw rows (people_count and bucket rows), newest first.
+
+    Args:
+        n: Number of rows.
+        source: Restrict to one camera (``None`` for all).
+
+    Returns:
+        list: ``sqlite3.Row`` objects with timestamp, ts_epoch, source, total_count and zones.
+    """
+    where, params = _source_filter(source)
+    conn = _connect()
+    rows = conn.execute(f"""
+        SELECT {_COUNT_COLUMNS} FROM people_count
+        WHERE 1 {where} ORDER BY ts_epoch DESC LIMIT ?
+    """, params + (n,)).fetchall()
+    rows += conn.execute(f"""
+        SELECT {_BUCKET_COLUMNS} FROM people_count_bucket
+        WHERE 1 {where} ORDER BY bucket_start DESC LIMIT ?
+    """, params + (n,)).fetchall()
+    conn.close()
+    return sorted(rows, key=lambda r: r["ts_epoch"], reverse=True)[:n]
+
+
+def rows_after(after_id, limit=5000, table=COUNT_TABLE):
+    """
+    Returns raw rows of ``table`` with ``id > after_id``, oldest first (used to tail new counts).
+
+    Args:
+        table: ``COUNT_TABLE`` or ``BUCKET_TABLE``; ids are per table.
+    """
+    columns = {COUNT_TABLE: _COUNT_COLUMNS, BUCKET_TABLE: _BUCKET_COLUMNS}[table]
+    conn = _connect()
+    rows = conn.execute(f"""
+        SELECT id, {columns}
+        FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+    """, (after_id, limit)).fetchall()
+    conn.close()
+    return rows
+
+
+def last_id(table=COUNT_TABLE):
+    """Returns the id of the newest row of ``table`` (0 when empty)."""
+    if table not in (COUNT_TABLE, BUCKET_TABLE):
+        raise ValueError(f"Unknown count table: {table}")
+    conn = _connect()
+    row = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()
+    conn.close()
+    return row[0] or 0
+
+
+def counts_between(t1, t2, source=None):
+    """Returns raw rows (people_count and bucket rows) with ``t1 <= ts_epoch < t2``, oldest first."""
+    where, params = _source_filter(source)
+    conn = _connect()
+    rows = conn.execute(f"""
+        SELECT {_COUNT_COLUMNS} FROM people_count
+        WHERE ts_epoch >= ? AND ts_epoch < ? {where}
+    """, (_epoch(t1), _epoch(t2)) + params).fetchall()
+    rows += conn.execute(f"""
+        SELECT {_BUCKET_COLUMNS} FROM people_count_bucket
+        WHERE bucket_start >= ? AND bucket_start < ? {where}
+    """, (_epoch(t1), _epoch(t2)) + params).fetchall()
+    conn.close()
+    return sorted(rows, key=lambda r: r["ts_epoch"])
+
+
+# ---------- ROLLUPS ----------
+def rollup_table(t1, t2):
+    """Picks the coarsest table that still gives a useful resolution for the range."""
+    span = _epoch(t2) - _epoch(t1)
+    return "people_count_minute" if span <= MINUTE_MAX_SPAN else "people_count_hour"
+
+
+def history(t1, t2, source=None, table=None):
+    """
+    Returns one aggregated point per minute or hour bucket between ``t1`` and ``t2``.
+
+    Args:
+        t1, t2: Time range (buckets starting in ``[t1, t2)``).
+        source: Restrict to one camera; ``None`` combines every camera's samples.
+        table: Force ``"people_count_minute"`` or ``"people_count_hour"``.
+
+    Returns:
+        list: Rows with bucket_start, samples (stored rows), seconds (time
+        covered) and ``<zone>_mean`` / ``<zone>_max`` for total and every zone.
+        Means are weighted by the time each count was held; a bucket whose
+        only count is still current (not held yet) reports its maximum.
+    """
+    table = table or rollup_table(t1, t2)
+    if table not in database.ROLLUPS:
+        raise ValueError(f"Unknown rollup table: {table}")
+    where, params = _source_filter(source)
+    stats = ", ".join(
+        f"COALESCE(SUM({z}_sum) / SUM(seconds), MAX({z}_max)) AS {z}_mean, MAX({z}_max) AS {z}_max"
+        for z in ZONES)
+    conn = _connect()
+    rows = conn.execute(f"""
+        SELECT bucket_start, SUM(samples) AS samples, SUM(seconds) AS seconds, {stats}
+        FROM {table}
+        WHERE bucket_start >= ? AND bucket_start < ? {where}
+        GROUP BY bucket_start
+        ORDER BY bucket_start
+    """, (_epoch(t1), _epoch(t2)) + params).fetchall()
+    conn.close()
+    return rows
+
+
+def zone_peaks(t1, t2, source=None):
+    """
+    Returns the peak total and peak count of every zone between ``t1`` and ``t2``.
+
+    Short ranges are read from raw rows (and the maxima of bucket rows);
+    longer ones from the rollups, aligned to the rollup bucket boundaries.
+    """
+    t1, t2 = _epoch(t1), _epoch(t2)
+    where, params = _source_filter(source)
+    conn = _connect()
+    if t2 - t1 <= RAW_MAX_SPAN:
+        cols = ", ".join(f"MAX({c}) AS {z}" for c, z in zip(database.COUNT_COLUMNS, ZONES))
+        rows = [conn.execute(f"""
+            SELECT {cols} FROM people_count
+            WHERE ts_epoch >= ? AND ts_epoch < ? {where}
+        """, (t1, t2) + params).fetchone()]
+        cols = ", ".join(f"MAX({z}_max) AS {z}" for z in ZONES)
+        rows.append(conn.execute(f"""
+            SELECT {cols} FROM people_count_bucket
+            WHERE bucket_start >= ? AND bucket_start < ? {where}
+        """, (t1, t2) + params).fetchone())
+    else:
+        cols = ", ".join(f"MAX({z}_max) AS {z}" for z in ZONES)
+        rows = [conn.execute(f"""
+            SELECT {cols} FROM {rollup_table(t1, t2)}
+            WHERE bucket_start >= ? AND bucket_start < ? {where}
+        """, (t1, t2) + params).fetchone()]
+    conn.close()
+    return {z: max(row[z] or 0 for row in rows) for z in ZONES}
+
+
+def sources():
+    """Lists every camera that has stored counts."""
+    conn = _connect()
+    rows = conn.execute("SELECT DISTINCT source FROM people_count_hour ORDER BY source").fetchall()
+    conn.close()
+    return [r["source"] for r in rows]
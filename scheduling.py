@@ -0,0 +1,213 @@
+"""
+Adaptive detection schedule.
+
+Instead of dropping frames, every frame goes through the tracker and the
+counters; the YOLO detector only runs on some of them:
+
+- every ``every`` frames,
+- sooner when the scene changed since the last detection (mean absolute
+  difference of small grayscale thumbnails above ``motion_threshold``),
+- on the frame after a detection that changed the number of tracks, so people
+  entering or leaving are picked up quickly.
+
+With a ``MotionGate`` the schedule also throttles idle scenes: while nothing
+moves and the last detection found nobody, the detector only runs every
+``idle_every`` frames. The first frame with motion is detected immediately.
+
+On the frames in between the inference stage yields ``None`` and the tracking
+stage takes the tracks from ``trackers.predict_tracks``.
+
+    scheduler = DetectionScheduler(every=3)
+    pipeline = Pipeline(frames, scheduler.wrap(infer), track, sink)
+    # in track(): scheduler.report_tracks(n_confirmed) after a detected frame
+
+The inference stage runs a few frames ahead of the tracker, so the
+track-count trigger takes effect after the frames already queued, and which
+frames those are depends on thread timing. Recorded files (``block``
+pipelines) therefore use ``track_trigger=False``: ``report_tracks`` is then
+ignored and the detected frames depend only on the frames themselves, so a
+file run is reproducible. Idle throttling needs the track count, so a gate
+only throttles with the trigger on (live cameras).
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = (64, 36)
+
+
+def thumbnail(frame, size=THUMB_SIZE):
+    """Small grayscale copy of a frame used for cheap change detection."""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+
+class MotionGate:
+    """
+    Frame-differencing motion detector on a downscaled, blurred grayscale frame.
+
+    Args:
+        size: Size (width, height) the frame is reduced to before differencing.
+        pixel_threshold: Grey-level change (0-255) for a pixel to count as changed.
+        min_area: Fraction of changed pixels that counts as motion.
+    """
+
+    def __init__(self, size=(160, 90), pixel_threshold=25, min_area=0.002):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.changed = 0.0
+        self.frames = 0
+        self.cost = 0.0             # seconds spent in update()
+        self._previous = None
+
+    def update(self, frame):
+        """Returns True if ``frame`` differs enough from the previous one."""
+        started = time.perf_counter()
+        small = cv2.GaussianBlur(thumbnail(frame, self.size), (5, 5), 0)
+        if self._previous is None:
+            self.changed = 1.0
+        else:
+            diff = cv2.absdiff(small, self._previous)
+            self.changed = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        self._previous = small
+        self.frames += 1
+        self.cost += time.perf_counter() - started
+        return self.changed >= self.min_area
+
+    def mean_cost_ms(self):
+        return 1000.0 * self.cost / self.frames if self.frames else 0.0
+
+
+class DetectionScheduler:
+    """
+    Decides per frame whether the detector runs.
+
+    Args:
+        every: Detection interval in frames when nothing else triggers (1 = every frame).
+        motion_threshold: Mean absolute grey-level difference (0-255) from the
+            last detected frame that triggers an early detection; ``None`` disables it.
+        track_trigger: Detect again right after the track count changed. Off,
+            the schedule is deterministic and the gate never throttles.
+        gate: Optional ``MotionGate``; enables idle throttling (with ``track_trigger``).
+        idle_every: Detection interval while the gated scene is idle.
+    """
+
+    def __init__(self, every=3, motion_threshold=6.0, track_trigger=True, gate=None, idle_every=30):
+        self.every = max(1, int(every))
+        self.motion_threshold = motion_threshold
+        self.track_trigger = track_trigger
+        self.gate = gate
+        self.idle_every = max(1, int(idle_every))
+
+        self._since = None          # frames since the last detection
+        self._reference = None      # thumbnail of the last detected frame
+        self._track_count = None
+        self._force = False
+        self._idle = False
+        self._lock = threading.Lock()
+
+        self.frames = 0
+        self.detected = 0
+        self.gated = 0              # frames skipped because the scene was idle
+        self.triggers = {"first": 0, "interval": 0, "motion": 0, "tracks": 0, "wake": 0, "idle": 0}
+        self.infer_cpu = 0.0        # process CPU seconds spent in the wrapped infer
+
+    def should_detect(self, frame):
+        """Returns True if the detector must run on ``frame``; call once per frame, in order."""
+        self.frames += 1
+        with self._lock:
+            forced, self._force = self._force, False
+
+        was_idle = self._idle
+        moving = self.gate.update(frame) if self.gate is not None else True
+        self._idle = not moving and self._track_count == 0
+
+        reason = None
+        thumb = None
+        if self._since is None:
+            reason = "first"
+        elif forced:
+            reason = "tracks"
+        elif self._idle:
+            # Nothing moves and nobody was there: throttle
+            if self._since + 1 >= self.idle_every:
+                reason = "idle"
+            else:
+                self.gated += 1
+        elif was_idle:
+            # Motion after an idle stretch: detect on this very frame
+            reason = "wake"
+        elif self._since + 1 >= self.every:
+            reason = "interval"
+        elif self.motion_threshold is not None:
+            thumb = thumbnail(frame)
+            if cv2.absdiff(thumb, self._reference).mean() > self.motion_threshold:
+                reason = "motion"
+
+        if reason is None:
+            self._since += 1
+            return False
+        self._reference = thumb if thumb is not None else thumbnail(frame)
+        self._since = 0
+        self.detected += 1
+        self.triggers[reason] += 1
+        return True
+
+    def report_tracks(self, count):
+        """
+        Called by the tracking stage after a detected frame with its number of confirmed tracks.
+
+        Ignored without ``track_trigger``: the tracker runs behind the
+        inference stage, so feeding its count back would make the schedule
+        depend on thread timing.
+        """
+        if not self.track_trigger:
+            return
+        with self._lock:
+            if self._track_count is not None and count != self._track_count:
+                self._force = True
+            self._track_count = count
+
+    def wrap(self, infer):
+        """
+        Wraps a batch ``infer(frames) -> list`` so it only sees the scheduled frames.
+
+        Returns:
+            callable: ``infer(frames)`` returning one result per frame, ``None``
+            for frames on which the detector was skipped.
+        """
+        def scheduled(frames):
+            picked = [i for i, frame in enumerate(frames) if self.should_detect(frame)]
+            results = [None] * len(frames)
+            if picked:
+                started = time.process_time()
+                for i, detections in zip(picked, infer([frames[i] for i in picked])):
+                    results[i] = detections
+                self.infer_cpu += time.process_time() - started
+            return results
+        return scheduled
+
+    def detect_fraction(self):
+        return self.detected / self.frames if self.frames else 0.0
+
+    def cpu_saved(self):
+        """Estimated CPU seconds saved by the gate: idle frames times the mean CPU cost of a detection."""
+        if not self.detected:
+            return 0.0
+        gate_cost = self.gate.cost if self.gate is not None else 0.0
+        return self.gated * self.infer_cpu / self.detected - gate_cost
+
+    def summary(self):
+        triggers = ", ".join(f"{k} {v}" for k, v in self.triggers.items())
+        text = (f"detector ran on {self.detected}/{self.frames} frames "
+                f"({100.0 * self.detect_fraction():.1f}%): {triggers}")
+        if self.gate is not None:
+            skipped = self.gated / self.frames if self.frames else 0.0
+            text += (f"; motion gate skipped {100.0 * skipped:.1f}% of frames, "
+                     f"~{self.cpu_saved():.1f} CPU s saved (gate {self.gate.mean_cost_ms():.2f} ms/frame)")
+        return text
@@ -0,0 +1,287 @@
+"""
+Frame sources for video files, webcams and network streams (RTSP/HTTP).
+
+``FrameSource`` wraps ``cv2.VideoCapture`` and does the work at the source
+instead of after a full decode:
+
+- frame-rate control: ``stride`` (or ``fps``) keeps one frame out of N; the
+  skipped frames are only ``grab()``-ed, never decoded into an image,
+- resolution control: webcams are asked for ``size`` directly; otherwise the
+  decoded frame is resized straight into the output buffer,
+- preallocated buffers: with ``buffers=N`` frames are retrieved/resized into
+  a ring of N arrays instead of a new allocation per frame. N must exceed
+  the number of frames held downstream at the same time (queued in a
+  pipeline, batched, being drawn); ``pipeline_buffers`` computes it,
+- seeking (files only) by frame index or by time,
+- decode statistics kept apart from inference: grab and retrieve/resize time
+  and the resulting decode fps, see ``DecodeStats``,
+- frame timestamps for files (``FrameSource.clock``): time-based state such as
+  the dwell heatmap follows the video, not the processing speed.
+
+    source = FrameSource("video.mp4", fps=10, size=(960, 540), buffers=16)
+    for frame in source:
+        ...
+    print(source.stats.summary())
+"""
+import logging
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FILE = "file"
+WEBCAM = "webcam"
+STREAM = "stream"
+
+
+def source_kind(source):
+    """Classifies a source as ``FILE``, ``WEBCAM`` (device index) or ``STREAM`` (URL)."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return WEBCAM
+    if "://" in str(source):
+        return STREAM
+    return FILE
+
+
+def parse_size(text):
+    """Parses ``"WIDTHxHEIGHT"`` (command-line ``--size``) into a tuple; empty means native size."""
+    if not text:
+        return None
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def pipeline_buffers(maxsize, infer_batch_size=1):
+    """Ring size that outlives every frame a ``Pipeline`` can hold at once (three queues plus one per stage)."""
+    return 3 * maxsize + max(1, infer_batch_size) + 4
+
+
+# ---------- STATISTICS ----------
+class DecodeStats:
+    """Counts and timing of the decode side only (no inference)."""
+
+    def __init__(self):
+        self.grabbed = 0            # frames pulled from the container/device
+        self.decoded = 0            # frames retrieved into an image
+        self.skipped = 0            # grabbed but never decoded
+        self.grab_time = 0.0
+        self.retrieve_time = 0.0    # retrieve + resize
+        self.start = time.perf_counter()
+
+    def decode_fps(self):
+        """Frames delivered per second of decode work (grabs of skipped frames included)."""
+        busy = self.grab_time + self.retrieve_time
+        return self.decoded / busy if busy > 0 else 0.0
+
+    def report(self):
+        return {
+            "grabbed": self.grabbed,
+            "decoded": self.decoded,
+            "skipped": self.skipped,
+            "grab_ms": round(1000.0 * self.grab_time / self.grabbed, 3) if self.grabbed else 0.0,
+            "retrieve_ms": round(1000.0 * self.retrieve_time / self.decoded, 3) if self.decoded else 0.0,
+            "decode_fps": round(self.decode_fps(), 1),
+        }
+
+    def summary(self):
+        r = self.report()
+        return (f"decode: {r['decoded']} frames delivered, {r['skipped']} grabbed without decoding; "
+                f"grab {r['grab_ms']:.2f} ms, retrieve+resize {r['retrieve_ms']:.2f} ms "
+                f"-> {r['decode_fps']:.1f} fps decode capacity")
+
+
+# ---------- SOURCE ----------
+class FrameClock:
+    """
+    Timestamps of consecutive delivered frames: ``start + index / fps``.
+
+    Call ``tick()`` once per frame, in frame order (the tracking stage).
+
+    Args:
+        fps: Frame rate of the delivered frames.
+        start: Time of the first frame; defaults to now.
+    """
+
+    def __init__(self, fps, start=None):
+        self.fps = fps
+        self.start = time.time() if start is None else start
+        self.frames = 0
+
+    def tick(self):
+        """Returns the timestamp of the next frame."""
+        now = self.start + self.frames / self.fps
+        self.frames += 1
+        return now
+
+
+class FrameSource:
+    """
+    Iterable frame reader for files, webcams and streams.
+
+    Args:
+        source: File path, webcam index (int or digit string), stream URL or an
+            already opened ``cv2.VideoCapture``.
+        stride: Deliver one frame out of ``stride``.
+        fps: Target frame rate; overrides ``stride`` from the native rate (files
+            and streams) or is requested from the device (webcams).
+        size: Output (width, height); ``None`` keeps the native size.
+        buffers: Number of preallocated output frames reused in turn; 0 allocates
+            a new frame every time.
+        start: Seek to this frame index first (files only).
+        api: ``cv2.CAP_*`` backend preference.
+    """
+
+    def __init__(self, source, stride=1, fps=None, size=None, buffers=0, start=0, api=cv2.CAP_ANY):
+        if isinstance(source, cv2.VideoCapture):
+            self.cap, self.kind = source, FILE
+        else:
+            self.kind = source_kind(source)
+            if self.kind == WEBCAM:
+                source = int(source)
+            elif self.kind == STREAM and api == cv2.CAP_ANY:
+                api = cv2.CAP_FFMPEG
+            self.cap = cv2.VideoCapture(source, api)
+        self.source = source
+        self.size = tuple(size) if size is not None else None
+        self.stats = DecodeStats()
+
+        if self.kind in (WEBCAM, STREAM):
+            # Live: keep at most one frame in the driver queue so skips stay current
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.kind == WEBCAM:
+            if self.size is not None:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+            if fps:
+                self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+        native = self.native_fps
+        if fps and native and self.kind != WEBCAM:
+            stride = max(1, int(round(native / fps)))
+        self.stride = max(1, int(stride))
+
+        self._buffers = [None] * max(0, int(buffers))
+        self._raw = None            # decode target when a resize follows
+        self._direct = False        # decoded frames already have the output size
+        self._shape = None          # shape of the delivered frames
+        self._next = 0
+        if start:
+            self.seek(start)
+
+    # ----- properties -----
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        """Raw ``cv2.VideoCapture.get`` of the underlying capture."""
+        return self.cap.get(prop)
+
+    @property
+    def native_fps(self):
+        return self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+    @property
+    def fps(self):
+        """Frame rate of the delivered frames."""
+        return self.native_fps / self.stride
+
+    def clock(self, start=None):
+        """
+        ``FrameClock`` of the delivered frames of a file, ``None`` for live sources.
+
+        Live frames are timed by the wall clock (``None``): frames dropped
+        under load still take up their real time there.
+        """
+        if self.kind != FILE or not self.fps:
+            return None
+        return FrameClock(self.fps, start)
+
+    @property
+    def native_size(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    @property
+    def frame_size(self):
+        """(width, height) of the delivered frames."""
+        return self.size if self.size is not None else self.native_size
+
+    @property
+    def frame_count(self):
+        """Number of frames of a file (0 when unknown or live)."""
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.kind == FILE else 0
+
+    # ----- seeking -----
+    def seek(self, index):
+        """Moves a file to frame ``index``; returns False for live sources or if the container refuses."""
+        if self.kind != FILE:
+            return False
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+
+    def seek_time(self, seconds):
+        if self.kind != FILE:
+            return False
+        return self.cap.set(cv2.CAP_PROP_POS_MSEC, 1000.0 * seconds)
+
+    # ----- reading -----
+    def _buffer(self, shape):
+        """Next ring slot, (re)allocated when the frame shape changes."""
+        if not self._buffers:
+            return None
+        slot = self._next
+        self._next = (slot + 1) % len(self._buffers)
+        buf = self._buffers[slot]
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[slot] = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def read(self):
+        """Returns the next delivered frame, or ``None`` at the end of the stream."""
+        stats = self.stats
+        cap = self.cap
+
+        started = time.perf_counter()
+        for _ in range(self.stride - 1):
+            if not cap.grab():
+                stats.grab_time += time.perf_counter() - started
+                return None
+            stats.grabbed += 1
+            stats.skipped += 1
+        ok = cap.grab()
+        stats.grab_time += time.perf_counter() - started
+        if not ok:
+            return None
+        stats.grabbed += 1
+
+        started = time.perf_counter()
+        if self._shape is None:
+            # First frame: learn its size; later frames go straight to the right buffer
+            ok, frame = cap.retrieve()
+            if ok:
+                self._direct = self.size is None or frame.shape[1::-1] == self.size
+                self._shape = frame.shape if self._direct else (self.size[1], self.size[0]) + frame.shape[2:]
+                self._raw = frame
+        elif self._direct:
+            ok, frame = cap.retrieve(self._buffer(self._shape))
+        else:
+            ok, self._raw = cap.retrieve(self._raw)
+        if ok and not self._direct:
+            # Decoded into one scratch frame, resized into the output buffer
+            frame = cv2.resize(self._raw, self.size, dst=self._buffer(self._shape), interpolation=cv2.INTER_AREA)
+        stats.retrieve_time += time.perf_counter() - started
+        if not ok:
+            return None
+        stats.decoded += 1
+        return frame
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def release(self):
+        self.cap.release()
+        logger.debug("%s: %s", self.source, self.stats.summary())
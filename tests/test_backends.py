@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("ultralytics")
+
+from ultralytics.utils import ASSETS
+
+from backends import Detector, TorchBackend, letterbox_shape, load_detector
+from bench_backends import parity
+
+WEIGHTS = "yolov8n.pt"
+
+
+@pytest.fixture(scope="module")
+def frames():
+    # bus.jpg is portrait and zidane.jpg landscape, so both letterbox directions are covered
+    return [cv2.imread(str(ASSETS / name)) for name in ("bus.jpg", "zidane.jpg")]
+
+
+def test_letterbox_pads_to_a_rectangle():
+    assert letterbox_shape((720, 1280, 3), 640)[2] == (384, 640)
+    assert letterbox_shape((1080, 810, 3), 640)[2] == (640, 480)
+
+
+def test_torch_backend_is_yolo_predict(frames):
+    from ultralytics import YOLO
+
+    reference = YOLO(WEIGHTS)
+    model = load_detector(WEIGHTS, "torch")
+    for frame in frames:
+        expected = reference.predict(frame, verbose=False)[0].boxes.data.cpu().numpy()
+        dets = model.predict(frame)[0]
+        np.testing.assert_allclose(dets.boxes, expected[:, :4], atol=1e-3)
+        np.testing.assert_allclose(dets.confidences, expected[:, 4], atol=1e-4)
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_shared_processing_matches_yolo_predict(frames, batched):
+    reference = load_detector(WEIGHTS, "torch")
+    candidate = Detector(TorchBackend(WEIGHTS))
+    if batched:
+        passed, matched, total = parity(reference, candidate, frames)
+    else:
+        results = [parity(reference, candidate, [frame]) for frame in frames]
+        passed = all(r[0] for r in results)
+        matched, total = sum(r[1] for r in results), sum(r[2] for r in results)
+    assert total > 0
+    assert passed, f"{matched}/{total} reference detections matched"
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from cloudsync import FakeFirestoreClient, FirestoreUploader, Outbox
+
+
+class BlockingClient(FakeFirestoreClient):
+    """Commits block until ``release`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def _commit(self, writes):
+        self.entered.set()
+        self.release.wait()
+        super()._commit(writes)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def history(client):
+    return client.collections.get("people_counter_history", {})
+
+
+def test_close_sends_pending_entries(tmp_path):
+    client = FakeFirestoreClient()
+    uploader = FirestoreUploader(client, str(tmp_path / "outbox.db"), interval=60, coalesce_delay=60)
+    for i in range(3):
+        uploader.update({"inside": i})
+    uploader.close()
+    assert len(history(client)) == 3
+    assert client.collections["people_counter"]["live"]["inside"] == 2
+
+
+def test_final_send_is_one_batch(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    client = FakeFirestoreClient()
+    uploader = FirestoreUploader(client, path, batch_size=2, interval=0.01, coalesce_delay=0)
+    # First send fails, so the worker sits in its backoff while more entries queue up
+    client.fail_next()
+    uploader.update({"inside": 0})
+    wait_for(lambda: uploader.failures == 1)
+    for i in range(1, 5):
+        uploader.update({"inside": i})
+    uploader.close()
+
+    assert client.commits == 1
+    assert len(history(client)) == 2
+    outbox = Outbox(path)
+    assert outbox.size() == 3
+    outbox.close()
+
+
+def test_close_does_not_race_a_busy_worker(tmp_path):
+    client = BlockingClient()
+    uploader = FirestoreUploader(client, str(tmp_path / "outbox.db"), interval=0.01, coalesce_delay=0)
+    uploader.update({"inside": 1})
+    assert client.entered.wait(5.0)
+
+    uploader.close(timeout=0.05)  # the worker is still inside its commit
+    client.release.set()
+    uploader._thread.join(5.0)
+
+    assert not uploader._thread.is_alive()
+    assert client.commits == 1
+    assert len(history(client)) == 1
+    assert uploader.outbox.size() == 0
@@ -0,0 +1,36 @@
+import sqlite3
+
+import database
+
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM people_count").fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_failed_batch_is_kept_and_retried(tmp_path, monkeypatch):
+    path = str(tmp_path / "counts.db")
+    # No tables yet, so every write fails
+    writer = database.BatchWriter(db_path=path, max_delay=0.05)
+    writer.count(3, 1, 1, 1, source="Cam")
+    writer.log("INFO", "hello")
+    assert writer.flush(timeout=5.0) is False
+    assert writer.failures >= 1
+    assert writer._written == 0
+
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.init_db()
+    assert writer.flush(timeout=5.0) is True
+    writer.close()
+    assert count_rows(path) == 1
+
+
+def test_close_gives_up_on_a_failing_batch(tmp_path):
+    path = str(tmp_path / "counts.db")
+    writer = database.BatchWriter(db_path=path, max_delay=0.05)
+    writer.count(3, 1, 1, 1, source="Cam")
+    writer.close()
+    assert not writer._thread.is_alive()
+    assert writer.flush(timeout=0.1) is False
@@ -0,0 +1,17 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from heatmap import HeatmapAccumulator
+from sources import FrameClock
+
+
+def test_dwell_follows_frame_timestamps():
+    # 100 frames of a 25 fps video processed as fast as possible: 4 s of video
+    heat = HeatmapAccumulator(grid=(4, 4), half_life=None)
+    clock = FrameClock(25.0, start=1000.0)
+    for _ in range(101):
+        heat.update([[10, 10]], 100, 100, now=clock.tick())
+    assert heat.grid.sum() == pytest.approx(4.0)
+    assert heat.grid[0, 0] == pytest.approx(4.0)
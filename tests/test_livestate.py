@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from livestate import LiveStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_silent_sources_expire():
+    clock = FakeClock()
+    store = LiveStore(["A", "B"], expire_after=10.0, clock=clock)
+    store.publish("cam1", 3, [1, 2], now=100.0)
+    store.publish("cam2", 4, [4, 0], now=100.0)
+    assert store.latest()[1] == 7
+
+    clock.now = 8.0
+    store.publish("cam2", 5, [5, 0], now=108.0)
+    version = store.version
+    clock.now = 12.0
+    # cam1 has been silent for 12 s: gone from the totals, and readers see a new version
+    assert store.version != version
+    _, total, zone_counts, per_source = store.latest()
+    assert total == 5
+    assert zone_counts.tolist() == [5, 0]
+    assert list(per_source) == ["cam2"]
+
+
+def test_expiry_can_be_disabled():
+    clock = FakeClock()
+    store = LiveStore(["A"], expire_after=None, clock=clock)
+    store.publish("cam1", 3, [3])
+    clock.now = 1e6
+    assert store.latest()[1] == 3
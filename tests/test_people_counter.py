@@ -0,0 +1,50 @@
+import sqlite3
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import database
+import people_counter
+from bench_e2e import StubDetector, write_clip
+
+
+@pytest.fixture
+def clip(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "counts.db"))
+    monkeypatch.setattr(database, "_writer", None)
+    path, _ = write_clip(str(tmp_path / "clip"), frames=30, people=4)
+    return path
+
+
+def args_for(clip, *extra):
+    return people_counter.parse_args(["--source", clip, "--headless", "--tracker", "sort",
+                                      "--no-heatmap", *extra])
+
+
+def test_run_counts_a_file(clip):
+    people_counter.run(args_for(clip), StubDetector())
+    conn = sqlite3.connect(database.DB_PATH)
+    assert conn.execute("SELECT COUNT(*) FROM people_count").fetchone()[0] > 0
+    conn.close()
+
+
+def test_run_publishes_to_the_dashboard(clip, monkeypatch):
+    published = []
+
+    class Store:
+        def __init__(self, zones, capacity):
+            pass
+
+        def publish(self, source, total, zone_counts):
+            published.append(total)
+
+    # Stand-ins for the Dash app and the live store; nothing is served
+    monkeypatch.setitem(sys.modules, "dashboard",
+                        types.SimpleNamespace(HISTORY_POINTS=10, serve=lambda *a, **k: None))
+    monkeypatch.setitem(sys.modules, "livestate", types.SimpleNamespace(LiveStore=Store))
+    people_counter.run(args_for(clip, "--dashboard", "8050"), StubDetector())
+    assert len(published) == 30
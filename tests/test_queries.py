@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+import database
+import queries
+
+T0 = 1_700_000_040  # a minute boundary
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "counts.db"))
+    database.init_db()
+    return database.DB_PATH
+
+
+def insert(rows):
+    conn = sqlite3.connect(database.DB_PATH)
+    with conn:
+        database.insert_counts(conn, [database.count_row(t, t, 0, 0, "Cam", 0, now=now) for now, t in rows])
+    conn.close()
+
+
+def test_means_are_weighted_by_time_held(db):
+    # Change-only rows: 10 people for 6 s, then nobody for the rest of the minute
+    insert([(T0, 10), (T0 + 6, 0)])
+    insert([(T0 + 60, 0)])
+    row = queries.history(T0, T0 + 60, source="Cam", table="people_count_minute")[0]
+    assert row["samples"] == 2
+    assert row["seconds"] == 60
+    assert row["total_mean"] == pytest.approx(1.0)
+    assert row["total_max"] == 10
+
+
+def test_rows_of_one_second_share_it(db):
+    insert([(T0, 2), (T0, 4)])
+    insert([(T0 + 1, 0)])
+    row = queries.history(T0, T0 + 60, source="Cam", table="people_count_minute")[0]
+    assert row["seconds"] == 1
+    assert row["total_mean"] == pytest.approx(3.0)
+
+
+def test_long_gaps_are_capped(db):
+    insert([(T0, 5), (T0 + 10 * database.HOLD_LIMIT, 5)])
+    rows = queries.history(T0, T0 + 3600, source="Cam", table="people_count_minute")
+    assert sum(r["seconds"] for r in rows) == database.HOLD_LIMIT
+
+
+def test_bucket_rows_are_queryable(db):
+    writer = database.BatchWriter(db_path=db, max_delay=0.05)
+    for i in range(3):
+        writer.bucket("Cam", T0 + i * 60, 60, 30, [i, 0, 0, 0, 0], [i + 2, 0, 0, 0, 0], [i + 1, 0, 0, 0, 0])
+    writer.close()
+
+    assert [r["total_count"] for r in queries.latest(10, "Cam")] == [3, 2, 1]
+    assert [r["total_count"] for r in queries.counts_between(T0, T0 + 120)] == [1, 2]
+    assert queries.zone_peaks(T0, T0 + 180, "Cam")["total"] == 4
+    assert [r["total_mean"] for r in queries.history(T0, T0 + 180, "Cam")] == [1, 2, 3]
+    assert queries.sources() == ["Cam"]
+    assert [r["total_count"] for r in queries.rows_after(0, table=queries.BUCKET_TABLE)] == [1, 2, 3]
+
+
+def test_rebuild_matches_incremental_rollups(db):
+    insert([(T0, 10), (T0 + 6, 0), (T0 + 90, 3)])
+    conn = sqlite3.connect(db)
+    before = conn.execute("SELECT * FROM people_count_minute ORDER BY bucket_start").fetchall()
+    with conn:
+        database.rebuild_rollups(conn)
+    assert conn.execute("SELECT * FROM people_count_minute ORDER BY bucket_start").fetchall() == before
+    conn.close()
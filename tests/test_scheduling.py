@@ -0,0 +1,84 @@
+import random
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from bench_e2e import StubDetector, write_clip
+from pipeline import BLOCK, Pipeline
+from postprocess import confirmed_tracks, to_deepsort
+from scheduling import DetectionScheduler
+from sources import FrameSource, pipeline_buffers
+from trackers import make_tracker, predict_tracks
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path, _ = write_clip(str(tmp_path_factory.mktemp("clip")), frames=120, people=12)
+    return path
+
+
+def pipeline_detected(path, seed):
+    """Indices of the detected frames of a batched, blocking pipeline run with jittered stage timings."""
+    infer_jitter, track_jitter = random.Random(seed), random.Random(seed + 1)
+    stub = StubDetector()
+    scheduler = DetectionScheduler(every=3, track_trigger=False)
+    tracker = make_tracker("sort", max_age=30)
+
+    def infer(frames):
+        time.sleep(infer_jitter.uniform(0, 0.004))
+        return stub.predict(frames)
+
+    def track(frame, detections):
+        time.sleep(track_jitter.uniform(0, 0.004))
+        if detections is None:
+            predict_tracks(tracker, frame)
+        else:
+            tracks = tracker.update_tracks(to_deepsort(detections), frame=frame)
+            scheduler.report_tracks(len(confirmed_tracks(tracks)[0]))
+        return detections is not None
+
+    detected = []
+    source = FrameSource(path, buffers=pipeline_buffers(4, 4))
+    Pipeline(source, scheduler.wrap(infer), track, lambda frame, result: detected.append(result),
+             maxsize=4, drop_policy=BLOCK, infer_batch_size=4).run()
+    source.release()
+    return [i for i, hit in enumerate(detected) if hit]
+
+
+def test_file_schedule_is_reproducible(clip):
+    first = pipeline_detected(clip, seed=0)
+    assert first
+    assert pipeline_detected(clip, seed=1) == first
+
+
+def test_file_schedule_matches_frame_by_frame(clip):
+    scheduler = DetectionScheduler(every=3, track_trigger=False)
+    source = FrameSource(clip)
+    expected = [i for i, frame in enumerate(source) if scheduler.should_detect(frame)]
+    source.release()
+    assert pipeline_detected(clip, seed=2) == expected
+
+
+def test_report_keeps_queue_depth_after_run(clip):
+    stub = StubDetector()
+    source = FrameSource(clip, buffers=pipeline_buffers(4, 4))
+    # The sink is the bottleneck, so the tracking queue fills up
+    pipeline = Pipeline(source, stub.predict, lambda frame, detections: None,
+                        lambda frame, result: time.sleep(0.002), maxsize=4, drop_policy=BLOCK)
+    pipeline.run()
+    source.release()
+    tracking = pipeline.report()["stages"]["tracking"]
+    assert tracking["processed"] == 120
+    assert tracking["max_depth"] > 0
+    assert 0 < tracking["mean_depth"] <= tracking["max_depth"]
+    assert "q max" in pipeline.format_report()
+
+
+def test_report_tracks_ignored_without_trigger():
+    scheduler = DetectionScheduler(every=3, track_trigger=False)
+    scheduler.report_tracks(0)
+    scheduler.report_tracks(5)
+    assert scheduler._track_count is None and not scheduler._force
@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from detection import Detections
+from tiling import TiledDetector
+
+
+class FixedModel:
+    """Returns preset crop-space boxes for each tile, in call order."""
+
+    def __init__(self, per_tile):
+        self.per_tile = per_tile
+
+    def predict(self, crops, **kwargs):
+        return [Detections(np.asarray(boxes, dtype=np.float32), [0.9] * len(boxes), [0] * len(boxes))
+                for boxes in self.per_tile[:len(crops)]]
+
+
+def run(per_tile):
+    detector = TiledDetector(FixedModel(per_tile), tile=640)
+    detector._windows[(1000, 500)] = [(0, 0, 600, 500), (400, 0, 1000, 500)]
+    return detector([np.zeros((500, 1000, 3), dtype=np.uint8)])[0]
+
+
+def test_same_tile_boxes_are_not_merged():
+    # A small, partly hidden person mostly inside a neighbour's box, both in tile 0
+    dets = run([[[100, 100, 200, 400], [150, 150, 190, 300]], []])
+    assert len(dets) == 2
+
+
+def test_duplicate_across_tiles_is_merged():
+    # Full box in tile 0, the same person cut by the edge of tile 1 (shifted by x=400)
+    dets = run([[[450, 100, 550, 400]], [[50, 100, 150, 400]]])
+    assert len(dets) == 1
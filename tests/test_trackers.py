@@ -0,0 +1,108 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from trackers import embed_detections, make_tracker, predict_tracks
+
+
+class FakeKalmanTrack:
+    """The DeepSORT track fields ``predict_tracks`` reads."""
+
+    def __init__(self, track_id, mean, confirmed=True):
+        self.track_id = track_id
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.age = 1
+        self.hits = 3
+        self.time_since_update = 0
+        self.confirmed = confirmed
+
+    def is_confirmed(self):
+        return self.confirmed
+
+    def to_ltrb(self):
+        cx, cy, aspect, height = self.mean[:4]
+        width = aspect * height
+        return [cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2]
+
+    def update(self, cx):
+        # What a detection step does to the fields read here
+        self.mean[0] = cx
+        self.age += 1
+
+
+class FakeDeepSort:
+    def __init__(self, tracks):
+        self.tracker = type("Inner", (), {})()
+        self.tracker.tracks = tracks
+
+
+def test_deepsort_boxes_move_between_detections():
+    # Moving right by 12 px per detection, detector on every 4th frame
+    track = FakeKalmanTrack(1, [100, 50, 0.5, 40, 12, 0, 0, 0])
+    tentative = FakeKalmanTrack(2, [10, 10, 0.5, 20, 5, 0, 0, 0], confirmed=False)
+    tracker = FakeDeepSort([track, tentative])
+    mean = track.mean.copy()
+
+    held = [predict_tracks(tracker) for _ in range(3)]
+    lefts = [tracks[0].to_ltrb()[0] for tracks in held]
+    assert lefts[0] < lefts[1] < lefts[2]
+    assert lefts[2] < track.to_ltrb()[0] + 12  # never past the next Kalman step
+    assert held[0][1] is tentative
+    # Kalman state and counters are untouched
+    assert np.array_equal(track.mean, mean)
+    assert (track.age, track.time_since_update) == (1, 0)
+
+    track.update(112)
+    lefts = [predict_tracks(tracker)[0].to_ltrb()[0] for _ in range(3)]
+    assert np.allclose(np.diff([track.to_ltrb()[0]] + lefts), 3.0)
+
+
+class FakeEmbedder:
+    """Feature = crop height, so the crop that produced it can be told apart."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, crops):
+        self.calls += 1
+        return [np.full(8, crop.shape[0], dtype=np.float64) for crop in crops]
+
+
+def test_one_embedder_serves_several_deepsort_trackers():
+    pytest.importorskip("deep_sort_realtime")
+    embedder = FakeEmbedder()
+    frames = [np.zeros((120, 160, 3), dtype=np.uint8)] * 2
+    trackers = [make_tracker("deepsort", embedder=None, max_age=30) for _ in frames]
+    for step in range(3):
+        detections = [[([10 + step, 10, 20, 40], 0.9, "person"), ([0, 0, 0, 5], 0.9, "person")],
+                      [([60, 20, 30, 50], 0.8, "person")]]
+        batch = embed_detections(embedder, frames, detections)
+        for tracker, frame, (dets, features) in zip(trackers, frames, batch):
+            tracker.update_tracks(dets, embeds=features, frame=frame)
+    assert embedder.calls == 3
+    # The empty box is dropped with its feature, the others keep their own crops
+    assert [[f[0] for f in features] for _, features in batch] == [[40.0], [50.0]]
+    assert [len(t.tracker.tracks) for t in trackers] == [1, 1]
+
+
+def detection(x, y):
+    return ([x, y, 20, 40], 0.9, "person")
+
+
+@pytest.mark.parametrize("name", ["sort", "centroid"])
+def test_ids_survive_a_missed_detection(name):
+    tracker = make_tracker(name, max_age=5, n_init=2)
+    people = [(10, 10), (100, 60)]
+    for step in range(4):
+        tracks = tracker.update_tracks([detection(x + 3 * step, y) for x, y in people])
+    before = {t.track_id: t.to_ltrb()[0] for t in tracks if t.is_confirmed()}
+    assert len(before) == 2
+
+    # Person 0 is missed on one frame, then found again further on
+    tracks = tracker.update_tracks([detection(100 + 12, 60)])
+    assert len([t for t in tracks if t.is_confirmed()]) == 2
+    tracks = tracker.update_tracks([detection(x + 15, y) for x, y in people])
+    after = {t.track_id: t.to_ltrb()[0] for t in tracks if t.is_confirmed()}
+    assert set(after) == set(before)
+    # Each id still follows the same person
+    assert [after[i] - before[i] for i in sorted(before)] == pytest.approx([6, 6], abs=2)
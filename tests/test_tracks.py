@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tracks import TrackStore
+
+
+def test_ring_keeps_the_latest_centroids():
+    store = TrackStore(capacity=4, history=3)
+    for y in range(5):
+        slots, _ = store.update([7], [[y, 10 * y]])
+    assert store.trail(slots[0]).tolist() == [[2, 20], [3, 30], [4, 40]]
+    # The direction uses every past y, not only the ones still in the ring
+    _, direction = store.update([7], [[5, 50]])
+    assert direction.tolist() == [50 - 20]
+
+
+def test_evict_releases_dead_and_stale_tracks():
+    store = TrackStore(capacity=4, history=3, max_age=2)
+    store.update([1, 2, 3], [[0, 0], [1, 1], [2, 2]])
+    assert store.evict([1, 2]) == 1
+    assert 3 not in store and len(store) == 2
+
+    for _ in range(3):
+        store.update([1], [[0, 0]])
+    assert store.evict() == 1
+    assert list(store._slots) == [1]
+
+
+def test_full_store_drops_the_least_recently_seen():
+    store = TrackStore(capacity=2, history=3)
+    store.update([1], [[0, 0]])
+    store.update([2], [[0, 0]])
+    store.update([1], [[0, 5]])
+    slots, direction = store.update([3], [[0, 0]])
+    assert 2 not in store and 1 in store and 3 in store
+    # The reused slot starts from scratch
+    assert direction.tolist() == [0.0]
+    assert store.trail(slots[0]).tolist() == [[0, 0]]
+    assert store.total_seen == 3
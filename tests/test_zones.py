@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from zones import CountLine, LineCounter, ZoneEngine
+
+SQUARE = [[0, 0], [1, 0], [1, 1], [0, 1]]
+CENTRE = [[0.25, 0.25], [0.75, 0.25], [0.75, 0.75], [0.25, 0.75]]
+
+
+def engine(*zones):
+    return ZoneEngine.from_dict({"zones": [{"name": name, "polygon": polygon} for name, polygon in zones]})
+
+
+def test_overlapping_zones_go_to_the_first_listed():
+    points = [[50, 50], [10, 10]]
+    assert engine(("centre", CENTRE), ("all", SQUARE)).assign(points, 101, 101).tolist() == [0, 1]
+    assert engine(("all", SQUARE), ("centre", CENTRE)).assign(points, 101, 101).tolist() == [0, 0]
+    assert engine(("centre", CENTRE), ("all", SQUARE)).counts(points, 101, 101).tolist() == [1, 1]
+
+
+def test_points_on_an_edge_are_inside():
+    zones = engine(("centre", CENTRE))
+    # The centre square spans pixels 25..75 of a 101 px frame
+    assert zones.assign([[25, 50], [75, 75], [24, 50], [50, 76]], 101, 101).tolist() == [0, 0, -1, -1]
+    # On the edge shared by two default quadrants, the first one (A) wins
+    quadrants = ZoneEngine.load("missing.json")
+    assert quadrants.assign([[50, 20], [20, 50], [50, 50], [51, 51]], 101, 101).tolist() == [0, 0, 0, 3]
+
+
+def crossings(counter, track_id, ys):
+    return [int(counter.update([track_id], [[50, y]], 101, 101)[0]) for y in ys]
+
+
+def test_line_counts_both_directions():
+    counter = LineCounter(CountLine("middle", [[0, 0.5], [1, 0.5]]))
+    assert crossings(counter, 1, [30, 40, 60, 70]) == [0, 0, 1, 0]
+    assert crossings(counter, 2, [70, 60, 40]) == [0, 0, -1]
+    assert (counter.forward, counter.backward) == (1, 1)
+
+
+def test_jitter_on_the_line_is_not_counted_twice():
+    counter = LineCounter(CountLine("middle", [[0, 0.5], [1, 0.5]]))
+    # y = 50 lies on the line: it neither crosses nor forgets the side the track came from
+    assert crossings(counter, 1, [40, 50, 40, 50, 50, 60, 50, 60, 61]) == [0, 0, 0, 0, 0, 1, 0, 0, 0]
+    assert (counter.forward, counter.backward) == (1, 0)
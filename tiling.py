@@ -0,0 +1,165 @@
+"""
+Region-of-interest cropping and tiled inference.
+
+Only the part of the frame covered by the configured zones is detected: the
+bounding rectangles of the zones (plus a margin) are merged into regions,
+regions larger than ``tile`` pixels are split into overlapping tiles, and the
+crops of every frame in the call go through the detector as one batch at
+``imgsz=tile``. A distant person keeps its native resolution instead of being
+shrunk with the whole frame.
+
+Boxes are shifted back to frame coordinates and duplicates from overlapping
+tiles are merged with class-aware NMS. Only boxes from different tiles are
+compared: within one tile the detector's own NMS already ran, and a small or
+partly hidden person whose box lies mostly inside a neighbour's box must not
+be dropped. The default metric is intersection over the smaller box, so a
+person cut by a tile edge is dropped in favour of the full box from the
+neighbouring tile.
+
+    detector = TiledDetector(model, ZoneEngine.load(), tile=640, classes=[0])
+    detections = detector(frames)   # one Detections per frame
+"""
+import math
+
+import numpy as np
+
+from detection import Detections, detect_batch
+from postprocess import nms
+
+
+def merge_rects(rects):
+    """Merges overlapping (x1, y1, x2, y2) rectangles until none overlap."""
+    rects = [list(r) for r in rects]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(r) for r in rects]
+
+
+def _axis_starts(start, stop, tile, overlap):
+    """Evenly spaced tile origins covering [start, stop) with at least ``overlap`` pixels shared."""
+    length = stop - start
+    if length <= tile:
+        return [start]
+    count = math.ceil((length - overlap) / (tile - overlap))
+    return np.linspace(start, stop - tile, count).round().astype(int).tolist()
+
+
+def plan_tiles(regions, tile=640, overlap=0.2):
+    """
+    Splits regions into windows of at most ``tile`` x ``tile`` pixels.
+
+    Args:
+        regions: List of (x1, y1, x2, y2) rectangles.
+        tile: Maximum window side in pixels.
+        overlap: Fraction of ``tile`` shared by neighbouring windows.
+
+    Returns:
+        list: (x1, y1, x2, y2) windows.
+    """
+    shared = int(tile * overlap)
+    windows = []
+    for x1, y1, x2, y2 in regions:
+        for ty in _axis_starts(y1, y2, tile, shared):
+            for tx in _axis_starts(x1, x2, tile, shared):
+                windows.append((tx, ty, min(tx + tile, x2), min(ty + tile, y2)))
+    return windows
+
+
+class TiledDetector:
+    """
+    Batch ``infer(frames)`` callable that detects only inside the zones, tile by tile.
+
+    Args:
+        model: Loaded YOLO model.
+        zones: ``ZoneEngine`` whose zones define the regions; ``None`` uses the whole frame.
+        tile: Tile side in pixels, also used as ``imgsz``.
+        overlap: Fraction of a tile shared with its neighbours.
+        margin: Padding around each zone, as a fraction of the frame size.
+        nms_threshold: Overlap above which boxes from different tiles are merged
+            (boxes of the same tile are never merged).
+        nms_metric: ``"ios"`` or ``"iou"`` (see ``postprocess.iou_matrix``).
+        **predict_kwargs: Passed to ``model.predict`` (``classes``, ``conf``...).
+    """
+
+    def __init__(self, model, zones=None, tile=640, overlap=0.2, margin=0.05,
+                 nms_threshold=0.6, nms_metric="ios", **predict_kwargs):
+        self.model = model
+        self.zones = zones
+        self.tile = tile
+        self.overlap = overlap
+        self.margin = margin
+        self.nms_threshold = nms_threshold
+        self.nms_metric = nms_metric
+        self.predict_kwargs = predict_kwargs
+        self._windows = {}
+
+    def regions(self, width, height):
+        """Merged, padded bounding rectangles of the zones in pixels."""
+        if self.zones is None or not self.zones.zones:
+            return [(0, 0, width, height)]
+        pad_x, pad_y = int(self.margin * width), int(self.margin * height)
+        rects = []
+        for zone in self.zones.zones:
+            pts = zone.pixels(width, height)
+            (x1, y1), (x2, y2) = pts.min(axis=0), pts.max(axis=0)
+            rects.append((max(0, int(x1) - pad_x), max(0, int(y1) - pad_y),
+                          min(width, int(x2) + 1 + pad_x), min(height, int(y2) + 1 + pad_y)))
+        return merge_rects(rects)
+
+    def windows(self, width, height):
+        """Tile windows for a frame size, planned once and cached."""
+        key = (width, height)
+        if key not in self._windows:
+            self._windows[key] = plan_tiles(self.regions(width, height), self.tile, self.overlap)
+        return self._windows[key]
+
+    def __call__(self, frames):
+        crops, owners, offsets, tiles = [], [], [], []
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            for tile, (x1, y1, x2, y2) in enumerate(self.windows(width, height)):
+                crops.append(frame[y1:y2, x1:x2])
+                owners.append(index)
+                offsets.append((x1, y1, x1, y1))
+                tiles.append(tile)
+
+        # All tiles of all frames in one predict call
+        results = detect_batch(self.model, crops, imgsz=self.tile, **self.predict_kwargs) if crops else []
+
+        per_frame = [[] for _ in frames]
+        for owner, offset, tile, dets in zip(owners, offsets, tiles, results):
+            if len(dets):
+                per_frame[owner].append((tile, Detections(dets.boxes + np.asarray(offset, dtype=np.float32),
+                                                          dets.confidences, dets.class_ids)))
+
+        merged = []
+        for parts in per_frame:
+            if not parts:
+                merged.append(Detections.empty())
+                continue
+            if len(parts) == 1:
+                merged.append(parts[0][1])
+                continue
+            dets = Detections(np.concatenate([d.boxes for _, d in parts]),
+                              np.concatenate([d.confidences for _, d in parts]),
+                              np.concatenate([d.class_ids for _, d in parts]))
+            groups = np.concatenate([np.full(len(d), tile) for tile, d in parts])
+            merged.append(nms(dets, self.nms_threshold, self.nms_metric, groups=groups))
+        return merged
+
+    def describe(self, width, height):
+        windows = self.windows(width, height)
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in windows)
+        return (f"{len(windows)} tile(s) of <= {self.tile}px per {width}x{height} frame, "
+                f"tile area {100.0 * covered / (width * height):.0f}% of the frame")
@@ -0,0 +1,380 @@
+"""
+Tracker backends behind one interface.
+
+Every backend exposes the subset of ``DeepSort`` the counters use::
+
+    tracks = tracker.update_tracks(detections, frame=frame)
+    for t in tracks:
+        t.track_id, t.is_confirmed(), t.to_ltrb()
+
+where ``detections`` is the ``[([l, t, w, h], conf, class), ...]`` list built by
+``postprocess.to_deepsort``. ``predict_tracks(tracker, frame)`` returns the
+tracks of any backend for frames on which the detector did not run. Backends:
+
+- ``deepsort``: ``deep_sort_realtime.DeepSort`` (Kalman + CNN appearance
+  embedding of every detection crop; the most robust, the most expensive).
+- ``sort``: motion only. Constant-velocity Kalman filter over all tracks at
+  once, IoU association (Hungarian when SciPy is available, greedy otherwise).
+- ``centroid``: nearest-centroid matching, no motion model. Cheapest, fine for
+  sparse scenes with a fixed camera.
+
+Use ``make_tracker(name, **kwargs)``; ``TRACKERS`` lists the names.
+"""
+import numpy as np
+
+from postprocess import iou_matrix
+
+TRACKERS = ("deepsort", "sort", "centroid")
+
+
+class Track:
+    """Track handle with the DeepSORT accessors used by the counters."""
+
+    __slots__ = ("track_id", "ltrb", "hits", "time_since_update", "n_init")
+
+    def __init__(self, track_id, ltrb, hits, time_since_update, n_init):
+        self.track_id = track_id
+        self.ltrb = ltrb
+        self.hits = hits
+        self.time_since_update = time_since_update
+        self.n_init = n_init
+
+    def is_confirmed(self):
+        return self.hits >= self.n_init
+
+    def to_ltrb(self):
+        return self.ltrb
+
+
+# ---------- HELPERS ----------
+def _boxes(detections):
+    """(N, 4) float32 ltrb boxes from the DeepSORT detection list."""
+    if not detections:
+        return np.empty((0, 4), dtype=np.float32)
+    boxes = np.array([d[0] for d in detections], dtype=np.float32).reshape(-1, 4)
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+
+def assign(cost, max_cost):
+    """
+    Minimum-cost one-to-one matching.
+
+    Returns:
+        tuple: ``(rows, cols)`` int arrays of matched pairs whose cost is at most ``max_cost``.
+    """
+    if cost.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    try:
+        # Imported on first use: scipy.optimize is slow to import
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:  # SciPy ships with deep_sort_realtime
+        linear_sum_assignment = None
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+    else:
+        # Greedy: cheapest pairs first, each row and column used once
+        order = np.argsort(cost, axis=None)
+        rows, cols = np.unravel_index(order, cost.shape)
+        used_r, used_c, keep = set(), set(), []
+        for k, (r, c) in enumerate(zip(rows.tolist(), cols.tolist())):
+            if r not in used_r and c not in used_c:
+                used_r.add(r)
+                used_c.add(c)
+                keep.append(k)
+        rows, cols = rows[keep], cols[keep]
+    ok = cost[rows, cols] <= max_cost
+    return rows[ok], cols[ok]
+
+
+# ---------- SORT ----------
+class SortTracker:
+    """
+    Motion-only tracker (SORT): Kalman prediction + IoU association.
+
+    The state of every track is a row of ``[cx, cy, area, aspect, vcx, vcy, varea]``;
+    predict and update run on all tracks at once with ``einsum``.
+
+    Args:
+        max_age: Frames a track survives without a matching detection.
+        n_init: Matched frames before a track is confirmed.
+        iou_threshold: Minimum IoU between a prediction and a detection.
+    """
+
+    _F = np.eye(7, dtype=np.float64)
+    _F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+    _H = np.eye(4, 7, dtype=np.float64)
+    _Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])
+    _P0 = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0])
+
+    def __init__(self, max_age=30, n_init=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.iou_threshold = iou_threshold
+        self.x = np.empty((0, 7))
+        self.P = np.empty((0, 7, 7))
+        self.ids = []
+        self.hits = np.empty(0, dtype=np.int64)
+        self.age = np.empty(0, dtype=np.int64)  # frames since the last match
+        self._next_id = 1
+
+    @staticmethod
+    def _to_z(boxes):
+        w = boxes[:, 2] - boxes[:, 0]
+        h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+        return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / h], axis=1).astype(np.float64)
+
+    @staticmethod
+    def _to_ltrb(x):
+        area = np.maximum(x[:, 2], 1e-6)
+        w = np.sqrt(area * np.maximum(x[:, 3], 1e-6))
+        h = area / np.maximum(w, 1e-6)
+        return np.stack([x[:, 0] - w / 2, x[:, 1] - h / 2, x[:, 0] + w / 2, x[:, 1] + h / 2], axis=1)
+
+    def _predict(self):
+        # Predict every track (area must stay positive)
+        stalled = self.x[:, 2] + self.x[:, 6] <= 0
+        self.x[stalled, 6] = 0.0
+        self.x = self.x @ self._F.T
+        self.P = np.einsum("ij,njk,lk->nil", self._F, self.P, self._F) + self._Q
+        self.age += 1
+
+    def _tracks(self):
+        ltrb = self._to_ltrb(self.x).tolist()
+        return [Track(i, b, h, a, self.n_init)
+                for i, b, h, a in zip(self.ids, ltrb, self.hits.tolist(), self.age.tolist())]
+
+    def predict_tracks(self, frame=None):
+        """Advances every track by one frame without a detection step."""
+        self._predict()
+        return self._tracks()
+
+    def update_tracks(self, detections, frame=None):
+        boxes = _boxes(detections)
+        self._predict()
+
+        # Associate predictions with detections
+        predicted = self._to_ltrb(self.x)
+        rows, cols = assign(1.0 - iou_matrix(predicted, boxes), 1.0 - self.iou_threshold)
+
+        # Kalman update of the matched tracks
+        if len(rows):
+            z = self._to_z(boxes[cols])
+            P = self.P[rows]
+            S = P[:, :4, :4] + self._R
+            K = np.einsum("nij,njk->nik", P[:, :, :4], np.linalg.inv(S))
+            self.x[rows] += np.einsum("nij,nj->ni", K, z - self.x[rows, :4])
+            self.P[rows] = P - np.einsum("nij,njk->nik", K, P[:, :4, :])
+            self.hits[rows] += 1
+            self.age[rows] = 0
+
+        # New tracks for unmatched detections
+        new = np.setdiff1d(np.arange(len(boxes)), cols)
+        if len(new):
+            z = self._to_z(boxes[new])
+            self.x = np.concatenate([self.x, np.hstack([z, np.zeros((len(new), 3))])])
+            self.P = np.concatenate([self.P, np.repeat(self._P0[None], len(new), axis=0)])
+            self.ids.extend(str(self._next_id + k) for k in range(len(new)))
+            self._next_id += len(new)
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+
+        # Drop tracks that missed too many frames, and tentative tracks that missed one
+        alive = (self.age <= self.max_age) & ((self.hits >= self.n_init) | (self.age == 0))
+        if not alive.all():
+            self.x, self.P = self.x[alive], self.P[alive]
+            self.hits, self.age = self.hits[alive], self.age[alive]
+            self.ids = [i for i, keep in zip(self.ids, alive.tolist()) if keep]
+        return self._tracks()
+
+
+# ---------- CENTROID ----------
+class CentroidTracker:
+    """
+    Nearest-centroid tracker without a motion model.
+
+    Args:
+        max_age: Frames a track survives without a matching detection.
+        n_init: Matched frames before a track is confirmed.
+        max_distance: Largest centroid jump (pixels) accepted as the same person.
+    """
+
+    def __init__(self, max_age=30, n_init=3, max_distance=50.0):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.max_distance = max_distance
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.ids = []
+        self.hits = np.empty(0, dtype=np.int64)
+        self.age = np.empty(0, dtype=np.int64)
+        self._next_id = 1
+
+    def _tracks(self):
+        return [Track(i, b, h, a, self.n_init)
+                for i, b, h, a in zip(self.ids, self.boxes.tolist(), self.hits.tolist(), self.age.tolist())]
+
+    def predict_tracks(self, frame=None):
+        """No motion model: tracks stay where they were last seen."""
+        self.age += 1
+        return self._tracks()
+
+    def update_tracks(self, detections, frame=None):
+        boxes = _boxes(detections)
+        self.age += 1
+
+        old = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+        cur = (boxes[:, :2] + boxes[:, 2:]) / 2
+        dist = np.linalg.norm(old[:, None, :] - cur[None, :, :], axis=2)
+        rows, cols = assign(dist, self.max_distance)
+        self.boxes[rows] = boxes[cols]
+        self.hits[rows] += 1
+        self.age[rows] = 0
+
+        new = np.setdiff1d(np.arange(len(boxes)), cols)
+        if len(new):
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.ids.extend(str(self._next_id + k) for k in range(len(new)))
+            self._next_id += len(new)
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+
+        alive = (self.age <= self.max_age) & ((self.hits >= self.n_init) | (self.age == 0))
+        if not alive.all():
+            self.boxes, self.hits, self.age = self.boxes[alive], self.hits[alive], self.age[alive]
+            self.ids = [i for i, keep in zip(self.ids, alive.tolist()) if keep]
+        return self._tracks()
+
+
+# ---------- FACTORY ----------
+def make_tracker(name="deepsort", **kwargs):
+    """
+    Creates a tracker backend by name.
+
+    Args:
+        name: One of ``TRACKERS``.
+        **kwargs: Backend options; ``max_age`` and ``n_init`` are understood by all of them.
+
+    Returns:
+        An object with ``update_tracks(detections, frame=None)``.
+    """
+    if name == "deepsort":
+        # Imported lazily: loads torch and the appearance embedder
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+        return DeepSort(**kwargs)
+    if name == "sort":
+        return SortTracker(**kwargs)
+    if name == "centroid":
+        return CentroidTracker(**kwargs)
+    raise ValueError(f"Unknown tracker '{name}', expected one of {', '.join(TRACKERS)}")
+
+
+# ---------- SHARED EMBEDDER ----------
+def make_embedder(half=True, bgr=True, embedder_gpu=True, embedder_wts=None, **_):
+    """
+    Creates DeepSort's MobileNetV2 appearance embedder on its own.
+
+    One embedder can serve any number of ``make_tracker("deepsort",
+    embedder=None)`` trackers, which then take their features from
+    ``embed_detections``. Accepts the ``make_tracker("deepsort")`` keyword
+    arguments; only the embedder options are used.
+    """
+    # Imported lazily: loads torch
+    from deep_sort_realtime.embedder.embedder_pytorch import MobileNetv2_Embedder
+    return MobileNetv2_Embedder(half=half, max_batch_size=16, bgr=bgr, gpu=embedder_gpu,
+                                model_wts_path=embedder_wts)
+
+
+def embed_detections(embedder, frames, detections):
+    """
+    Computes the appearance features of several frames in one embedder pass.
+
+    Args:
+        embedder: Result of ``make_embedder``.
+        frames: Frames the detections come from.
+        detections: One ``postprocess.to_deepsort`` list per frame.
+
+    Returns:
+        list: ``(detections, embeds)`` per frame, ready for
+        ``update_tracks(detections, embeds=embeds)``. Empty boxes are dropped,
+        as DeepSort itself does before embedding.
+    """
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    kept, crops = [], []
+    for frame, dets in zip(frames, detections):
+        dets = [d for d in dets if d[0][2] > 0 and d[0][3] > 0]
+        kept.append(dets)
+        crops.extend(DeepSort.crop_bb(frame, dets)[0])
+    features = embedder.predict(crops) if crops else []
+
+    out, start = [], 0
+    for dets in kept:
+        out.append((dets, features[start:start + len(dets)]))
+        start += len(dets)
+    return out
+
+
+def predict_tracks(tracker, frame=None):
+    """
+    Returns the tracks for a frame on which the detector was skipped.
+
+    No track is created, matched or deleted, so tentative tracks are not
+    punished for the missing detections. ``sort`` and ``centroid`` advance
+    their tracks by one frame (motion model / age only).
+
+    DeepSort's own state is left untouched, so it runs at the detection rate.
+    Every ``predict()`` raises ``time_since_update``, and DeepSORT's IoU
+    fallback only considers tracks with ``time_since_update == 1``.
+    Predicting on skipped frames would therefore weaken association on the
+    next detection frame. Instead, the box of every confirmed track is
+    extrapolated from a copy of its Kalman mean: position plus velocity. The
+    velocity is per detection step, so it is scaled by the skipped frames so
+    far over the frames between the last two detections (see
+    ``_DeepSortHold``). ``age`` and ``time_since_update`` are not changed.
+    ``bench_trackers.py --detect-every`` measures the ID-switch cost of
+    skipping detections.
+
+    Returns:
+        list: The tracks, as ``update_tracks`` would return them.
+    """
+    if hasattr(tracker, "predict_tracks"):
+        return tracker.predict_tracks(frame)
+    hold = getattr(tracker, "_hold", None)
+    if hold is None:
+        hold = tracker._hold = _DeepSortHold()
+    return hold.tracks(tracker.tracker.tracks)
+
+
+class _DeepSortHold:
+    """Extrapolated DeepSORT boxes for the frames between two detections."""
+
+    def __init__(self):
+        self.ages = None        # track_id -> age at the last skipped frame
+        self.skipped = 0        # frames skipped since the last detection
+        self.gap = 1            # frames between the last two detections
+
+    def tracks(self, tracks):
+        ages = {t.track_id: t.age for t in tracks}
+        if ages != self.ages:
+            # update_tracks() ran since the last skipped frame
+            if self.skipped:
+                self.gap = self.skipped + 1
+            self.skipped = 0
+            self.ages = ages
+        self.skipped += 1
+        # Never more than one Kalman step ahead, even before the gap is known
+        fraction = self.skipped / max(self.gap, self.skipped + 1)
+
+        out = []
+        for t in tracks:
+            if not t.is_confirmed():
+                out.append(t)
+                continue
+            # mean: centre x, centre y, aspect ratio, height and their velocities
+            mean = np.array(t.mean[:8], dtype=np.float64)
+            cx, cy, aspect, height = mean[:4] + fraction * mean[4:]
+            width = aspect * height
+            ltrb = [cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2]
+            out.append(Track(t.track_id, ltrb, t.hits, t.time_since_update, 1))
+        return out
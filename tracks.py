@@ -0,0 +1,151 @@
+"""
+Bounded, array-backed store of per-track state.
+
+Replaces the ``TrackableObject`` dict in Main.py, whose centroid lists grew
+for the whole run. Every track owns one slot of preallocated arrays:
+
+- the last ``history`` centroids in a fixed-size ring buffer (for drawing trails),
+- a running sum and count of its y coordinates, so the direction
+  ``y - mean(previous y)`` is O(1) per frame however long the track lives,
+- a ``counted`` flag and the frame it was last seen.
+
+Slots of tracks that DeepSORT has deleted are released by ``evict``; tracks
+that are not reported for ``max_age`` frames are released too, so memory
+stays at ``capacity`` slots for any run length.
+"""
+import numpy as np
+
+
+class TrackStore:
+    """
+    Fixed-capacity track state indexed by slot.
+
+    Args:
+        capacity: Maximum number of live tracks. When it is exceeded the
+            least recently seen track is dropped.
+        history: Number of centroids kept per track.
+        max_age: Frames after which an unreported track is released.
+    """
+
+    def __init__(self, capacity=256, history=32, max_age=100):
+        self.capacity = capacity
+        self.history = history
+        self.max_age = max_age
+
+        self.centroids = np.zeros((capacity, history, 2), dtype=np.int32)
+        self.head = np.zeros(capacity, dtype=np.int32)      # next write position in the ring
+        self.length = np.zeros(capacity, dtype=np.int32)    # valid entries in the ring
+        self.y_sum = np.zeros(capacity, dtype=np.float64)
+        self.y_count = np.zeros(capacity, dtype=np.int64)
+        self.counted = np.zeros(capacity, dtype=bool)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.used = np.zeros(capacity, dtype=bool)
+
+        self._slots = {}           # track id -> slot
+        self._ids = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self.frame = 0
+        self.total_seen = 0        # distinct track ids ever stored
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, track_id):
+        return track_id in self._slots
+
+    # ----- slots -----
+    def _release(self, slot):
+        del self._slots[self._ids[slot]]
+        self._ids[slot] = None
+        self.used[slot] = False
+        self._free.append(slot)
+
+    def _acquire(self, track_id):
+        if not self._free:
+            # Full: reuse the slot of the track that has been gone the longest
+            used = np.flatnonzero(self.used)
+            self._release(int(used[np.argmin(self.last_seen[used])]))
+        slot = self._free.pop()
+        self._slots[track_id] = slot
+        self._ids[slot] = track_id
+        self.used[slot] = True
+        self.head[slot] = 0
+        self.length[slot] = 0
+        self.y_sum[slot] = 0.0
+        self.y_count[slot] = 0
+        self.counted[slot] = False
+        self.total_seen += 1
+        return slot
+
+    # ----- per frame -----
+    def update(self, track_ids, points):
+        """
+        Adds this frame's centroid of every track.
+
+        Args:
+            track_ids: Sequence of N track ids.
+            points: (N, 2) int array of pixel (x, y) centroids.
+
+        Returns:
+            tuple: ``(slots, direction)``; ``slots`` is an (N,) int array of slot
+            indices and ``direction`` the (N,) float array ``y - mean(previous y)``,
+            which is 0 for tracks seen for the first time.
+        """
+        self.frame += 1
+        slots = np.fromiter((self._slots.get(i, -1) for i in track_ids), dtype=np.int64, count=len(track_ids))
+        # Mark known tracks first so a full store never reuses a slot seen on this frame
+        self.last_seen[slots[slots >= 0]] = self.frame
+        for n in np.flatnonzero(slots < 0):
+            slots[n] = self._acquire(track_ids[n])
+            self.last_seen[slots[n]] = self.frame
+
+        pts = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        if len(slots) == 0:
+            return slots, np.empty(0, dtype=np.float64)
+
+        ys = pts[:, 1].astype(np.float64)
+        counts = self.y_count[slots]
+        direction = np.where(counts > 0, ys - self.y_sum[slots] / np.maximum(counts, 1), 0.0)
+
+        self.y_sum[slots] += ys
+        self.y_count[slots] += 1
+        self.centroids[slots, self.head[slots]] = pts
+        self.head[slots] = (self.head[slots] + 1) % self.history
+        self.length[slots] = np.minimum(self.length[slots] + 1, self.history)
+        return slots, direction
+
+    def evict(self, alive_ids=None):
+        """
+        Releases tracks that are no longer alive.
+
+        Args:
+            alive_ids: Ids of the tracks the tracker still holds (confirmed or
+                tentative). Stored tracks missing from it are released. Tracks
+                unseen for ``max_age`` frames are released either way.
+
+        Returns:
+            int: Number of released tracks.
+        """
+        released = 0
+        if alive_ids is not None:
+            alive = set(alive_ids)
+            for track_id in [i for i in self._slots if i not in alive]:
+                self._release(self._slots[track_id])
+                released += 1
+        stale = self.used & (self.frame - self.last_seen > self.max_age)
+        for slot in np.flatnonzero(stale):
+            self._release(int(slot))
+            released += 1
+        return released
+
+    def trail(self, slot):
+        """Stored centroids of a slot, oldest first."""
+        n = int(self.length[slot])
+        order = (np.arange(self.head[slot] - n, self.head[slot])) % self.history
+        return self.centroids[slot, order]
+
+    def nbytes(self):
+        """Bytes held by the slot arrays (constant for the store's lifetime)."""
+        arrays = (self.centroids, self.head, self.length, self.y_sum, self.y_count,
+                  self.counted, self.last_seen, self.used)
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,212 @@
+"""
+Polygon zone engine and count lines.
+
+Zones and lines are loaded from a JSON config (``zones.json`` by default):
+
+    {
+      "zones": [{"name": "A", "label": "Entrance Gate",
+                 "polygon": [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]}, ...],
+      "lines": [{"name": "door", "points": [[0, 0.5], [1, 0.5]]}]
+    }
+
+Coordinates are fractions of the frame width/height, so one config serves
+every resolution. For each resolution the polygons are rasterized once into a
+label mask; assigning N centroids to zones is then a single fancy-indexing
+lookup plus ``np.bincount``, independent of the number of zones.
+"""
+import json
+import os
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(BASE_DIR, "zones.json")
+
+# Four quadrants A-D, the layout people_counter.py has always used
+DEFAULT_ZONES = {
+    "zones": [
+        {"name": "A", "label": "Entrance Gate", "polygon": [[0, 0], [0.5, 0], [0.5, 0.5], [0, 0.5]]},
+        {"name": "B", "label": "Corridor 1", "polygon": [[0.5, 0], [1, 0], [1, 0.5], [0.5, 0.5]]},
+        {"name": "C", "label": "Lobby Area", "polygon": [[0, 0.5], [0.5, 0.5], [0.5, 1], [0, 1]]},
+        {"name": "D", "label": "Exit Gate", "polygon": [[0.5, 0.5], [1, 0.5], [1, 1], [0.5, 1]]},
+    ],
+    "lines": [
+        {"name": "middle", "points": [[0, 0.5], [1, 0.5]]},
+    ],
+}
+
+
+class Zone:
+    def __init__(self, name, polygon, label=None):
+        self.name = name
+        self.label = label or name
+        self.polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+
+    def pixels(self, width, height):
+        """Polygon vertices in pixel coordinates for a frame of the given size."""
+        return np.round(self.polygon * (width - 1, height - 1)).astype(np.int32)
+
+
+class CountLine:
+    """
+    Directed line; points on its left have side -1 and on its right +1.
+
+    For the default horizontal line (drawn left to right) "right" means below,
+    so a crossing from -1 to +1 is a downward movement.
+    """
+
+    def __init__(self, name, points):
+        self.name = name
+        self.points = np.asarray(points, dtype=np.float32).reshape(2, 2)
+
+    def pixels(self, width, height):
+        return np.round(self.points * (width - 1, height - 1)).astype(np.int32)
+
+    def side(self, points, width, height):
+        """Vectorized side (-1, 0, +1) of an (N, 2) array of pixel points."""
+        (x1, y1), (x2, y2) = self.pixels(width, height).astype(np.float32)
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        cross = (x2 - x1) * (pts[:, 1] - y1) - (y2 - y1) * (pts[:, 0] - x1)
+        return np.sign(cross).astype(np.int8)
+
+
+class ZoneEngine:
+    """Assigns points to zones through a per-resolution label mask."""
+
+    def __init__(self, zones, lines=()):
+        self.zones = list(zones)
+        self.lines = list(lines)
+        self.names = [z.name for z in self.zones]
+        self._masks = {}
+
+    # ----- loading -----
+    @classmethod
+    def from_dict(cls, config):
+        zones = [Zone(z["name"], z["polygon"], z.get("label")) for z in config.get("zones", [])]
+        lines = [CountLine(l["name"], l["points"]) for l in config.get("lines", [])]
+        return cls(zones, lines)
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads a JSON config; falls back to the four default quadrants if the file is missing."""
+        path = path or DEFAULT_CONFIG
+        if not os.path.exists(path):
+            return cls.from_dict(DEFAULT_ZONES)
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    # ----- rasterized lookup -----
+    def mask(self, width, height):
+        """
+        Returns the (height, width) label mask for a resolution, built once and cached.
+
+        Pixels hold ``zone index + 1`` (0 = no zone). Where zones overlap, the
+        zone listed first in the config wins.
+        """
+        key = (width, height)
+        mask = self._masks.get(key)
+        if mask is None:
+            dtype = np.uint8 if len(self.zones) < 255 else np.uint16
+            mask = np.zeros((height, width), dtype=dtype)
+            for index in range(len(self.zones) - 1, -1, -1):
+                cv2.fillPoly(mask, [self.zones[index].pixels(width, height)], int(index + 1))
+            self._masks[key] = mask
+        return mask
+
+    def assign(self, points, width, height):
+        """
+        Zone index of every point in one lookup (-1 for points outside every zone).
+
+        Args:
+            points: (N, 2) array of pixel (x, y) centroids.
+            width, height: Frame size.
+
+        Returns:
+            np.ndarray: (N,) int array of zone indices.
+        """
+        pts = np.asarray(points).reshape(-1, 2)
+        if len(pts) == 0:
+            return np.empty(0, dtype=np.int32)
+        xs = np.clip(pts[:, 0].astype(np.int64), 0, width - 1)
+        ys = np.clip(pts[:, 1].astype(np.int64), 0, height - 1)
+        return self.mask(width, height)[ys, xs].astype(np.int32) - 1
+
+    def counts(self, points, width, height):
+        """Number of points in each zone, in config order."""
+        labels = self.assign(points, width, height)
+        return np.bincount(labels[labels >= 0], minlength=len(self.zones))
+
+    def count_dict(self, points, width, height):
+        return dict(zip(self.names, self.counts(points, width, height).tolist()))
+
+    # ----- storage -----
+    @staticmethod
+    def legacy_columns(counts):
+        """First four zone counts, padded with zeros, for the zone_a..zone_d columns."""
+        counts = list(counts)[:4]
+        return counts + [0] * (4 - len(counts))
+
+
+class LineCounter:
+    """
+    Counts tracks crossing a ``CountLine``.
+
+    The last known side of every track id is kept in sorted arrays, so a frame
+    with N tracks is handled with ``searchsorted`` instead of per-track dict work.
+    Ids not seen for ``max_age`` frames are forgotten.
+    """
+
+    def __init__(self, line, max_age=100):
+        self.line = line
+        self.max_age = max_age
+        self.forward = 0   # side -1 -> +1
+        self.backward = 0  # side +1 -> -1
+        self._ids = np.empty(0, dtype=np.int64)
+        self._sides = np.empty(0, dtype=np.int8)
+        self._seen = np.empty(0, dtype=np.int64)
+        self._frame = 0
+
+    def update(self, track_ids, points, width, height):
+        """
+        Updates the crossing counts with this frame's confirmed tracks.
+
+        Returns:
+            np.ndarray: (N,) int8 array, +1/-1 for tracks that crossed forward/backward
+            on this frame, 0 otherwise.
+        """
+        self._frame += 1
+        ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        crossed = np.zeros(len(ids), dtype=np.int8)
+        if len(ids):
+            sides = self.line.side(points, width, height)
+            if len(self._ids):
+                idx = np.minimum(np.searchsorted(self._ids, ids), len(self._ids) - 1)
+                known = self._ids[idx] == ids
+                prev = np.where(known, self._sides[idx], 0).astype(np.int8)
+            else:
+                idx = np.zeros(len(ids), dtype=np.int64)
+                known = np.zeros(len(ids), dtype=bool)
+                prev = np.zeros(len(ids), dtype=np.int8)
+
+            moved = known & (prev != 0) & (sides != 0) & (prev != sides)
+            crossed[moved] = sides[moved]
+            self.forward += int(np.count_nonzero(crossed > 0))
+            self.backward += int(np.count_nonzero(crossed < 0))
+
+            # Remember the latest non-zero side of every track
+            keep_side = np.where(sides != 0, sides, prev).astype(np.int8)
+            self._sides[idx[known]] = keep_side[known]
+            self._seen[idx[known]] = self._frame
+            new = ~known
+            if new.any():
+                ids_all = np.concatenate([self._ids, ids[new]])
+                order = np.argsort(ids_all, kind="stable")
+                self._ids = ids_all[order]
+                self._sides = np.concatenate([self._sides, keep_side[new]])[order]
+                self._seen = np.concatenate([self._seen, np.full(int(new.sum()), self._frame)])[order]
+
+        if len(self._ids) and self._frame % 32 == 0:
+            alive = self._frame - self._seen <= self.max_age
+            self._ids, self._sides, self._seen = self._ids[alive], self._sides[alive], self._seen[alive]
+        return crossed